@@ -1,20 +1,51 @@
 import os
 from flask import Flask
 from flask_restful import Api
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import event
+from app.database.replicas import RoutingSQLAlchemy, configure_replicas
 
-app = Flask(__name__)
-app.config.from_object(os.getenv('APP_SETTINGS'))
+# Flask-SQLAlchemy's scoped session: each thread (or greenlet) gets its own session,
+# bound to the primary's pooled engine and removed when the request's app context ends.
+# Authenticated safe requests may have their reads routed to a replica by the app's replica router.
+db = RoutingSQLAlchemy()
+session = db.session
 
-api = Api(app, prefix='/api/V1')
-db = SQLAlchemy(app)
-db.create_all()
 
-db_engine = create_engine(app.config.get('SQLALCHEMY_DATABASE_URI'))
-session = sessionmaker(bind=db_engine)()
-SECRET_KEY = app.config.get('SECRET_KEY')
+def create_app(config=None):
+    """
+    Builds the app with the settings of config, an object or its import path; APP_SETTINGS by default,
+    or the base Config when that is not set either.
+    Nothing is connected to: each engine is created and set up when it is first used, in the process
+    that uses it, and the schema is left to migrations or `manage.py create_db`.
+    """
+    # Imported here, as the views they lead to import the database from this module
+    from app.controller import metrics, utils
+    from app.database.pool import enforce_foreign_keys, ping_connection, protect_from_fork
+
+    app = Flask(__name__)
+    app.config.from_object(config or os.getenv('APP_SETTINGS') or 'config.Config')
+
+    configure_replicas(app.config)
+    db.init_app(app)
+
+    db.setup_engines(app, protect_from_fork)
+    db.setup_engines(app, enforce_foreign_keys)
+    if app.config.get('SQLALCHEMY_POOL_PRE_PING'):
+        db.setup_engines(app, lambda engine: event.listen(engine, 'engine_connect', ping_connection))
+    if app.config.get('METRICS_ENABLED'):
+        db.setup_engines(app, metrics.instrument_engine)
+        metrics.instrument(app)
+
+    utils.init_app(app)
 
-from app.controller.endpoints import api_endpoints
-api_endpoints(api)
+    from app.controller.endpoints import api_endpoints
+    api_endpoints(Api(app, prefix='/api/V1'))
+    return app
+
+
+# The app built from APP_SETTINGS, served by run.py and asgi.py and used by manage.py and the tests;
+# the database falls back on it outside of an app context.
+app = create_app()
+db.app = app
+
+SECRET_KEY = app.config.get('SECRET_KEY')
@@ -0,0 +1,156 @@
+"""
+ASGI serving of the WSGI app, for servers such as uvicorn.
+
+Connections are handled on the event loop: a request's body is read, and a response
+of up to RESPONSE_BUFFER_SIZE bytes written, without a thread waiting on the client.
+Only the app itself runs on threads, from a pool bounded to about the size of the database
+connection pool, so thousands of slow clients can be connected at once without thousands
+of threads. Responses larger than the buffer (such as exports) are streamed from their
+thread, which is held until the client has taken the last chunk.
+
+ASGI servers run on Python 3.5 or later, which this module needs for its native coroutines;
+the rest of the app does not import it.
+"""
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+# Request bodies up to this many bytes are kept in memory; larger ones spill to a temporary file.
+REQUEST_BUFFER_SIZE = 1024 * 1024
+
+# Responses up to this many bytes are collected on their thread and written by the event loop.
+RESPONSE_BUFFER_SIZE = 64 * 1024
+
+
+def build_environ(scope, body):
+    """ The WSGI environ of an ASGI http scope, with body as wsgi.input """
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {'REQUEST_METHOD': scope['method'],
+               'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+               'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+               'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+               'SERVER_NAME': server_name,
+               'SERVER_PORT': str(server_port),
+               'SERVER_PROTOCOL': 'HTTP/{}'.format(scope.get('http_version', '1.1')),
+               'wsgi.version': (1, 0),
+               'wsgi.url_scheme': scope.get('scheme', 'http'),
+               'wsgi.input': body,
+               'wsgi.errors': sys.stderr,
+               'wsgi.multithread': True,
+               'wsgi.multiprocess': True,
+               'wsgi.run_once': False}
+
+    if scope.get('client'):
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = scope['client'][0], str(scope['client'][1])
+
+    for name, value in scope.get('headers', []):
+        name, value = name.decode('latin-1').upper().replace('-', '_'), value.decode('latin-1')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else 'HTTP_' + name
+        environ[key] = environ[key] + ',' + value if key in environ else value
+
+    return environ
+
+
+class ASGIAdapter:
+    """
+    ASGI 3 application serving a WSGI app, whose calls run on a bounded pool of worker threads.
+    """
+    def __init__(self, wsgi_app, workers=10):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        body = SpooledTemporaryFile(max_size=REQUEST_BUFFER_SIZE)
+
+        # The whole body is read on the event loop, before a thread is taken up with the request
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return
+
+            body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+
+        body.seek(0)
+        loop = asyncio.get_event_loop()
+
+        try:
+            response = await loop.run_in_executor(self.executor, self.run_app, loop, scope, body, send)
+        finally:
+            body.close()
+
+        # None when the response was too large to buffer, and has been streamed from its thread
+        if response is not None:
+            start, chunks = response
+            await send(start)
+            await send({'type': 'http.response.body', 'body': b''.join(chunks)})
+
+    def run_app(self, loop, scope, body, send):
+        """
+        Calls the WSGI app on a worker thread. Returns the response start message and body chunks
+        if the body fits the buffer, or else sends it from this thread as it is generated.
+        """
+        start = {}
+
+        def start_response(status, headers, exc_info=None):
+            start.update({'type': 'http.response.start',
+                          'status': int(status.split(' ', 1)[0]),
+                          'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                      for name, value in headers]})
+
+        iterable = self.wsgi_app(build_environ(scope, body), start_response)
+        try:
+            chunks, size, streaming = [], 0, False
+
+            for chunk in iterable:
+                if not chunk:
+                    continue
+
+                if streaming:
+                    self.send_from_thread(loop, send, {'type': 'http.response.body', 'body': chunk,
+                                                       'more_body': True})
+                    continue
+
+                chunks.append(chunk)
+                size += len(chunk)
+
+                if size > RESPONSE_BUFFER_SIZE:
+                    streaming = True
+                    self.send_from_thread(loop, send, start)
+                    self.send_from_thread(loop, send, {'type': 'http.response.body', 'body': b''.join(chunks),
+                                                       'more_body': True})
+                    chunks = []
+
+            if streaming:
+                self.send_from_thread(loop, send, {'type': 'http.response.body', 'body': b''})
+                return None
+
+            return start, chunks
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+
+    @staticmethod
+    def send_from_thread(loop, send, message):
+        """ Sends an ASGI message from a worker thread, waiting until the server has taken it """
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
@@ -0,0 +1,267 @@
+import csv
+import io
+import json
+from collections import namedtuple
+from sqlalchemy import select
+from app.database.models import Bucketlist, Item
+from . utils import parse_done
+
+# Formats a user's data can be imported from.
+IMPORT_FORMATS = ('ndjson', 'csv')
+
+# What to do with a bucketlist or item whose name is already taken:
+# skip it (a skipped bucketlist takes its items with it), import it under a free name, or abort the import.
+CONFLICT_POLICIES = ('skip', 'rename', 'fail')
+
+# Longest name the bucketlist and item tables hold.
+NAME_LENGTH = 120
+
+# One line of an import: an item of a bucketlist, or a bucketlist alone when item is None.
+ImportRow = namedtuple('ImportRow', ['line', 'bucketlist', 'item', 'done'])
+
+
+class ImportFailed(ValueError):
+    """ Raised when a row can not be imported under the 'fail' conflict policy, or can not be parsed at all """
+
+
+def parse_ndjson(lines):
+    """
+    Generates the rows of an NDJSON import, one bucketlist per line as written by the export:
+    {"name": "Travel", "items": [{"name": "Tokyo", "done": false}, ...]}
+    """
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+
+        try:
+            bucketlist = json.loads(line)
+        except ValueError:
+            raise ImportFailed('Line {} is not valid JSON'.format(number))
+
+        if not isinstance(bucketlist, dict) or not isinstance(bucketlist.get('items', []), list):
+            raise ImportFailed('Line {} is not a bucketlist object'.format(number))
+
+        yield ImportRow(number, bucketlist.get('name'), None, None)
+
+        for item in bucketlist.get('items', []):
+            if not isinstance(item, dict):
+                raise ImportFailed('Line {} has an item that is not an object'.format(number))
+            yield ImportRow(number, bucketlist.get('name'), item.get('name'), item.get('done'))
+
+
+def parse_csv(lines):
+    """
+    Generates the rows of a CSV import, with a header naming its bucketlist, item and (optional) done columns.
+    Rows of one bucketlist need not be next to each other; a row without an item creates an empty bucketlist.
+    """
+    reader = csv.DictReader(lines)
+
+    if not reader.fieldnames or not {'bucketlist', 'item'} <= set(reader.fieldnames):
+        raise ImportFailed('CSV header must name the bucketlist and item columns')
+
+    for row in reader:
+        yield ImportRow(reader.line_num, row.get('bucketlist'), row.get('item') or None, row.get('done') or None)
+
+
+def decoded_lines(stream):
+    """ Lines of a binary stream, decoded from UTF-8 as they are read """
+    for number, line in enumerate(stream, start=1):
+        try:
+            yield line.decode('utf-8')
+        except UnicodeDecodeError:
+            raise ImportFailed('Line {} is not valid UTF-8'.format(number))
+
+
+def parse(stream, import_format):
+    """ Rows of a binary stream of the given format, parsed as they are read """
+    lines = decoded_lines(stream)
+    return parse_csv(lines) if import_format == 'csv' else parse_ndjson(lines)
+
+
+def valid_name(name):
+    return isinstance(name, str) and 0 < len(name.strip()) and len(name) <= NAME_LENGTH
+
+
+def free_name(name, taken):
+    """ name, or the first of 'name (2)', 'name (3)', ... that is not taken and still fits the column """
+    number = 2
+    candidate = name
+    while candidate in taken:
+        suffix = ' ({})'.format(number)
+        candidate = name[:NAME_LENGTH - len(suffix)] + suffix
+        number += 1
+    return candidate
+
+
+class Importer:
+    """
+    Imports rows of bucketlists and items for a user over one connection, within its transaction.
+    Rows are taken in chunks: the chunk's new bucketlists are inserted with one executemany and their ids
+    read back with one query, then its items go in with one more executemany (or COPY on Postgres).
+    """
+    def __init__(self, connection, user_id, policy='fail', chunk_size=5000):
+        if policy not in CONFLICT_POLICIES:
+            raise ValueError('Conflict policy must be one of: {}'.format(', '.join(CONFLICT_POLICIES)))
+
+        self.connection = connection
+        self.user_id = user_id
+        self.policy = policy
+        self.chunk_size = chunk_size
+        self.counts = {'rows': 0, 'bucketlists': 0, 'items': 0, 'skipped': 0, 'renamed': 0}
+
+        bucketlist = Bucketlist.__table__
+        existing = connection.execute(select([bucketlist.c.id, bucketlist.c.name])
+                                      .where(bucketlist.c.creator_id == user_id)).fetchall()
+
+        # Names of the user's bucketlists before the import; and of those imported, by the name
+        # they were given in the file, with the id they got and the names of their items.
+        self.taken_names = {row.name for row in existing}
+        self.last_id = max([row.id for row in existing] or [0])
+        self.imported = {}
+        self.skipped = set()
+
+    def progress(self, rows):
+        """ Imports the rows chunk by chunk, generating the counts so far after each chunk """
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == self.chunk_size:
+                self.import_chunk(chunk)
+                chunk = []
+                yield dict(self.counts)
+
+        if chunk:
+            self.import_chunk(chunk)
+            yield dict(self.counts)
+
+    def run(self, rows):
+        """ Imports every row, returning the final counts """
+        for _ in self.progress(rows):
+            pass
+        return dict(self.counts)
+
+    def conflict(self, row, message):
+        """ Applies the conflict policy; returning True if the row should be skipped """
+        if self.policy == 'fail':
+            raise ImportFailed('Line {}: {}'.format(row.line, message))
+        return self.policy == 'skip'
+
+    def import_chunk(self, chunk):
+        new_bucketlists = {}
+
+        for row in chunk:
+            if not valid_name(row.bucketlist):
+                raise ImportFailed('Line {}: bucketlist name must be 1 to {} characters'.format(row.line, NAME_LENGTH))
+
+            if row.bucketlist in self.imported or row.bucketlist in self.skipped or row.bucketlist in new_bucketlists:
+                continue
+
+            name = row.bucketlist
+            if name in self.taken_names:
+                if self.conflict(row, 'bucketlist {} already exists'.format(name)):
+                    self.skipped.add(name)
+                    self.counts['skipped'] += 1
+                    continue
+                name = free_name(name, self.taken_names)
+                self.counts['renamed'] += 1
+
+            self.taken_names.add(name)
+            new_bucketlists[row.bucketlist] = name
+
+        if new_bucketlists:
+            self.insert_bucketlists(new_bucketlists)
+
+        items = []
+        for row in chunk:
+            self.counts['rows'] += 1
+
+            if row.item is None:
+                continue
+
+            if row.bucketlist in self.skipped:
+                self.counts['skipped'] += 1
+                continue
+
+            if not valid_name(row.item):
+                raise ImportFailed('Line {}: item name must be 1 to {} characters'.format(row.line, NAME_LENGTH))
+
+            try:
+                done = False if row.done is None else parse_done(row.done)
+            except ValueError:
+                raise ImportFailed('Line {}: done must be true or false'.format(row.line))
+
+            bucketlist_id, item_names = self.imported[row.bucketlist]
+            name = row.item
+
+            if name in item_names:
+                if self.conflict(row, 'item {} already exists in {}'.format(name, row.bucketlist)):
+                    self.counts['skipped'] += 1
+                    continue
+                name = free_name(name, item_names)
+                self.counts['renamed'] += 1
+
+            item_names.add(name)
+            items.append({'name': name, 'completed': done, 'bucketlist_id': bucketlist_id})
+
+        if items:
+            self.insert_items(items)
+            self.counts['items'] += len(items)
+
+    def insert_bucketlists(self, new_bucketlists):
+        """ Inserts bucketlists keyed by their name in the file, and records the ids they get """
+        bucketlist = Bucketlist.__table__
+        self.connection.execute(bucketlist.insert(), [{'name': name, 'creator_id': self.user_id}
+                                                      for name in new_bucketlists.values()])
+
+        # Names are unique per user, so the user's bucketlists past the last known id are matched by name
+        file_names = {name: file_name for file_name, name in new_bucketlists.items()}
+        inserted = self.connection.execute(select([bucketlist.c.id, bucketlist.c.name])
+                                           .where(bucketlist.c.creator_id == self.user_id)
+                                           .where(bucketlist.c.id > self.last_id))
+
+        for row in inserted:
+            self.last_id = max(self.last_id, row.id)
+            if row.name in file_names:
+                self.imported[file_names[row.name]] = (row.id, set())
+
+        self.counts['bucketlists'] += len(new_bucketlists)
+
+    def insert_items(self, items):
+        if self.connection.dialect.name == 'postgresql':
+            copy_rows(self.connection, Item.__table__, items)
+        else:
+            self.connection.execute(Item.__table__.insert(), items)
+
+
+def copy_rows(connection, table, rows):
+    """
+    Inserts rows with Postgres' COPY, within the connection's transaction. Columns the rows leave
+    out are filled with their Python side scalar defaults, which COPY would not apply.
+    """
+    columns = list(rows[0])
+    defaults = {column.name: column.default.arg for column in table.columns
+                if column.name not in columns and column.default is not None and column.default.is_scalar}
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row.get(column) for column in columns] + list(defaults.values()))
+    buffer.seek(0)
+
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert('COPY {} ({}) FROM STDIN WITH CSV'.format(
+            table.name, ', '.join(columns + list(defaults))), buffer)
+    finally:
+        cursor.close()
+
+
+def import_progress(connection, user_id, stream, import_format, policy, chunk_size=5000):
+    """
+    Parses and imports an NDJSON or CSV stream for a user over connection;
+    generating the counts of rows, bucketlists, items, skipped and renamed names after each chunk.
+    """
+    if import_format not in IMPORT_FORMATS:
+        raise ValueError('Import format must be one of: {}'.format(', '.join(IMPORT_FORMATS)))
+
+    return Importer(connection, user_id, policy, chunk_size).progress(parse(stream, import_format))
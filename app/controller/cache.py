@@ -0,0 +1,158 @@
+import json
+import time
+import uuid
+from collections import OrderedDict
+from threading import Lock
+
+
+class LRUCache:
+    """
+    Bounded, thread safe in-process cache.
+    Once full, the least recently used entry is evicted to make room for a new one;
+    and entries expire after their time to live (in seconds) has elapsed.
+    """
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        """ Returns the value cached under key, or default if it is missing or expired """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None or entry[1] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        """
+        Caches value under key. A ttl only shortens the lifetime of the entry;
+        it never extends it past the cache's own ttl.
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        """ Removes key from the cache, if present """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """ Removes every entry from the cache """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """ Counters used to size the cache """
+        with self._lock:
+            return {'size': len(self._entries),
+                    'maxsize': self.maxsize,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions}
+
+
+class LocalBackend:
+    """
+    In-process response cache backend, with the subset of the Redis client interface
+    that ResponseCache uses; so that a Redis client can be swapped in for it.
+    """
+    def __init__(self, maxsize=1024, ttl=300):
+        self.entries = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, name):
+        return self.entries.get(name)
+
+    def set(self, name, value, ex=None):
+        self.entries.set(name, value, ttl=ex)
+
+    def delete(self, *names):
+        for name in names:
+            self.entries.delete(name)
+
+
+class ResponseCache:
+    """
+    Cache of the responses served to each user, kept in a pluggable backend.
+    Responses are stored under the user's current generation; a write by the user
+    replaces the generation, which makes every response cached for them unreachable.
+    """
+    def __init__(self, backend, ttl=60):
+        self.backend = backend
+        self.ttl = ttl
+
+    def generation(self, user_id):
+        """ Returns the user's current generation, starting a new one if there is none """
+        generation = self.backend.get('generation:{}'.format(user_id))
+
+        if generation is None:
+            return self.invalidate(user_id)
+
+        return generation.decode() if isinstance(generation, bytes) else generation
+
+    def get(self, user_id, generation, path):
+        """ Returns the (etag, data, status) response cached for the path, if any """
+        cached = self.backend.get('response:{}:{}:{}'.format(user_id, generation, path))
+
+        if cached is None:
+            return None
+
+        return json.loads(cached.decode() if isinstance(cached, bytes) else cached)
+
+    def set(self, user_id, generation, path, etag, data, status):
+        """
+        Caches a response under the generation read before it was produced; so that a response
+        computed while the user wrote can not be served after the write.
+        """
+        self.backend.set('response:{}:{}:{}'.format(user_id, generation, path),
+                         json.dumps([etag, data, status]), ex=self.ttl)
+
+    def invalidate(self, user_id):
+        """ Starts a new generation for the user. Generations are random, so that one is never reused """
+        generation = uuid.uuid4().hex
+        self.backend.set('generation:{}'.format(user_id), generation)
+        return generation
+
+
+def create_response_cache(config):
+    """
+    Builds the response cache described by the RESPONSE_CACHE_* settings;
+    or returns None when response caching is disabled.
+    """
+    backend = config.get('RESPONSE_CACHE_BACKEND')
+
+    if not backend:
+        return None
+
+    if backend == 'local':
+        return ResponseCache(LocalBackend(maxsize=config.get('RESPONSE_CACHE_SIZE'),
+                                          ttl=config.get('RESPONSE_CACHE_TTL')),
+                             ttl=config.get('RESPONSE_CACHE_TTL'))
+
+    if backend == 'redis':
+        # Optional dependency, only needed when responses are cached in Redis
+        import redis
+        return ResponseCache(redis.StrictRedis.from_url(config.get('RESPONSE_CACHE_REDIS_URL')),
+                             ttl=config.get('RESPONSE_CACHE_TTL'))
+
+    raise ValueError('Unknown response cache backend: {}'.format(backend))
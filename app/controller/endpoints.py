@@ -1,5 +1,5 @@
-from app.controller.views import Bucketlists, BucketlistDetail, BucketlistItems, \
-    BucketListItemDetail, Register, Login
+from app.controller.views import Bucketlists, BucketlistExport, BucketlistImport, BucketlistDetail, BucketlistItems, \
+    BucketListItemDetail, BucketlistItemsBatch, Register, Login, Refresh, Logout, Sync
 
 
 def api_endpoints(api):
@@ -7,10 +7,22 @@ def api_endpoints(api):
 
     api.add_resource(Login, '/auth/login')
 
+    api.add_resource(Refresh, '/auth/refresh')
+
+    api.add_resource(Logout, '/auth/logout')
+
     api.add_resource(Bucketlists, '/bucketlists')
 
+    api.add_resource(BucketlistExport, '/bucketlists/export')
+
+    api.add_resource(BucketlistImport, '/bucketlists/import')
+
+    api.add_resource(Sync, '/sync')
+
     api.add_resource(BucketlistDetail, '/bucketlists/<int:bucketlist_id>')
 
     api.add_resource(BucketlistItems, '/bucketlists/<int:bucketlist_id>/items')
 
+    api.add_resource(BucketlistItemsBatch, '/bucketlists/<int:bucketlist_id>/items/batch')
+
     api.add_resource(BucketListItemDetail, '/bucketlists/<int:bucketlist_id>/items/<int:item_id>')
@@ -0,0 +1,76 @@
+import json
+import zlib
+from itertools import chain, groupby
+
+# Formats a user's data can be exported in, and their content types.
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson',
+                  'json': 'application/json'}
+
+# Bytes of output gathered before a chunk is sent, so that each row does not become a write of its own.
+CHUNK_SIZE = 16 * 1024
+
+
+def export_pieces(rows, username, export_format):
+    """
+    Generates the JSON text of bucketlists and their items, piece by piece, from rows of the
+    bucketlist outer joined to its items; ordered by bucketlist. Only one row is held at a time,
+    so a bucketlist of any size is written out without being loaded whole.
+    ndjson puts each bucketlist on a line of its own; json wraps them all in a single document.
+    """
+    ndjson = export_format == 'ndjson'
+
+    if not ndjson:
+        yield '{"Bucketlists": ['
+
+    for number, (_, bucketlist_rows) in enumerate(groupby(rows, key=lambda row: row.id)):
+        first = next(bucketlist_rows)
+        bucketlist = json.dumps({'id': first.id,
+                                 'name': first.name,
+                                 'created_by': username,
+                                 'date_created': str(first.creation_date),
+                                 'date_modified': str(first.modification_date)})
+
+        yield '{}{}, "items": ['.format('' if ndjson or not number else ', ', bucketlist[:-1])
+
+        # A bucketlist without items is joined to a single row of nulls
+        if first.item_id is not None:
+            for item_number, row in enumerate(chain([first], bucketlist_rows)):
+                item = json.dumps({'id': row.item_id,
+                                   'name': row.item_name,
+                                   'done': row.completed,
+                                   'date_created': str(row.item_creation_date),
+                                   'date_modified': str(row.item_modification_date)})
+                yield item if not item_number else ', ' + item
+
+        yield ']}\n' if ndjson else ']}'
+
+    if not ndjson:
+        yield ']}\n'
+
+
+def buffered(pieces, size=CHUNK_SIZE):
+    """ Joins pieces of text into encoded chunks of about size bytes """
+    chunk, length = [], 0
+
+    for piece in pieces:
+        chunk.append(piece)
+        length += len(piece)
+
+        if length >= size:
+            yield ''.join(chunk).encode()
+            chunk, length = [], 0
+
+    if chunk:
+        yield ''.join(chunk).encode()
+
+
+def gzipped(chunks):
+    """ Compresses a stream of chunks on the fly into a single gzip member """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+
+    yield compressor.flush()
@@ -0,0 +1,246 @@
+import hmac
+import time
+from bisect import bisect_left
+from threading import Lock
+from flask import Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+ROW_BUCKETS = (1, 10, 100, 1000, 10000, 100000)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Statements whose row counts are counted; sqlite3 reports none for a SELECT, so reads are left out on every driver
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+class Histogram:
+    """
+    Thread safe histogram of observations, one series per combination of label values,
+    exposed in the Prometheus text format.
+    """
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = Lock()
+
+    def observe(self, labels, value):
+        """ Records value under the series of labels, a tuple ordered like labelnames """
+        index = bisect_left(self.buckets, value)
+
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Observations per bucket, the last one being +Inf; then their sum
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0]
+
+            series[index] += 1
+            series[-1] += value
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def expose(self):
+        """ The histogram's lines in the Prometheus text exposition format """
+        lines = ['# HELP {} {}'.format(self.name, self.documentation),
+                 '# TYPE {} histogram'.format(self.name)]
+
+        with self._lock:
+            series = sorted((labels, list(values)) for labels, values in self._series.items())
+
+        for labels, values in series:
+            label_pairs = ['{}="{}"'.format(name, escape(value)) for name, value in zip(self.labelnames, labels)]
+            cumulative = 0
+
+            for bound, observations in zip(self.buckets + ('+Inf',), values):
+                cumulative += observations
+                lines.append('{}_bucket{{{}}} {}'.format(
+                    self.name, ','.join(label_pairs + ['le="{}"'.format(bound)]), cumulative))
+
+            lines.append('{}_sum{{{}}} {}'.format(self.name, ','.join(label_pairs), values[-1]))
+            lines.append('{}_count{{{}}} {}'.format(self.name, ','.join(label_pairs), cumulative))
+
+        return lines
+
+
+def escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def cache_lines(name, documentation, stats):
+    """
+    The lines of a cache's stats() in the Prometheus text exposition format: its hits, misses and
+    evictions as counters, and its size and maxsize as gauges.
+    """
+    lines = []
+    for stat, kind in [('hits', 'counter'), ('misses', 'counter'), ('evictions', 'counter'),
+                       ('size', 'gauge'), ('maxsize', 'gauge')]:
+        metric = '{}_{}{}'.format(name, stat, '_total' if kind == 'counter' else '')
+        lines.extend(['# HELP {} {}: {}.'.format(metric, documentation, stat),
+                      '# TYPE {} {}'.format(metric, kind),
+                      '{} {}'.format(metric, stats.get(stat))])
+    return lines
+
+
+LABELS = ('endpoint', 'method', 'status')
+
+request_duration = Histogram('bucketlist_request_duration_seconds',
+                             'Wall time taken to handle a request.', LABELS, LATENCY_BUCKETS)
+database_duration = Histogram('bucketlist_request_database_duration_seconds',
+                              'Time spent executing SQL statements while handling a request.',
+                              LABELS, LATENCY_BUCKETS)
+request_statements = Histogram('bucketlist_request_statements',
+                               'SQL statements executed while handling a request.', LABELS, STATEMENT_BUCKETS)
+request_rows_returned = Histogram('bucketlist_request_rows_returned',
+                                  'Rows fetched from the results of the SQL statements of a request.',
+                                  LABELS, ROW_BUCKETS)
+request_rows_written = Histogram('bucketlist_request_rows_written',
+                                 'Rows inserted, updated or deleted by the SQL statements of a request.',
+                                 LABELS, ROW_BUCKETS)
+
+HISTOGRAMS = (request_duration, database_duration, request_statements, request_rows_returned,
+              request_rows_written)
+
+
+class RequestStatistics:
+    """ What one request has spent so far; kept on flask.g for the request's duration """
+    __slots__ = ('started', 'database_time', 'statements', 'rows_returned', 'rows_written')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.database_time = 0.0
+        self.statements = 0
+        self.rows_returned = 0
+        self.rows_written = 0
+
+
+class CountingCursor:
+    """
+    DBAPI cursor counting the rows fetched from it towards a request's statistics; as no driver
+    reports the rows a SELECT returned before they are fetched, and sqlite3 not even then.
+    """
+    __slots__ = ('cursor', 'statistics')
+
+    def __init__(self, cursor, statistics):
+        self.cursor = cursor
+        self.statistics = statistics
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        if row is not None:
+            self.statistics.rows_returned += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self.cursor.fetchmany(*args, **kwargs)
+        self.statistics.rows_returned += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self.cursor.fetchall()
+        self.statistics.rows_returned += len(rows)
+        return rows
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        conn.info['query_started'] = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('query_started', None)
+    statistics = getattr(g, 'request_statistics', None) if has_request_context() else None
+
+    if started is None or statistics is None:
+        return
+
+    statistics.database_time += time.perf_counter() - started
+    statistics.statements += 1
+
+    if cursor.rowcount > 0 and statement.lstrip()[:6].upper() in WRITE_STATEMENTS:
+        statistics.rows_written += cursor.rowcount
+
+    # The statement's result is read through the context's cursor, which is built after this event
+    if context is not None and cursor.description is not None:
+        context.cursor = CountingCursor(cursor, statistics)
+
+
+def start_request():
+    g.request_statistics = RequestStatistics()
+
+
+def record_request(response):
+    """ Observes the finished request and tells the client where its time went """
+    statistics = getattr(g, 'request_statistics', None)
+    if statistics is None:
+        return response
+
+    elapsed = time.perf_counter() - statistics.started
+    labels = (request.endpoint or 'unmatched', request.method, str(response.status_code))
+
+    request_duration.observe(labels, elapsed)
+    database_duration.observe(labels, statistics.database_time)
+    request_statements.observe(labels, statistics.statements)
+    request_rows_returned.observe(labels, statistics.rows_returned)
+    request_rows_written.observe(labels, statistics.rows_written)
+
+    response.headers.add('Server-Timing', 'db;dur={:.2f};desc="{} statements", total;dur={:.2f}'.format(
+        statistics.database_time * 1000, statistics.statements, elapsed * 1000))
+    return response
+
+
+def allowed(config):
+    """ Whether the request may read the metrics: from one of METRICS_ALLOWED_ADDRESSES, or with METRICS_TOKEN """
+    token = config.get('METRICS_TOKEN')
+    if token and hmac.compare_digest(request.headers.get('Authorization', '').encode(),
+                                     'Bearer {}'.format(token).encode()):
+        return True
+
+    return request.remote_addr in (config.get('METRICS_ALLOWED_ADDRESSES') or ())
+
+
+def metrics():
+    """ The request histograms, for Prometheus to scrape """
+    if not allowed(current_app.config):
+        return Response('Forbidden', status=403)
+
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.expose())
+    for collector in current_app.extensions['metrics_collectors']:
+        lines.extend(collector())
+
+    return Response('\n'.join(lines) + '\n', content_type=CONTENT_TYPE)
+
+
+def instrument(app):
+    """
+    Records the endpoint, status, wall time, database time, statement count, rows returned and written
+    of every request the app handles, serving them as histograms on app's METRICS_PATH;
+    to its allowed addresses and the holders of its metrics token only.
+    Database time and statements are those of the engines passed to instrument_engine.
+    """
+    app.extensions['metrics_collectors'] = []
+    app.before_request(start_request)
+    app.after_request(record_request)
+    app.add_url_rule(app.config.get('METRICS_PATH', '/metrics'), 'metrics', metrics)
+
+
+def add_collector(app, collector):
+    """ Has app's metrics include the lines collector returns, if the app is instrumented """
+    if 'metrics_collectors' in app.extensions:
+        app.extensions['metrics_collectors'].append(collector)
+
+
+def instrument_engine(engine):
+    """ Counts the statements engine executes, and the time they take, towards the request running them """
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
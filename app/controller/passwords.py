@@ -0,0 +1,167 @@
+import base64
+import hashlib
+import hmac
+import os
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore
+
+
+class HasherBusy(RuntimeError):
+    """ Raised when every worker and queue slot of the password hasher is taken """
+
+
+def b64encode(raw):
+    return base64.b64encode(raw).decode().rstrip('=')
+
+
+def b64decode(encoded):
+    return base64.b64decode(encoded + '=' * (-len(encoded) % 4))
+
+
+class PBKDF2Hasher:
+    """ PBKDF2-HMAC-SHA256, stored as $pbkdf2-sha256$<iterations>$<salt>$<hash> """
+    algorithm = 'pbkdf2-sha256'
+
+    def __init__(self, iterations):
+        self.iterations = iterations
+
+    @property
+    def parameters(self):
+        return str(self.iterations)
+
+    def derive(self, password, salt, parameters):
+        return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, int(parameters))
+
+
+class ScryptHasher:
+    """ scrypt, stored as $scrypt$n=<cost>,r=<block size>,p=<parallelism>$<salt>$<hash> """
+    algorithm = 'scrypt'
+
+    def __init__(self, n, r, p):
+        if not hasattr(hashlib, 'scrypt'):
+            raise ValueError('scrypt needs Python 3.6 or later, built against OpenSSL 1.1')
+        self.n = n
+        self.r = r
+        self.p = p
+
+    @property
+    def parameters(self):
+        return 'n={},r={},p={}'.format(self.n, self.r, self.p)
+
+    def derive(self, password, salt, parameters):
+        cost = dict(parameter.split('=') for parameter in parameters.split(','))
+        n, r, p = int(cost.get('n')), int(cost.get('r')), int(cost.get('p'))
+
+        # OpenSSL's default 32MB memory ceiling is too low for the larger work factors
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                              maxmem=128 * n * r * p + 1024 * 1024 * 32)
+
+
+class PasswordHasher:
+    """
+    Hashes passwords with the configured key derivation function, and verifies them
+    against any format stored before: other work factors or algorithms, and the
+    legacy unversioned sha256(password + SECRET_KEY) hexdigest.
+
+    Hashing runs on a bounded pool of worker threads, so that a burst of logins
+    queues up for CPU instead of occupying every request thread at once.
+    """
+    SALT_BYTES = 16
+
+    def __init__(self, hasher, secret_key, workers=4, queue_size=32, timeout=10):
+        self.hasher = hasher
+        self.hashers = {hasher.algorithm: hasher}
+        self.secret_key = secret_key
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self._slots = BoundedSemaphore(workers + queue_size)
+        self._dummy_hash = None
+
+    def submit(self, function, *args, wait=True):
+        """
+        Runs function on the worker pool. Raises HasherBusy if no slot frees up within the
+        timeout; or straight away, when not told to wait.
+        """
+        if not (self._slots.acquire(timeout=self.timeout) if wait else self._slots.acquire(blocking=False)):
+            raise HasherBusy('Password hashing queue is full')
+
+        try:
+            future = self.executor.submit(function, *args)
+        except Exception:
+            self._slots.release()
+            raise
+
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hash(self, password):
+        """ Versioned hash of password, made with the configured algorithm and work factors """
+        return self.submit(self.hash_now, password).result()
+
+    def verify(self, password, encoded):
+        """
+        Whether password matches the encoded hash; and whether that hash should be
+        replaced with one made by the configured algorithm and work factors.
+        """
+        return self.submit(self._verify, password, encoded).result()
+
+    def verify_missing(self, password):
+        """
+        Verifies password against a hash of a random one, made with the configured algorithm and
+        work factors; for a login of an unknown user to take as long as one with a wrong password.
+        """
+        if self._dummy_hash is None:
+            self._dummy_hash = self.hash(b64encode(os.urandom(self.SALT_BYTES)))
+        self.verify(password, self._dummy_hash)
+        return False, False
+
+    def hash_now(self, password):
+        """ Like hash, but run on the calling thread; for code already running on a worker """
+        salt = os.urandom(self.SALT_BYTES)
+        derived = self.hasher.derive(password, salt, self.hasher.parameters)
+        return '${}${}${}${}'.format(self.hasher.algorithm, self.hasher.parameters,
+                                     b64encode(salt), b64encode(derived))
+
+    def _verify(self, password, encoded):
+        if not encoded.startswith('$'):
+            legacy = hashlib.sha256((password + self.secret_key).encode()).hexdigest()
+            return hmac.compare_digest(legacy, encoded), True
+
+        try:
+            _, algorithm, parameters, salt, expected = encoded.split('$')
+            hasher = self.hashers.get(algorithm) or self.load(algorithm)
+            derived = hasher.derive(password, b64decode(salt), parameters)
+        except ValueError:
+            return False, False
+
+        outdated = algorithm != self.hasher.algorithm or parameters != self.hasher.parameters
+        return hmac.compare_digest(b64encode(derived), expected), outdated
+
+    def load(self, algorithm):
+        """ A hasher able to verify hashes of algorithm, whatever their work factors """
+        if algorithm == PBKDF2Hasher.algorithm:
+            return PBKDF2Hasher(iterations=1)
+        if algorithm == ScryptHasher.algorithm:
+            return ScryptHasher(n=1, r=1, p=1)
+        raise ValueError('Unknown password hash algorithm {}'.format(algorithm))
+
+
+def create_hasher(config):
+    """ The key derivation function selected by PASSWORD_HASHER, with its configured work factors """
+    algorithm = config.get('PASSWORD_HASHER')
+
+    if algorithm == PBKDF2Hasher.algorithm:
+        return PBKDF2Hasher(iterations=config.get('PASSWORD_PBKDF2_ITERATIONS'))
+    if algorithm == ScryptHasher.algorithm:
+        return ScryptHasher(n=config.get('PASSWORD_SCRYPT_N'), r=config.get('PASSWORD_SCRYPT_R'),
+                            p=config.get('PASSWORD_SCRYPT_P'))
+
+    raise ValueError('Unknown PASSWORD_HASHER {}'.format(algorithm))
+
+
+def create_password_hasher(config):
+    """ Builds the app's password hasher from its config """
+    return PasswordHasher(create_hasher(config), secret_key=config.get('SECRET_KEY'),
+                          workers=config.get('PASSWORD_HASH_WORKERS'),
+                          queue_size=config.get('PASSWORD_HASH_QUEUE_SIZE'),
+                          timeout=config.get('PASSWORD_HASH_TIMEOUT'))
@@ -0,0 +1,39 @@
+from threading import Event, Lock, Thread
+
+
+class Purger:
+    """
+    Runs `purge(app)` on a background thread whenever it is woken, once for each app woken with
+    since its last run; so that a request soft deleting a bucketlist returns without waiting for
+    its items to be deleted. The thread is started by the first wake of each process, forked
+    workers included, and wakes that come while it purges are handled by its next run.
+    """
+    def __init__(self, purge):
+        self.purge = purge
+        self._lock = Lock()
+        self._woken = Event()
+        self._apps = set()
+        self._thread = None
+
+    def wake(self, app):
+        """ Has app's soft deleted rows purged soon """
+        with self._lock:
+            self._apps.add(app)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = Thread(target=self.run, name='purger', daemon=True)
+                self._thread.start()
+        self._woken.set()
+
+    def run(self):
+        while True:
+            self._woken.wait()
+            self._woken.clear()
+
+            with self._lock:
+                apps, self._apps = self._apps, set()
+            for app in apps:
+                try:
+                    self.purge(app)
+                except Exception:
+                    # The rows stay soft deleted, for the next run or `manage.py purge_deleted`
+                    app.logger.exception('Failed to purge soft deleted bucketlists')
@@ -0,0 +1,135 @@
+import time
+from collections import OrderedDict
+
+# Atomically takes a request from the bucket at KEYS[1], given the time now, the seconds a request's
+# token takes to refill and the bucket's size; returning 0, or the seconds to wait when it is empty.
+REDIS_TAKE_SCRIPT = """
+local now, interval, burst = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local tat = math.max(tonumber(redis.call('GET', KEYS[1]) or 0), now)
+local wait = tat - now - (burst - 1) * interval
+if wait > 0 then
+    return tostring(wait)
+end
+redis.call('SET', KEYS[1], tostring(tat + interval), 'PX', math.ceil((tat + interval - now) * 1000))
+return '0'
+"""
+
+
+class LocalBuckets:
+    """
+    In-process token buckets, one per key. Each is kept as the single time at which it will be full
+    again (the generic cell rate algorithm's "theoretical arrival time"), so that taking a token is a
+    dictionary read and write with no lock. Requests racing for the last token of a bucket may both
+    get it; a slight overshoot traded for no contention between request threads. Buckets are kept in
+    the order they were last taken from, so that the least recently used ones are forgotten first.
+    """
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._full_at = OrderedDict()
+
+    def take(self, key, interval, burst):
+        """ Takes a token from the key's bucket; returning 0, or the seconds to wait for one if it is empty """
+        now = time.monotonic()
+        full_at = max(self._full_at.get(key, now), now)
+
+        wait = full_at - now - (burst - 1) * interval
+        if wait > 0:
+            return wait
+
+        self._full_at[key] = full_at + interval
+        try:
+            self._full_at.move_to_end(key)
+        except KeyError:
+            # Pruned by another request in the meantime
+            pass
+
+        if len(self._full_at) > self.maxsize:
+            self.prune(now)
+        return 0
+
+    def prune(self, now):
+        """
+        Forgets the least recently used buckets: those that have refilled, which hold nothing a new
+        bucket would not, and then the oldest of the rest for as long as there are over maxsize.
+        """
+        try:
+            while self._full_at:
+                key, full_at = next(iter(self._full_at.items()))
+                if full_at > now and len(self._full_at) <= self.maxsize:
+                    break
+                self._full_at.pop(key, None)
+        except (RuntimeError, StopIteration):
+            # Another request changed the buckets meanwhile; it prunes them itself if they are still too many
+            pass
+
+    def clear(self):
+        self._full_at.clear()
+
+
+class RedisBuckets:
+    """
+    Token buckets shared by every worker through Redis, each taken from with one round trip to a script.
+    Requests are let through while Redis is unreachable, rather than failing with it.
+    """
+    def __init__(self, client, errors=()):
+        self.client = client
+        self.errors = errors
+        self.script = client.register_script(REDIS_TAKE_SCRIPT)
+
+    def take(self, key, interval, burst):
+        try:
+            return float(self.script(keys=['ratelimit:' + key], args=[time.time(), interval, burst]))
+        except self.errors:
+            return 0
+
+    def clear(self):
+        pass
+
+
+class RateLimiter:
+    """
+    Per route request budgets, spent by each user (or client address) from a bucket of their own.
+    limits maps endpoint names to (requests, seconds): a bucket holds that many requests and refills
+    at that rate, so a client can burst through a whole budget but no faster than it refills after.
+    Endpoints without a budget of their own are each given the 'default' one, which None leaves unlimited.
+    """
+    def __init__(self, backend, limits):
+        self.backend = backend
+        self.limits = limits
+
+    def take(self, endpoint, identity):
+        """ Spends a request of identity's budget for the endpoint; returning 0, or the seconds to wait """
+        limit = self.limits.get(endpoint, self.limits.get('default'))
+
+        if not limit:
+            return 0
+
+        requests, seconds = limit
+        return self.backend.take('{}:{}'.format(endpoint, identity), seconds / requests, requests)
+
+    def clear(self):
+        """ Refills every bucket """
+        self.backend.clear()
+
+
+def create_rate_limiter(config):
+    """
+    Builds the rate limiter described by the RATE_LIMIT_* settings;
+    or returns None when rate limiting is disabled.
+    """
+    backend = config.get('RATE_LIMIT_BACKEND')
+
+    if not backend:
+        return None
+
+    if backend == 'local':
+        return RateLimiter(LocalBuckets(maxsize=config.get('RATE_LIMIT_BUCKETS')), config.get('RATE_LIMITS'))
+
+    if backend == 'redis':
+        # Optional dependency, only needed when request budgets are shared through Redis
+        import redis
+        return RateLimiter(RedisBuckets(redis.StrictRedis.from_url(config.get('RATE_LIMIT_REDIS_URL')),
+                                        errors=(redis.RedisError,)),
+                           config.get('RATE_LIMITS'))
+
+    raise ValueError('Unknown rate limit backend: {}'.format(backend))
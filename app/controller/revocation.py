@@ -0,0 +1,112 @@
+import hashlib
+import math
+import time
+from threading import Lock
+
+
+class BloomFilter:
+    """
+    Fixed size set membership filter. `in` is never wrong about a key that was added;
+    a key that was not added is reported present with a probability near error_rate
+    while fewer than capacity keys have been added.
+    """
+    def __init__(self, capacity=100000, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, key):
+        # Double hashing: the k positions are derived from the two halves of one digest
+        digest = hashlib.sha256(key.encode()).digest()
+        first, second = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:16], 'big') | 1
+        return ((first + index * second) % self.size for index in range(self.hashes))
+
+    def add(self, key):
+        for position in self.positions(key):
+            self.bits[position // 8] |= 1 << position % 8
+
+    def __contains__(self, key):
+        return all(self.bits[position // 8] & 1 << position % 8 for position in self.positions(key))
+
+
+class RevocationList:
+    """
+    In-memory copy of the revoked token ids stored in the database, so that checking a token
+    needs no query. A bloom filter answers for the tokens that were never revoked, nearly all
+    of them, and the exact set settles the rest. Revocations made by other processes are picked
+    up by syncing from the database once every `interval` seconds; those made in this process
+    apply immediately.
+
+    `load(after)` returns the (id, jti, expiry timestamp) of each unexpired revocation stored
+    with an id greater than after.
+    """
+    def __init__(self, load, interval=30, capacity=100000, error_rate=0.001):
+        self.load = load
+        self.interval = interval
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._lock = Lock()
+        self._syncing = Lock()
+        self.clear()
+
+    def clear(self):
+        """ Forgets every revocation, to be loaded afresh at the next check """
+        self.revoked = {}
+        self.filter = BloomFilter(self.capacity, self.error_rate)
+        self.last_id = 0
+        self.synced = None
+
+    def add(self, jti, expiry):
+        """ Marks a token id as revoked until its expiry timestamp """
+        with self._lock:
+            self._add(jti, expiry)
+
+    def _add(self, jti, expiry):
+        self.revoked[jti] = expiry
+        if len(self.revoked) > self.filter.capacity:
+            self._rebuild(self.filter.capacity * 2)
+        else:
+            self.filter.add(jti)
+
+    def _rebuild(self, capacity):
+        self.filter = BloomFilter(capacity, self.error_rate)
+        for jti in self.revoked:
+            self.filter.add(jti)
+
+    def sync(self):
+        """ Loads revocations stored since the last sync, and forgets those that have expired """
+        with self._lock:
+            for revocation_id, jti, expiry in self.load(self.last_id):
+                self._add(jti, expiry)
+                self.last_id = max(self.last_id, revocation_id)
+
+            now = time.time()
+            expired = [jti for jti, expiry in self.revoked.items() if expiry <= now]
+            for jti in expired:
+                del self.revoked[jti]
+            if expired:
+                self._rebuild(max(self.capacity, len(self.revoked)))
+
+            self.synced = time.monotonic()
+
+    def stale(self):
+        return self.synced is None or time.monotonic() - self.synced >= self.interval
+
+    def is_revoked(self, jti):
+        """ Whether the token id has been revoked; syncing first if the last sync is too old """
+        if jti is None:
+            return False
+
+        if self.stale():
+            # Only the first check has to wait; later ones go on with the current copy
+            # while another thread refreshes it
+            if self._syncing.acquire(blocking=self.synced is None):
+                try:
+                    if self.stale():
+                        self.sync()
+                finally:
+                    self._syncing.release()
+
+        return jti in self.filter and jti in self.revoked
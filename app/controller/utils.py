@@ -1,39 +1,395 @@
+import base64
 import datetime
 import hashlib
+import json
+import math
+import time
+import uuid
+from collections import namedtuple
+from types import SimpleNamespace
+from flask import current_app, g, request, Response
 from flask_restful.reqparse import RequestParser
+from sqlalchemy import and_, event, literal, or_, select
+from sqlalchemy.orm.attributes import get_history
+from werkzeug.local import LocalProxy
 import jwt
-from app import session, SECRET_KEY
-from app.database.models import User
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from app import db, session
+from app.database.changes import record_deletion
+from app.database.models import Bucketlist, Item, RevokedToken, User
+from app.database.purge import purge_detached
+from app.database.replicas import SAFE_METHODS
 from functools import wraps
+from . cache import LRUCache, create_response_cache
+from . metrics import add_collector, cache_lines
+from . passwords import HasherBusy, create_password_hasher
+from . purge import Purger
+from . ratelimit import create_rate_limiter
+from . revocation import RevocationList
 
+# Every argument the views take, and the part of the request it is read from.
+ARGUMENT_LOCATIONS = {'name': 'form',
+                      'done': 'form',
+                      'username': 'form',
+                      'password': 'form',
+                      'refresh_token': 'form',
+                      'token': 'headers',
+                      'offset': 'args',
+                      'limit': 'args',
+                      'q': 'args',
+                      'cursor': 'args',
+                      'sort': 'args',
+                      'atomic': 'args',
+                      'format': 'args',
+                      'conflicts': 'args',
+                      'since': 'args',
+                      'fields': 'args',
+                      'expand': 'args'}
 
-class RequestMixin(RequestParser):
-    def __init__(self):
-        """
-        Utility class used for performing generic manipulations on incoming request objects.
-        Initialised with all the arguments to be used by the view classes.
+# Arguments taken by every view that returns a paginated list.
+PAGINATION_ARGUMENTS = ('offset', 'limit', 'cursor', 'sort')
+
+# Lightweight stand in for the authenticated User, safe to share between requests.
+Principal = namedtuple('Principal', ['id', 'username'])
+
+
+def app_helper(name):
+    """
+    Proxy to one of the helpers init_app built with the settings of the current app;
+    or of the app the database falls back on, outside of an app context.
+    """
+    return LocalProxy(lambda: getattr(db.get_app().extensions['helpers'], name))
+
+
+# Principals of recently authenticated users, keyed by username.
+principal_cache = app_helper('principal_cache')
+
+# Optional server side cache of GET responses; None unless RESPONSE_CACHE_BACKEND is set.
+response_cache = app_helper('response_cache')
+
+
+def invalidate_responses(user_id):
+    """ Drops every response cached for a user, after a write to their data """
+    if response_cache:
+        response_cache.invalidate(user_id)
+
+
+def load_revocations(after):
+    """ Unexpired token revocations stored with an id greater than after """
+    revoked = RevokedToken.__table__
+    rows = db.engine.execute(select([revoked.c.id, revoked.c.jti, revoked.c.expires_at])
+                             .where(revoked.c.id > after)
+                             .where(revoked.c.expires_at > datetime.datetime.utcnow()))
+    return [(row.id, row.jti, row.expires_at.replace(tzinfo=datetime.timezone.utc).timestamp()) for row in rows]
+
+
+# Ids of tokens revoked before their expiry, checked by is_authenticated without a query.
+revocation_list = app_helper('revocation_list')
+
+# Request budgets of each user and client address; None unless RATE_LIMIT_BACKEND is set.
+rate_limiter = app_helper('rate_limiter')
+
+# Key derivation function passwords are hashed with, on its own bounded pool of worker threads.
+password_hasher = app_helper('password_hasher')
+
+
+def purge_deleted(app):
+    """ Deletes the bucketlists soft deleted in app's database, with their items, in batches """
+    with app.app_context():
+        return purge_detached(db.engine, app.config.get('PURGE_BATCH_SIZE'))
+
+
+# Background thread deleting soft deleted bucketlists and their items, woken by each soft delete.
+purger = app_helper('purger')
+
+
+def init_app(app):
+    """ Builds the helpers of the views with app's own settings, kept in its extensions; and registers their hooks """
+    helpers = app.extensions['helpers'] = SimpleNamespace(
+        principal_cache=LRUCache(maxsize=app.config.get('PRINCIPAL_CACHE_SIZE'),
+                                 ttl=app.config.get('PRINCIPAL_CACHE_TTL')),
+        response_cache=create_response_cache(app.config),
+        revocation_list=RevocationList(load_revocations, interval=app.config.get('REVOCATION_SYNC_INTERVAL')),
+        rate_limiter=create_rate_limiter(app.config),
+        password_hasher=create_password_hasher(app.config),
+        purger=Purger(purge_deleted))
+
+    app.after_request(record_write)
+    add_collector(app, lambda: cache_lines('bucketlist_principal_cache', 'Cache of authenticated users',
+                                           helpers.principal_cache.stats()))
+
+
+@event.listens_for(User, 'after_insert')
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def invalidate_principal(mapper, connection, user):
+    """
+    Drops the cached principal whenever a user is registered, changed or deleted;
+    including under the username it had before a change.
+    """
+    for username in [user.username] + list(get_history(user, 'username').deleted):
+        principal_cache.delete(username)
+
+
+def rehash_password(app, user_id, stored_hash, password):
+    """
+    Replaces a user's outdated password hash with one made by the configured hasher.
+    Run on a hashing worker, within app's context; the update is skipped if the password
+    changed in the meantime.
+    """
+    user = User.__table__
+    with app.app_context():
+        try:
+            db.engine.execute(user.update()
+                              .where(user.c.id == user_id)
+                              .where(user.c.password == stored_hash)
+                              .values(password=password_hasher.hash_now(password)))
+        except SQLAlchemyError:
+            app.logger.exception('Failed to upgrade the password hash of user %s', user_id)
+
+
+def record_write(response):
+    """
+    Keeps the reads of a client that has just made a write request on the primary, as the replicas
+    may not have its change yet. A streamed response, such as an import's, counts from when it starts.
+    """
+    if request.method not in SAFE_METHODS and g.get('user_id') is not None:
+        return db.replica_router().record_write(response)
+    return response
+
+
+# Column orderings a cursor is allowed to seek on, keyed by the value of the `sort` argument.
+# The primary key always comes last so that every ordering is unique.
+KEYSET_ORDERINGS = {'id': ('id',),
+                    'date_created': ('creation_date', 'id')}
+
+
+class PaginationError(ValueError):
+    """ Raised when the pagination arguments of a request can not be used """
+
+
+class SyncTokenError(ValueError):
+    """ Raised when the sync token of a request can not be used """
+
+
+class OwnershipError(LookupError):
+    """ Raised when the bucketlist or item a request refers to does not exist for the current user """
+
+
+def parse_done(done):
+    """ Converts the `done` argument of a request into a boolean """
+    if str(done).lower() in ('true', '1'):
+        return True
+    if str(done).lower() in ('false', '0'):
+        return False
+    raise ValueError('Done must be true or false')
+
+
+def progress(bucketlist):
+    """ How many of a bucketlist's items are done, out of how many; read from its counters """
+    return {'done': bucketlist.completed_count, 'total': bucketlist.item_count}
+
+
+# A field a response can be narrowed down to with the `fields` argument: the columns it is read from,
+# and how its value is made from a row of them and the current user.
+Field = namedtuple('Field', ['columns', 'value'])
+
+BUCKETLIST_FIELDS = {'id': Field(('id',), lambda row, user: row.id),
+                     'name': Field(('name',), lambda row, user: row.name),
+                     'items': Field(('item_count',),
+                                    lambda row, user: 'None' if not row.item_count else row.item_count),
+                     'progress': Field(('item_count', 'completed_count'), lambda row, user: progress(row)),
+                     'created_by': Field((), lambda row, user: user.username),
+                     'date_created': Field(('creation_date',), lambda row, user: str(row.creation_date)),
+                     'date_modified': Field(('modification_date',), lambda row, user: str(row.modification_date))}
+
+ITEM_FIELDS = {'id': Field(('id',), lambda row, user: row.id),
+               'name': Field(('name',), lambda row, user: row.name),
+               'done': Field(('completed',), lambda row, user: row.completed),
+               'creation_date': Field(('creation_date',), lambda row, user: str(row.creation_date)),
+               'last_modified': Field(('modification_date',), lambda row, user: str(row.modification_date))}
+
+
+class FieldsError(ValueError):
+    """ Raised when a request asks for fields, or expansions, that do not exist """
+
+
+def parse_fields(requested, available, default):
+    """ Names in a comma separated `fields` or `expand` argument; or the default ones when it was not given """
+    if requested is None:
+        return tuple(default)
+
+    names = tuple(name.strip() for name in requested.split(',') if name.strip())
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise FieldsError('Unknown: {}'.format(', '.join(unknown)))
 
+    return names
+
+
+def field_columns(model, fields, available):
+    """
+    The model's columns the fields are read from, to be selected on their own rather than as
+    whole objects; along with those of every keyset ordering, which pagination seeks on.
+    """
+    names = []
+    for name in [column for ordering in KEYSET_ORDERINGS.values() for column in ordering] + \
+            [column for field in fields for column in available[field].columns]:
+        if name not in names:
+            names.append(name)
+
+    return [getattr(model, name) for name in names]
+
+
+def serialised(row, fields, available, user):
+    """ The response dictionary of a row selected by field_columns """
+    return {name: available[name].value(row, user) for name in fields}
+
+
+def encode_cursor(sort, values):
+    """
+    Encodes the sort order and the key values of the last row on a page
+    into an opaque, url safe cursor string.
+    """
+    serialised_values = [value.strftime('%Y-%m-%dT%H:%M:%S.%f') if isinstance(value, datetime.datetime)
+                         else value.isoformat() if isinstance(value, datetime.date)
+                         else value for value in values]
+
+    cursor = json.dumps([sort, serialised_values]).encode()
+    return base64.urlsafe_b64encode(cursor).decode().rstrip('=')
+
+
+def decode_cursor(cursor, model):
+    """
+    Reverses encode_cursor; returning the sort order and the key values
+    converted back to the python types of the model's columns.
+    """
+    try:
+        padded_cursor = cursor + '=' * (-len(cursor) % 4)
+        sort, values = json.loads(base64.urlsafe_b64decode(padded_cursor.encode()).decode())
+        columns = [getattr(model, name) for name in KEYSET_ORDERINGS[sort]]
+
+        if len(values) != len(columns):
+            raise PaginationError('Cursor does not match its sort order')
+
+        loaded_values = []
+        for column, value in zip(columns, values):
+            python_type = column.type.python_type
+
+            if python_type is datetime.datetime:
+                value = datetime.datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%f')
+            elif python_type is datetime.date:
+                value = datetime.datetime.strptime(value, '%Y-%m-%d').date()
+            else:
+                value = python_type(value)
+            loaded_values.append(value)
+
+        return sort, loaded_values
+
+    except (TypeError, ValueError, KeyError, AttributeError):
+        raise PaginationError('Invalid cursor')
+
+
+def encode_sync_token(change_number):
+    """
+    Encodes the number of the last change a client has synced into an opaque, url safe token;
+    along with the time it was issued, which tells whether tombstones it needs have been purged.
+    """
+    token = json.dumps([change_number, int(time.time())]).encode()
+    return base64.urlsafe_b64encode(token).decode().rstrip('=')
+
+
+def decode_sync_token(token):
+    """ Reverses encode_sync_token; returning the change number and the time the token was issued """
+    try:
+        padded_token = token + '=' * (-len(token) % 4)
+        change_number, issued_at = json.loads(base64.urlsafe_b64decode(padded_token.encode()).decode())
+        return int(change_number), int(issued_at)
+
+    except (TypeError, ValueError):
+        raise SyncTokenError('Invalid sync token')
+
+
+def keyset_filter(columns, values):
+    """
+    Builds the row value comparison (columns) > (values) out of plain
+    comparisons, since not every database supports tuple comparisons.
+    """
+    column, value = columns[0], values[0]
+
+    if len(columns) == 1:
+        return column > value
+
+    return or_(column > value,
+               and_(column == value, keyset_filter(columns[1:], values[1:])))
+
+
+class RequestMixin:
+    """
+    Utility class used for performing generic manipulations on incoming request objects.
+    Each view class lists the arguments taken by each of its methods in `arguments`;
+    the token is parsed for every method.
+    """
+    arguments = {}
+
+    # Request parsers built so far, keyed by view class and method.
+    parsers = {}
+
+    @classmethod
+    def request_parser(cls, method):
+        """
+        Returns the parser of the view class's method, building it on first use;
+        so that the parser is built once per process rather than once per request.
         """
-        super().__init__()
-        self.add_argument('name', location='form')
-        self.add_argument('done', location='form')
-        self.add_argument('username', location='form')
-        self.add_argument('password', location='form')
-        self.add_argument('token', location='headers')
-        self.add_argument('offset', location='args')
-        self.add_argument('limit', location='args')
-        self.add_argument('q', location='args')
+        parser = RequestMixin.parsers.get((cls, method))
+
+        if parser is None:
+            parser = RequestParser()
+            for name in ('token',) + tuple(cls.arguments.get(method, ())):
+                parser.add_argument(name, location=ARGUMENT_LOCATIONS[name])
+            RequestMixin.parsers[(cls, method)] = parser
+
+        return parser
+
+    def parse_args(self):
+        """ Arguments of the current request, parsed on the first call and then memoized on the request """
+        parsed_args = getattr(request, 'parsed_args', None)
+
+        if parsed_args is None:
+            parsed_args = self.request_parser(request.method.lower()).parse_args()
+            request.parsed_args = parsed_args
+
+        return parsed_args
 
     def set_password(self, password):
         """
-        Method that salts a password string using the SECRET_KEY;
-        to return a sha256 hashed string.
+        Method that hashes a password string with a salted key derivation function;
+        to return a versioned string that records the algorithm, work factors and salt.
+        """
+        return password_hasher.hash(password)
+
+    def check_password(self, user, password):
+        """
+        Method that checks a password against the hash stored for user.
+        A matching hash made by a legacy format or older work factors is replaced
+        in the background, leaving the login itself to return straight away.
+        Without a user, the password is still checked against a dummy hash, so
+        that the time taken does not tell whether the username exists.
         """
+        if user is None:
+            return password_hasher.verify_missing(password)[0]
+
+        valid, outdated = password_hasher.verify(password, user.password)
 
-        salted_password = password + SECRET_KEY
+        if valid and outdated:
+            try:
+                password_hasher.submit(rehash_password, current_app._get_current_object(),
+                                       user.id, user.password, password, wait=False)
+            except HasherBusy:
+                # Upgraded on a later login instead, when the workers are less busy
+                pass
 
-        hashed_password = hashlib.sha256(salted_password.encode()).hexdigest()
-        return hashed_password
+        return valid
 
     @staticmethod
     def is_authenticated(view_method):
@@ -48,26 +404,193 @@ class RequestMixin(RequestParser):
             try:
 
                 token = self.parse_args()['token']
-                user_data = jwt.decode(token, key=SECRET_KEY)
-                self.current_user = session.query(User).filter_by(username=user_data['username']).first()
-                return view_method(self, **kwargs)
+                user_data = jwt.decode(token, key=current_app.config.get('SECRET_KEY'))
+
+                # Refresh tokens are only good for getting new access tokens
+                if user_data.get('type', 'access') != 'access' or revocation_list.is_revoked(user_data.get('jti')):
+                    return 'Please login', 401
+
+                self.token_claims = user_data
+                self.current_user = self.load_principal(user_data)
+
+            except (AttributeError, KeyError, jwt.ExpiredSignatureError, jwt.InvalidTokenError):
+                return 'Please login', 401
 
-            except (AttributeError, jwt.ExpiredSignatureError, jwt.InvalidTokenError):
+            if not self.current_user:
                 return 'Please login', 401
+
+            # Safe requests read from a replica, unless the client has written something moments ago
+            g.user_id = self.current_user.id
+            router = db.replica_router()
+            g.read_replica = router.replica_for(request.method, router.written_at(request.cookies))
+
+            return self.limit_rate('user:{}'.format(self.current_user.id)) or view_method(self, **kwargs)
         return view_wrapper
 
-    def generate_token(self, username):
+    @staticmethod
+    def limited_by_address(view_method):
+        """
+        Decorator method for view methods that take no token, such as logging in;
+        whose requests are counted against the budget of the client's address instead of a user's.
+        """
+        @wraps(view_method)
+        def view_wrapper(self, **kwargs):
+            return self.limit_rate('address:{}'.format(request.remote_addr)) or view_method(self, **kwargs)
+        return view_wrapper
+
+    def limit_rate(self, identity):
+        """
+        Method that spends a request of identity's budget for the current endpoint.
+        Returns a 429, with a Retry-After header saying when the next request will be let through,
+        once the budget is used up; and None otherwise.
+        """
+        if not rate_limiter:
+            return None
+
+        wait = rate_limiter.take(request.endpoint, identity)
+        if not wait:
+            return None
+
+        retry_after = int(math.ceil(wait))
+        return 'Too many requests, retry in {} seconds'.format(retry_after), 429, {'Retry-After': str(retry_after)}
+
+    @staticmethod
+    def conditional(view_method):
+        """
+        Decorator method for GET view methods, applied within is_authenticated.
+        Tags successful responses with an ETag and answers a request whose If-None-Match
+        carries that ETag with a 304 and no body. The ETag is derived from the user's
+        change counter, which every write to their bucketlists and items bumps, so that
+        a 304 costs one query and no call of the view method. With the response cache
+        enabled, responses are served from the cache without any query.
+        """
+        @wraps(view_method)
+        def view_wrapper(self, **kwargs):
+            cached = None
+
+            if response_cache:
+                generation = response_cache.generation(self.current_user.id)
+                cached = response_cache.get(self.current_user.id, generation, request.full_path)
+
+            if cached:
+                etag, data, status = cached
+            else:
+                # Read before the view's queries: a write in between tags newer data with an older
+                # ETag, costing the client one more full response rather than a stale one.
+                etag = self.response_tag()
+                if request.if_none_match.contains(etag):
+                    return Response(status=304, headers={'ETag': '"{}"'.format(etag)})
+
+                data, status = view_method(self, **kwargs)
+
+                if status != 200:
+                    return data, status
+
+                if response_cache:
+                    response_cache.set(self.current_user.id, generation, request.full_path, etag, data, status)
+
+            if request.if_none_match.contains(etag):
+                return Response(status=304, headers={'ETag': '"{}"'.format(etag)})
+
+            return data, status, {'ETag': '"{}"'.format(etag)}
+        return view_wrapper
+
+    def response_tag(self):
+        """
+        Method that returns the ETag of the current user's response to the request; a digest of
+        the user, the number of changes made to their rows so far, and the path with its query.
+        """
+        change_count = session.query(User.change_count).filter_by(id=self.current_user.id).scalar()
+        validator = '{}:{}:{}:{}'.format(self.current_user.id, self.current_user.username, change_count,
+                                         request.full_path)
+        return hashlib.sha1(validator.encode()).hexdigest()
+
+    @staticmethod
+    def invalidates_responses(view_method):
+        """
+        Decorator method for view methods that write, applied within is_authenticated.
+        A successful write invalidates every response cached for the current user.
+        """
+        @wraps(view_method)
+        def view_wrapper(self, **kwargs):
+            response = view_method(self, **kwargs)
+
+            if response[1] < 400:
+                invalidate_responses(self.current_user.id)
+
+            return response
+        return view_wrapper
+
+    def load_principal(self, user_data):
+        """
+        Method that returns the principal of the user named in a decoded token;
+        from the principal cache when possible, and the database failing that,
+        by the user's id when the token carries it and by username otherwise.
+        Returns None if the user does not exist, deleted ones included.
+        """
+        username = user_data['username']
+        user_id = user_data.get('user_id')
+        principal = principal_cache.get(username)
+
+        if principal is None or user_id not in (None, principal.id):
+            query = session.query(User.id, User.username)
+            user = (query.filter_by(username=username) if user_id is None else query.filter_by(id=user_id)).first()
+            if not user:
+                return None
+
+            principal = Principal(id=user.id, username=user.username)
+
+            # The cached principal must not outlive the token it was loaded for.
+            expiry = user_data.get('exp')
+            principal_cache.set(username, principal,
+                                ttl=None if expiry is None else expiry - time.time())
+
+        return principal
+
+    def generate_token(self, username, user_id=None, token_type='access'):
         """
         Method that takes a username as argument and encodes a token;
-        using the username in the payload
+        using the username, the user's id and a unique token id in the payload.
+        Access tokens are short lived; refresh tokens last longer, and are only
+        accepted by the refresh endpoint.
         """
-        # Token payload is encoded with the new user's username and an expiry period.
+        lifetime = current_app.config.get('REFRESH_TOKEN_TTL' if token_type == 'refresh' else 'ACCESS_TOKEN_TTL')
+
+        # Token payload is encoded with the user's username and id, and an expiry period.
         payload = {'username': username,
-                   "exp": datetime.datetime.utcnow() + datetime.timedelta(seconds=600)}
+                   'type': token_type,
+                   'jti': uuid.uuid4().hex,
+                   "exp": datetime.datetime.utcnow() + datetime.timedelta(seconds=lifetime)}
+        if user_id is not None:
+            payload['user_id'] = user_id
 
-        auth_token = jwt.encode(payload, key=SECRET_KEY).decode()
+        auth_token = jwt.encode(payload, key=current_app.config.get('SECRET_KEY')).decode()
         return auth_token
 
+    def generate_tokens(self, username, user_id):
+        """ Method that issues an access token and a refresh token for a user """
+        return {'auth_token': self.generate_token(username, user_id),
+                'refresh_token': self.generate_token(username, user_id, token_type='refresh')}
+
+    def revoke_token(self, user_data):
+        """
+        Method that revokes a decoded token until it expires.
+        Returns False if the token has no id or was already revoked.
+        """
+        if 'jti' not in user_data or 'exp' not in user_data:
+            return False
+
+        session.add(RevokedToken(jti=user_data['jti'],
+                                 expires_at=datetime.datetime.utcfromtimestamp(user_data['exp'])))
+        try:
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+            return False
+
+        revocation_list.add(user_data['jti'], user_data['exp'])
+        return True
+
     def save(self, obj):
         """ Save an object to the database """
 
@@ -80,17 +603,158 @@ class RequestMixin(RequestParser):
         session.delete(obj)
         session.commit()
 
-    def paginated(self, obj_list):
-        """ Method used to paginate results in an object list """
-        self.page = 1 if not self.parse_args().get('offset') else int(self.parse_args().get('offset'))
-        self.limit = 20 if not self.parse_args().get('limit') else int(self.parse_args().get('limit'))
+    def soft_remove(self, bucketlist):
+        """
+        Detach a bucketlist from its creator, which hides it from them and frees its name at once;
+        the bucketlist and its items are deleted later, in batches, by the purger.
+        """
+        creator_id, bucketlist.creator_id = bucketlist.creator_id, None
+        session.flush()
+
+        # The change tracking triggers only leave tombstones of rows actually deleted
+        record_deletion(session, creator_id, 'bucketlist', bucketlist.id)
+        session.commit()
+        purger.wake(current_app._get_current_object())
+
+    def owned_bucketlist(self, bucketlist_id):
+        """ Query for the id of a bucketlist; which only has a result if it belongs to the current user """
+        return session.query(Bucketlist.id).filter(Bucketlist.id == bucketlist_id,
+                                                   Bucketlist.creator_id == self.current_user.id)
+
+    def get_item(self, bucketlist_id, item_id):
+        """
+        Method that loads an item of one of the current user's bucketlists in a single query,
+        outer joining the item to its bucketlist to tell which of the two does not exist.
+        """
+        owned_item = session.query(Bucketlist.id, Item)\
+            .outerjoin(Item, and_(Item.bucketlist_id == Bucketlist.id, Item.id == item_id))\
+            .filter(Bucketlist.id == bucketlist_id, Bucketlist.creator_id == self.current_user.id).first()
+
+        if not owned_item:
+            raise OwnershipError('Bucketlist does not exist')
+
+        if not owned_item.Item:
+            raise OwnershipError('Item does not exist')
+
+        return owned_item.Item
+
+    def add_item(self, bucketlist_id, values):
+        """
+        Method that inserts an item into one of the current user's bucketlists
+        with a single INSERT ... SELECT, which inserts nothing unless the user owns the bucketlist.
+        """
+        columns = sorted(values)
+        owned_bucketlist = select([literal(values[column]) for column in columns] + [Bucketlist.id])\
+            .where(and_(Bucketlist.id == bucketlist_id, Bucketlist.creator_id == self.current_user.id))
+
+        result = session.execute(Item.__table__.insert().from_select(columns + ['bucketlist_id'], owned_bucketlist))
+        if not result.rowcount:
+            session.rollback()
+            raise OwnershipError('Bucketlist does not exist')
+
+        session.commit()
+
+    def update_item(self, bucketlist_id, item_id, values):
+        """
+        Method that updates an item of one of the current user's bucketlists with a single UPDATE,
+        whose WHERE clause checks ownership. Only when nothing is updated is the item looked up,
+        to tell whether the bucketlist or the item is missing.
+        """
+        updated = session.query(Item)\
+            .filter(Item.id == item_id,
+                    Item.bucketlist_id == bucketlist_id,
+                    self.owned_bucketlist(bucketlist_id).exists())\
+            .update(values, synchronize_session=False)
+
+        if not updated:
+            session.rollback()
+            self.get_item(bucketlist_id, item_id)
+
+        session.commit()
+
+    def delete_item(self, bucketlist_id, item_id):
+        """ Method that deletes an item of one of the current user's bucketlists with a single DELETE """
+        deleted = session.query(Item)\
+            .filter(Item.id == item_id,
+                    Item.bucketlist_id == bucketlist_id,
+                    self.owned_bucketlist(bucketlist_id).exists())\
+            .delete(synchronize_session=False)
+
+        if not deleted:
+            session.rollback()
+            self.get_item(bucketlist_id, item_id)
+
+        session.commit()
+
+    def paginated(self, obj_list, model):
+        """
+        Method used to paginate results in an object list.
+        Supplying a `cursor` argument (empty for the first page) switches from offset
+        pagination to keyset pagination, which seeks past the last row of the previous page.
+        Offset pages keep any ordering already on the list, such as search ranking.
+        """
+        request_args = self.parse_args()
+
+        try:
+            self.limit = 20 if not request_args.get('limit') else int(request_args.get('limit'))
+            self.page = 1 if not request_args.get('offset') else int(request_args.get('offset'))
+        except ValueError:
+            raise PaginationError('Offset and limit must be integers')
+
+        if self.limit < 1:
+            raise PaginationError('Limit must be positive')
+
+        self.cursor_mode = request_args.get('cursor') is not None
+
+        if self.cursor_mode:
+            return self.seek(obj_list, model, request_args.get('cursor'), request_args.get('sort'))
+
+        columns = [getattr(model, name) for name in KEYSET_ORDERINGS['id']]
+        total = obj_list.order_by(None).count()
+        self.total_pages = (total + self.limit - 1) // self.limit
 
-        paginator_obj = obj_list.paginate(1, self.limit)
-        self.total_pages = paginator_obj.pages
+        if not total:
+            return []
 
         # If the requested page number is out of bounds, return the last page.
-        if self.page > self.total_pages:
-            self.page = self.total_pages
+        self.page = min(max(self.page, 1), self.total_pages)
+
+        return obj_list.order_by(*columns).limit(self.limit).offset((self.page - 1) * self.limit).all()
+
+    def seek(self, obj_list, model, cursor, sort):
+        """
+        Method that returns the page following the cursor in a single query.
+        One extra row is fetched to find out whether a next page exists.
+        """
+        if cursor:
+            sort, values = decode_cursor(cursor, model)
+        else:
+            sort, values = sort or 'id', None
+
+        if sort not in KEYSET_ORDERINGS:
+            raise PaginationError('Unknown sort order')
+
+        columns = [getattr(model, name) for name in KEYSET_ORDERINGS[sort]]
+
+        if values:
+            obj_list = obj_list.filter(keyset_filter(columns, values))
+
+        # Any other ordering, such as search ranking, would break seeking past the cursor
+        rows = obj_list.order_by(None).order_by(*columns).limit(self.limit + 1).all()
+
+        self.next_cursor = None
+        if len(rows) > self.limit:
+            rows = rows[:self.limit]
+            self.next_cursor = encode_cursor(sort, [getattr(rows[-1], column.key) for column in columns])
+
+        return rows
+
+    def page_info(self):
+        """ Pagination details to be added to the response of a paginated list """
+        if self.cursor_mode:
+            return {'next_cursor': self.next_cursor}
+
+        if not self.total_pages:
+            return {}
 
-        paginated_list = obj_list.paginate(self.page, self.limit)
-        return paginated_list.items
+        return {'Page': '{} of {}'.format(self.page, self.total_pages)}
@@ -1,12 +1,29 @@
+import json
+import time
+import jwt
+from flask import Response, current_app, request, stream_with_context
 from flask_restful import Resource
 from sqlalchemy.exc import IntegrityError
-from app.database.models import Bucketlist, Item, User
-from app import session
-from . utils import RequestMixin
+from app.database.models import Bucketlist, Item, Tombstone, User
+from app.database.search import search
+from app import db, session
+from . bulk_import import CONFLICT_POLICIES, IMPORT_FORMATS, ImportFailed, import_progress
+from . export import EXPORT_FORMATS, buffered, export_pieces, gzipped
+from . passwords import HasherBusy
+from . utils import RequestMixin, OwnershipError, PaginationError, PAGINATION_ARGUMENTS, parse_done, \
+    invalidate_responses, revocation_list, SyncTokenError, encode_sync_token, decode_sync_token, \
+    BUCKETLIST_FIELDS, ITEM_FIELDS, FieldsError, field_columns, parse_fields, serialised
+
+# Rows inserted per statement by an item batch; three parameters each stays within the
+# 999 bound parameters that older SQLite libraries allow a statement.
+INSERT_ROWS = 300
 
 
 class Register(RequestMixin, Resource):
     """ View class called to register a new user, accessible only via a POST request  """
+    arguments = {'post': ('username', 'password')}
+
+    @RequestMixin.limited_by_address
     def post(self):
         login_data = self.parse_args()
 
@@ -21,19 +38,23 @@ class Register(RequestMixin, Resource):
             return 'Username already exists', 409
 
         # Passwords should not be stored in their raw string form but rather hashed.
-        secure_password = self.set_password(password=login_data.get('password'))
+        try:
+            secure_password = self.set_password(password=login_data.get('password'))
+        except HasherBusy:
+            return 'Too many registrations at once, try again shortly', 503
 
         new_user = User(username=login_data.get('username'),
                         password=secure_password)
         self.save(new_user)
 
-        auth_token = self.generate_token(new_user.username)
-
-        return {'auth_token': auth_token}, 201
+        return self.generate_tokens(new_user.username, new_user.id), 201
 
 
 class Login(RequestMixin, Resource):
     """ Class based view used to log in a user, accessible only via a POST request """
+    arguments = {'post': ('username', 'password')}
+
+    @RequestMixin.limited_by_address
     def post(self):
         login_data = self.parse_args()
 
@@ -44,44 +65,113 @@ class Login(RequestMixin, Resource):
         user = User.query.filter_by(username=login_data.get('username')).first()
 
         # User has to exist and password supplied has to be correct.
-        if not user or self.set_password(login_data.get('password')) != user.password:
-            return 'Check username and password', 401
+        try:
+            if not self.check_password(user, login_data.get('password')) or not user:
+                return 'Check username and password', 401
+        except HasherBusy:
+            return 'Too many logins at once, try again shortly', 503
 
-        # Token payload is encoded with username and expiry date
-        auth_token = self.generate_token(user.username)
+        # Token payloads are encoded with username, user id and expiry date
+        return self.generate_tokens(user.username, user.id), 200
 
-        return {'auth_token': auth_token}, 200
+
+class Refresh(RequestMixin, Resource):
+    """
+    Class based view that exchanges a refresh token for a new access token, accessible only via a POST request.
+    The refresh token is rotated: it is revoked, and a new one returned with the access token.
+    """
+    arguments = {'post': ('refresh_token',)}
+
+    @RequestMixin.limited_by_address
+    def post(self):
+        try:
+            refresh_data = jwt.decode(self.parse_args().get('refresh_token'),
+                                      key=current_app.config.get('SECRET_KEY'))
+        except (AttributeError, jwt.InvalidTokenError):
+            return 'Please login', 401
+
+        if refresh_data.get('type') != 'refresh' or 'user_id' not in refresh_data:
+            return 'Please login', 401
+
+        user = session.query(User.id, User.username).filter_by(id=refresh_data['user_id']).first()
+
+        # A refresh token is only good once; revoking it fails if it has already been used
+        if not user or revocation_list.is_revoked(refresh_data.get('jti')) or not self.revoke_token(refresh_data):
+            return 'Please login', 401
+
+        return self.generate_tokens(user.username, user.id), 200
+
+
+class Logout(RequestMixin, Resource):
+    """
+    Class based view that revokes the access token a request is made with, and the refresh
+    token supplied alongside it; accessible only via a POST request.
+    """
+    arguments = {'post': ('refresh_token',)}
+
+    @RequestMixin.is_authenticated
+    def post(self):
+        self.revoke_token(self.token_claims)
+
+        refresh_token = self.parse_args().get('refresh_token')
+        if refresh_token:
+            try:
+                refresh_data = jwt.decode(refresh_token, key=current_app.config.get('SECRET_KEY'))
+            except jwt.InvalidTokenError:
+                return 'Invalid refresh token', 400
+
+            # Users can only revoke their own refresh tokens
+            if refresh_data.get('type') == 'refresh' and refresh_data.get('user_id') == self.current_user.id:
+                self.revoke_token(refresh_data)
+
+        return 'Logged out', 200
 
 
 class Bucketlists(RequestMixin, Resource):
     """
     Class based view that handles: display of bucketlists using the GET http verb
-    and creation of bucketlists using the POST http verb
+    and creation of bucketlists using the POST http verb.
+    The fields listed can be narrowed down with the `fields` argument.
     """
+    arguments = {'get': ('q', 'fields') + PAGINATION_ARGUMENTS,
+                 'post': ('name',)}
+
+    # Fields of each bucketlist listed when the request names none
+    default_fields = ('id', 'name', 'items', 'progress', 'date_created', 'created_by')
+
     @RequestMixin.is_authenticated
+    @RequestMixin.conditional
     def get(self):
         """ Called for a GET request """
-        bucketlists = Bucketlist.query.filter(Bucketlist.created_by == self.current_user)
+        try:
+            fields = parse_fields(self.parse_args().get('fields'), BUCKETLIST_FIELDS, self.default_fields)
+        except FieldsError:
+            return 'Fields must be among: {}'.format(', '.join(sorted(BUCKETLIST_FIELDS))), 400
 
-        # When search phrase is supplied, re-filter bucketlists with 'contains' constraint
-        if self.parse_args().get('q'):
-            bucketlists = bucketlists.filter(Bucketlist.name.contains(self.parse_args().get('q')))
+        # Only the columns of those fields are read, as plain rows rather than identity mapped Bucketlists;
+        # item counts are kept on each bucketlist, instead of loading or aggregating its items
+        bucketlists = session.query(*field_columns(Bucketlist, fields, BUCKETLIST_FIELDS))\
+            .filter(Bucketlist.creator_id == self.current_user.id)
 
-        if not list(bucketlists):
-            return {'Bucketlists': []}, 200
+        # When search phrase is supplied, re-filter bucketlists to those matching it, best matches first
+        if self.parse_args().get('q'):
+            bucketlists = search(bucketlists, Bucketlist.name, self.parse_args().get('q'))
 
-        paginated_list = self.paginated(bucketlists)
+        try:
+            paginated_list = self.paginated(bucketlists, Bucketlist)
+        except PaginationError:
+            return 'Invalid pagination arguments', 400
 
         # List comprehension that generates individual dictionaries of bucketlists
-        list_of_bucketlists = [{'id': bucketlist.id,
-                                'name': bucketlist.name,
-                                'items': 'None' if not bucketlist.items else len(bucketlist.items),
-                                'date_created': str(bucketlist.creation_date),
-                                'created_by': self.current_user.username} for bucketlist in paginated_list]
-        return {'Bucketlists': list_of_bucketlists,
-                'Page': '{} of {}'.format(self.page, self.total_pages)}, 200
+        list_of_bucketlists = [serialised(bucketlist, fields, BUCKETLIST_FIELDS, self.current_user)
+                               for bucketlist in paginated_list]
+
+        response = {'Bucketlists': list_of_bucketlists}
+        response.update(self.page_info())
+        return response, 200
 
     @RequestMixin.is_authenticated
+    @RequestMixin.invalidates_responses
     def post(self):
         """ Called for a POST request """
 
@@ -92,7 +182,7 @@ class Bucketlists(RequestMixin, Resource):
 
         try:
             new_bucketlist = Bucketlist(name=request_args.get('name'),
-                                        created_by=self.current_user)
+                                        creator_id=self.current_user.id)
             self.save(new_bucketlist)
             return 'Bucketlist successfully created', 200
 
@@ -102,45 +192,247 @@ class Bucketlists(RequestMixin, Resource):
             return 'Bucketlist name already exists', 409
 
 
+class BucketlistExport(RequestMixin, Resource):
+    """
+    Class based view that streams all of a user's bucketlists with their items using the GET http verb;
+    as newline delimited JSON by default, or a single JSON document when format=json.
+    Rows are fetched in batches through a server side cursor where the database supports one,
+    and the output is gzipped on the fly for clients that accept it.
+    """
+    arguments = {'get': ('format',)}
+
+    @RequestMixin.is_authenticated
+    def get(self):
+        """ Called for a GET request """
+        export_format = self.parse_args().get('format') or 'ndjson'
+
+        if export_format not in EXPORT_FORMATS:
+            return 'Export format must be one of: {}'.format(', '.join(sorted(EXPORT_FORMATS))), 400
+
+        rows = session.query(Bucketlist.id,
+                             Bucketlist.name,
+                             Bucketlist.creation_date,
+                             Bucketlist.modification_date,
+                             Item.id.label('item_id'),
+                             Item.name.label('item_name'),
+                             Item.completed,
+                             Item.creation_date.label('item_creation_date'),
+                             Item.modification_date.label('item_modification_date'))\
+            .outerjoin(Item, Item.bucketlist_id == Bucketlist.id)\
+            .filter(Bucketlist.creator_id == self.current_user.id)\
+            .order_by(Bucketlist.id, Item.id)\
+            .yield_per(current_app.config.get('EXPORT_BATCH_SIZE'))
+
+        chunks = buffered(export_pieces(rows, self.current_user.username, export_format))
+        headers = {'Vary': 'Accept-Encoding'}
+
+        if request.accept_encodings['gzip']:
+            chunks = gzipped(chunks)
+            headers['Content-Encoding'] = 'gzip'
+
+        # The session stays open until the last chunk is sent, for the rows to be fetched as they are written
+        return Response(stream_with_context(chunks), content_type=EXPORT_FORMATS.get(export_format),
+                        headers=headers)
+
+
+class BucketlistImport(RequestMixin, Resource):
+    """
+    Class based view that imports bucketlists with their items from an uploaded NDJSON or CSV file,
+    accessible only via a POST request. The file is parsed as it is read and inserted in chunks,
+    all within one transaction; and the response streams a line of JSON counts after each chunk,
+    the last of which says whether the import was committed.
+    """
+    arguments = {'post': ('format', 'conflicts')}
+
+    @RequestMixin.is_authenticated
+    def post(self):
+        """ Called for a POST request """
+        request_args = self.parse_args()
+        import_format = request_args.get('format') or 'ndjson'
+        policy = request_args.get('conflicts') or 'fail'
+
+        if import_format not in IMPORT_FORMATS:
+            return 'Import format must be one of: {}'.format(', '.join(IMPORT_FORMATS)), 400
+
+        if policy not in CONFLICT_POLICIES:
+            return 'Conflict policy must be one of: {}'.format(', '.join(CONFLICT_POLICIES)), 400
+
+        # The file is either uploaded as a form's file field, or sent as the request body
+        upload = request.files.get('file')
+        if upload is not None:
+            stream = upload.stream
+        elif request.content_length and request.mimetype in ('application/x-ndjson', 'text/csv'):
+            stream = request.stream
+        else:
+            return 'Upload the file to import as file, or send it as an application/x-ndjson or text/csv body', 400
+
+        user_id = self.current_user.id
+
+        def progress_lines():
+            counts = {'rows': 0}
+
+            try:
+                with db.engine.begin() as connection:
+                    for counts in import_progress(connection, user_id, stream, import_format, policy,
+                                                  chunk_size=current_app.config.get('IMPORT_CHUNK_SIZE')):
+                        yield json.dumps(counts) + '\n'
+
+            # The transaction is rolled back, leaving none of the file imported
+            except ImportFailed as error:
+                yield json.dumps({'committed': False, 'error': str(error)}) + '\n'
+                return
+
+            invalidate_responses(user_id)
+
+            counts['committed'] = True
+            yield json.dumps(counts) + '\n'
+
+        return Response(stream_with_context(progress_lines()), content_type='application/x-ndjson')
+
+
+class Sync(RequestMixin, Resource):
+    """
+    Class based view that returns the bucketlists and items created, updated and deleted since a sync token
+    using the GET http verb; so that offline clients only download what changed since their last sync.
+    Changes are read in the order they were numbered, a page at a time, from indexes on the change numbers
+    of the user's rows and of the tombstones deleted rows leave. Without a token, or with one older than
+    the tombstones kept, everything is returned; flagged as a reset in the latter case.
+    Items of a deleted bucketlist go with it, rather than being listed as deleted themselves.
+    """
+    arguments = {'get': ('since', 'limit')}
+
+    # Keys the changes of each table are listed under
+    TABLE_KEYS = {'bucketlist': 'bucketlists', 'item': 'items'}
+
+    @RequestMixin.is_authenticated
+    def get(self):
+        """ Called for a GET request """
+        request_args = self.parse_args()
+
+        try:
+            since, issued_at = decode_sync_token(request_args.get('since')) if request_args.get('since') \
+                else (0, None)
+            limit = int(request_args.get('limit') or current_app.config.get('SYNC_PAGE_SIZE'))
+        except (SyncTokenError, ValueError):
+            return 'Invalid sync token or limit', 400
+
+        if limit < 1:
+            return 'Limit must be positive', 400
+        limit = min(limit, current_app.config.get('SYNC_PAGE_SIZE'))
+
+        # The tombstones of deletions since the token may have been purged
+        reset = issued_at is not None and issued_at < time.time() - current_app.config.get('SYNC_TOMBSTONE_TTL')
+        if reset:
+            since = 0
+
+        # Each query reads no more than a page past the token, so the three together cover the page
+        bucketlists = session.query(Bucketlist.id,
+                                    Bucketlist.name,
+                                    Bucketlist.creation_date,
+                                    Bucketlist.modification_date,
+                                    Bucketlist.change_seq,
+                                    Bucketlist.created_seq)\
+            .filter(Bucketlist.creator_id == self.current_user.id, Bucketlist.change_seq > since)\
+            .order_by(Bucketlist.change_seq).limit(limit + 1).all()
+
+        items = session.query(Item.id,
+                              Item.bucketlist_id,
+                              Item.name,
+                              Item.completed,
+                              Item.creation_date,
+                              Item.modification_date,
+                              Item.change_seq,
+                              Item.created_seq)\
+            .join(Bucketlist, Item.bucketlist_id == Bucketlist.id)\
+            .filter(Item.owner_id == self.current_user.id, Item.change_seq > since,
+                    Bucketlist.creator_id == self.current_user.id)\
+            .order_by(Item.change_seq).limit(limit + 1).all()
+
+        # A full sync has no use for tombstones
+        tombstones = session.query(Tombstone.table_name, Tombstone.row_id, Tombstone.change_seq)\
+            .filter(Tombstone.user_id == self.current_user.id, Tombstone.change_seq > since)\
+            .order_by(Tombstone.change_seq).limit(limit + 1).all() if since else []
+
+        changes = sorted([('bucketlist', row) for row in bucketlists] +
+                         [('item', row) for row in items] +
+                         [(None, row) for row in tombstones], key=lambda change: change[1].change_seq)
+        page = changes[:limit]
+
+        response = {state: {'bucketlists': [], 'items': []} for state in ('created', 'updated', 'deleted')}
+
+        for table_name, row in page:
+            if table_name is None:
+                response['deleted'][self.TABLE_KEYS[row.table_name]].append(row.row_id)
+                continue
+
+            change = {'id': row.id,
+                      'name': row.name,
+                      'date_created': str(row.creation_date),
+                      'date_modified': str(row.modification_date)}
+            if table_name == 'item':
+                change.update({'bucketlist_id': row.bucketlist_id, 'done': row.completed})
+
+            response['created' if row.created_seq > since else 'updated'][self.TABLE_KEYS[table_name]].append(change)
+
+        # The token of the next page, or of the next sync once this was the last page
+        last_change = page[-1][1].change_seq if page else since
+        response.update({'sync_token': encode_sync_token(last_change),
+                         'has_more': len(changes) > limit,
+                         'reset': reset})
+        return response, 200
+
+
 class BucketlistDetail(RequestMixin, Resource):
     """
         Class based view that handles: display of a bucketlist's details using the GET http verb
         and updating of a bucketlist using the PUT http verb, as well as deleting
         using the DELETE http verb.
+        The details can be narrowed down with the `fields` argument; and the bucketlist's items,
+        embedded unless `expand` leaves them out, replace their count.
     """
+    arguments = {'get': ('fields', 'expand'),
+                 'put': ('name',)}
+
+    # Fields of the bucketlist, and of each of its items, shown when the request names none
+    default_fields = ('id', 'name', 'progress', 'created_by', 'date_created', 'date_modified')
+    default_item_fields = ('id', 'name', 'done')
 
     @RequestMixin.is_authenticated
+    @RequestMixin.conditional
     def get(self, bucketlist_id):
         """ Called for a GET request """
+        request_args = self.parse_args()
 
-        bucketlist = Bucketlist.query.filter_by(id=bucketlist_id,
-                                                created_by=self.current_user).first()
+        try:
+            fields = parse_fields(request_args.get('fields'), BUCKETLIST_FIELDS, self.default_fields)
+            expand = parse_fields(request_args.get('expand'), ('items',), ('items',))
+        except FieldsError:
+            return 'Fields must be among: {}; and only items can be expanded'.format(
+                ', '.join(sorted(BUCKETLIST_FIELDS))), 400
+
+        bucketlist = session.query(*field_columns(Bucketlist, fields, BUCKETLIST_FIELDS))\
+            .filter(Bucketlist.id == bucketlist_id, Bucketlist.creator_id == self.current_user.id).first()
         if not bucketlist:
             return 'Bucketlist does not exist', 404
 
-        if bucketlist.items:
-            bucketlist_items = [{'id': item.id,
-                                 'name': item.name,
-                                 'done': item.completed} for item in bucketlist.items]
-        else:
-            bucketlist_items = []
+        bucketlist_detail = serialised(bucketlist, fields, BUCKETLIST_FIELDS, self.current_user)
 
-        bucketlist_detail = {'id': bucketlist.id,
-                             'name': bucketlist.name,
-                             'items': bucketlist_items,
-                             'created_by': bucketlist.created_by.username,
-                             'date_created': str(bucketlist.creation_date),
-                             'date_modified': str(bucketlist.modification_date)}
+        if 'items' in expand:
+            items = session.query(*field_columns(Item, self.default_item_fields, ITEM_FIELDS))\
+                .filter(Item.bucketlist_id == bucketlist.id).order_by(Item.id)
+            bucketlist_detail['items'] = [serialised(item, self.default_item_fields, ITEM_FIELDS, self.current_user)
+                                          for item in items]
 
         return bucketlist_detail, 200
 
     @RequestMixin.is_authenticated
+    @RequestMixin.invalidates_responses
     def put(self, bucketlist_id):
         """ Called for a PUT request """
 
         request_args = self.parse_args()
         bucketlist = session.query(Bucketlist).filter_by(id=bucketlist_id,
-                                                         created_by=self.current_user).first()
+                                                         creator_id=self.current_user.id).first()
 
         if bucketlist and request_args.get('name'):
             try:
@@ -160,15 +452,20 @@ class BucketlistDetail(RequestMixin, Resource):
             return 'Bucketlist does not exist', 404
 
     @RequestMixin.is_authenticated
+    @RequestMixin.invalidates_responses
     def delete(self, bucketlist_id):
         """ Called for a DELETE request """
         bucketlist = session.query(Bucketlist).filter_by(id=bucketlist_id,
-                                                         created_by=self.current_user).first()
+                                                         creator_id=self.current_user.id).first()
 
         if not bucketlist:
             return 'Bucketlist does not exist', 404
 
-        self.remove(bucketlist)
+        if current_app.config.get('BUCKETLIST_DELETE_MODE') == 'soft':
+            self.soft_remove(bucketlist)
+        else:
+            # Its items are deleted by the database, however many there are
+            self.remove(bucketlist)
         return 'Bucketlist successfully deleted', 200
 
 
@@ -176,52 +473,64 @@ class BucketlistItems(RequestMixin, Resource):
     """
     View class used to display items in a particular bucketlist using the GET http verb;
      as well as create new items using the POST http verb.
+     The fields listed can be narrowed down with the `fields` argument.
     """
+    arguments = {'get': ('q', 'fields') + PAGINATION_ARGUMENTS,
+                 'post': ('name',)}
+
+    # Fields of each item listed when the request names none
+    default_fields = ('id', 'name', 'done')
 
     @RequestMixin.is_authenticated
+    @RequestMixin.conditional
     def get(self, bucketlist_id):
         """ Called with the GET http verb """
-        bucketlist = Bucketlist.query.filter_by(id=bucketlist_id,
-                                                created_by=self.current_user).first()
+        try:
+            fields = parse_fields(self.parse_args().get('fields'), ITEM_FIELDS, self.default_fields)
+        except FieldsError:
+            return 'Fields must be among: {}'.format(', '.join(sorted(ITEM_FIELDS))), 400
 
-        if not bucketlist:
+        if not self.owned_bucketlist(bucketlist_id).first():
             return 'Bucketlist does not exist', 404
 
-        bucketlist_items = Item.query.filter(Item.bucketlist == bucketlist)
+        # Only the columns of those fields are read, as plain rows rather than identity mapped Items
+        bucketlist_items = session.query(*field_columns(Item, fields, ITEM_FIELDS))\
+            .filter(Item.bucketlist_id == bucketlist_id)
 
-        # When search phrase is supplied, re-filter items with 'contains' constraint
+        # When search phrase is supplied, re-filter items to those matching it, best matches first
         if self.parse_args().get('q'):
-            bucketlist_items = bucketlist_items.filter(Item.name.contains(self.parse_args().get('q')))
+            bucketlist_items = search(bucketlist_items, Item.name, self.parse_args().get('q'))
 
-        # For a bucketlist with no items
-        if not list(bucketlist_items):
-            return {'Items': []}, 200
+        try:
+            paginated_items = self.paginated(bucketlist_items, Item)
+        except PaginationError:
+            return 'Invalid pagination arguments', 400
+
+        bucketlist_items = [serialised(item, fields, ITEM_FIELDS, self.current_user) for item in paginated_items]
 
-        bucketlist_items = [{'id': item.id,
-                             'name': item.name,
-                             'done': item.completed} for item in self.paginated(bucketlist_items)]
-        return {'Items': bucketlist_items,
-                'Page': '{} of {}'.format(self.page, self.total_pages)}, 200
+        response = {'Items': bucketlist_items}
+        response.update(self.page_info())
+        return response, 200
 
     @RequestMixin.is_authenticated
+    @RequestMixin.invalidates_responses
     def post(self, bucketlist_id):
         """ Called with the POST http verb """
         request_args = self.parse_args()
-        bucketlist = session.query(Bucketlist).filter_by(id=bucketlist_id,
-                                                         created_by=self.current_user).first()
-
-        if not bucketlist:
-            return 'Bucketlist does not exist', 404
 
         if not request_args.get('name'):
+            # A missing bucketlist takes precedence over a missing name
+            if not self.owned_bucketlist(bucketlist_id).first():
+                return 'Bucketlist does not exist', 404
             return 'Item name not supplied', 400
 
         try:
-            new_item = Item(name=request_args.get('name'), bucketlist=bucketlist)
-
-            self.save(new_item)
+            self.add_item(bucketlist_id, {'name': request_args.get('name'), 'completed': False})
             return 'New item added successfully', 200
 
+        except OwnershipError as error:
+            return str(error), 404
+
         except IntegrityError:
             session.rollback()
             return 'Item name already exists', 409
@@ -233,19 +542,16 @@ class BucketListItemDetail(RequestMixin, Resource):
          as well as update items using the PUT http verb.
          Also deletes items using the DELETE http verb
     """
+    arguments = {'put': ('name', 'done')}
 
     @RequestMixin.is_authenticated
+    @RequestMixin.conditional
     def get(self, bucketlist_id, item_id):
         """ Called with a GET request """
-        bucketlist = session.query(Bucketlist).filter_by(id=bucketlist_id,
-                                                         created_by=self.current_user).first()
-
-        if not bucketlist:
-            return 'Bucketlist does not exist', 404
-
-        item = Item.query.filter_by(id=item_id, bucketlist=bucketlist).first()
-        if not item:
-            return 'Item does not exist', 404
+        try:
+            item = self.get_item(bucketlist_id, item_id)
+        except OwnershipError as error:
+            return str(error), 404
 
         item_detail = {'id': item.id,
                        'name': item.name,
@@ -255,54 +561,202 @@ class BucketListItemDetail(RequestMixin, Resource):
         return item_detail, 200
 
     @RequestMixin.is_authenticated
+    @RequestMixin.invalidates_responses
     def put(self, bucketlist_id, item_id):
         """ Called with a PUT request """
 
-        bucketlist = session.query(Bucketlist).filter_by(id=bucketlist_id,
-                                                         created_by=self.current_user).first()
-
-        if not bucketlist:
-            return 'Bucketlist does not exist', 404
-
         request_args = self.parse_args()
 
-        # Missing item name
-        if not request_args.get('name') and not request_args.get('done'):
-            return 'Item name needed', 400
-
-        item = session.query(Item).filter_by(id=item_id,
-                                             bucketlist=bucketlist).first()
-
-        if not item:
-            return 'Item does not exist', 404
-
         try:
+            # Missing item name
+            if not request_args.get('name') and not request_args.get('done'):
+                # A missing bucketlist or item takes precedence over a missing name
+                self.get_item(bucketlist_id, item_id)
+                return 'Item name needed', 400
+
+            values = {}
             if request_args.get('name'):
-                item.name = request_args.get('name')
+                values[Item.name] = request_args.get('name')
 
             if request_args.get('done'):
-                item.completed = request_args.get('done')
+                values[Item.completed] = parse_done(request_args.get('done'))
 
-            self.save(item)
+            self.update_item(bucketlist_id, item_id, values)
             return 'Item updated', 200
 
+        except OwnershipError as error:
+            return str(error), 404
+
+        except ValueError as error:
+            return str(error), 400
+
         except IntegrityError:
             session.rollback()
             return 'Item name already exists', 409
 
     @RequestMixin.is_authenticated
+    @RequestMixin.invalidates_responses
     def delete(self, bucketlist_id, item_id):
         """ Called with a DELETE request """
-        bucketlist = session.query(Bucketlist).filter_by(id=bucketlist_id,
-                                                         created_by=self.current_user).first()
+        try:
+            self.delete_item(bucketlist_id, item_id)
+        except OwnershipError as error:
+            return str(error), 404
+
+        return 'Item deleted', 200
+
+
+class BucketlistItemsBatch(RequestMixin, Resource):
+    """
+    View class used to create, update and delete many items of a bucketlist
+    in a single POST request, applied within one transaction.
+    """
+    arguments = {'post': ('atomic',)}
+
+    @RequestMixin.is_authenticated
+    @RequestMixin.invalidates_responses
+    def post(self, bucketlist_id):
+        """ Called with the POST http verb """
+        bucketlist = session.query(Bucketlist.id).filter_by(id=bucketlist_id,
+                                                            creator_id=self.current_user.id).first()
 
         if not bucketlist:
             return 'Bucketlist does not exist', 404
 
-        item = session.query(Item).filter_by(id=item_id,
-                                             bucketlist=bucketlist).first()
-        if not item:
-            return 'Item does not exist', 404
+        operations = request.get_json(silent=True)
 
-        self.remove(item)
-        return 'Item deleted', 200
+        if not isinstance(operations, list) or not operations:
+            return 'Supply a JSON array of operations', 400
+
+        batch_limit = current_app.config.get('ITEM_BATCH_LIMIT')
+        if len(operations) > batch_limit:
+            return 'A batch can not have more than {} operations'.format(batch_limit), 400
+
+        results, deletions, updates, creations = self.plan(bucketlist_id, operations)
+
+        failures = [result for result in results if result.get('status') != 200]
+
+        # An atomic batch is only applied when every one of its operations can be.
+        if failures and str(self.parse_args().get('atomic')).lower() == 'true':
+            return {'Results': results, 'Applied': False}, failures[0].get('status')
+
+        try:
+            if deletions:
+                session.query(Item).filter(Item.bucketlist_id == bucketlist_id,
+                                           Item.id.in_(deletions)).delete(synchronize_session=False)
+            if updates:
+                session.bulk_update_mappings(Item, updates)
+            created_ids = self.insert_items(bucketlist_id, creations) if creations else {}
+            session.commit()
+
+        # Raised when a concurrent request claims one of the names after they were checked
+        except IntegrityError:
+            session.rollback()
+            return 'Item name already exists', 409
+
+        for creation in creations:
+            results[creation.get('index')]['id'] = created_ids.get(creation.get('name'))
+
+        return {'Results': results, 'Applied': True}, 200
+
+    @staticmethod
+    def insert_items(bucketlist_id, creations):
+        """
+        Inserts the created items with multi-row INSERTs of up to INSERT_ROWS rows, rather than one
+        statement per item; and returns their ids, keyed by name, read back with a single query.
+        """
+        item = Item.__table__
+        rows = [{'name': creation.get('name'), 'completed': creation.get('completed'), 'bucketlist_id': bucketlist_id}
+                for creation in creations]
+
+        for start in range(0, len(rows), INSERT_ROWS):
+            session.execute(item.insert().values(rows[start:start + INSERT_ROWS]))
+
+        names = [row.get('name') for row in rows]
+        return dict(session.query(Item.name, Item.id).filter(Item.bucketlist_id == bucketlist_id,
+                                                             Item.name.in_(names)))
+
+    def plan(self, bucketlist_id, operations):
+        """
+        Method that validates the operations in order against the current items;
+        returning a result for each operation and the deletions, updates and creations to apply.
+        The items and names involved are loaded with two queries, and then checked
+        as if the operations were applied one by one. An item can only be changed by one
+        operation of a batch, as deletions, updates and creations are each applied together.
+        """
+        operation_dicts = [operation for operation in operations if isinstance(operation, dict)]
+        item_ids = {operation.get('id') for operation in operation_dicts if isinstance(operation.get('id'), int)}
+        names = {operation.get('name') for operation in operation_dicts if isinstance(operation.get('name'), str)}
+
+        existing_items = session.query(Item.id, Item.name)\
+            .filter(Item.bucketlist_id == bucketlist_id, Item.id.in_(item_ids)).all() if item_ids else []
+        taken_names = session.query(Item.id, Item.name)\
+            .filter(Item.bucketlist_id == bucketlist_id, Item.name.in_(names)).all() if names else []
+
+        item_names = {item.id: item.name for item in existing_items}
+        name_owners = {item.name: item.id for item in existing_items + taken_names}
+
+        results, deletions, updates, creations = [], [], [], []
+        changed = set()
+
+        for index, operation in enumerate(operations):
+            op = operation.get('op') if isinstance(operation, dict) else None
+            name, done = (operation.get('name'), operation.get('done')) if op else (None, None)
+
+            if op not in ('create', 'update', 'delete'):
+                results.append({'op': op, 'status': 400, 'message': 'Unknown operation'})
+                continue
+
+            if done is not None and not isinstance(done, bool):
+                results.append({'op': op, 'status': 400, 'message': 'Done must be true or false'})
+                continue
+
+            if name is not None and (not isinstance(name, str) or not name):
+                results.append({'op': op, 'status': 400, 'message': 'Item name must be a non empty string'})
+                continue
+
+            if op == 'create':
+                if not name:
+                    results.append({'op': op, 'status': 400, 'message': 'Item name not supplied'})
+                elif name in name_owners:
+                    results.append({'op': op, 'status': 409, 'message': 'Item name already exists'})
+                else:
+                    name_owners[name] = None
+                    creations.append({'index': index, 'name': name, 'completed': bool(done)})
+                    results.append({'op': op, 'status': 200, 'message': 'New item added successfully'})
+                continue
+
+            item_id = operation.get('id')
+
+            if isinstance(item_id, int) and item_id in changed:
+                results.append({'op': op, 'id': item_id, 'status': 400,
+                                'message': 'Item already changed by an earlier operation of the batch'})
+
+            elif not isinstance(item_id, int) or item_id not in item_names:
+                results.append({'op': op, 'id': item_id, 'status': 404, 'message': 'Item does not exist'})
+
+            elif op == 'delete':
+                changed.add(item_id)
+                name_owners.pop(item_names.pop(item_id), None)
+                deletions.append(item_id)
+                results.append({'op': op, 'id': item_id, 'status': 200, 'message': 'Item deleted'})
+
+            elif name is None and done is None:
+                results.append({'op': op, 'id': item_id, 'status': 400, 'message': 'Item name needed'})
+
+            elif name is not None and name_owners.get(name, item_id) != item_id:
+                results.append({'op': op, 'id': item_id, 'status': 409, 'message': 'Item name already exists'})
+
+            else:
+                changed.add(item_id)
+                update = {'id': item_id}
+                if name is not None:
+                    name_owners.pop(item_names[item_id], None)
+                    name_owners[name] = item_id
+                    item_names[item_id] = update['name'] = name
+                if done is not None:
+                    update['completed'] = done
+                updates.append(update)
+                results.append({'op': op, 'id': item_id, 'status': 200, 'message': 'Item updated'})
+
+        return results, deletions, updates, creations
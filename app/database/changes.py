@@ -0,0 +1,122 @@
+from sqlalchemy import DDL, DateTime, event, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+
+class utcnow(FunctionElement):
+    """
+    The current UTC time with sub-second precision, computed by the database;
+    for server side defaults and onupdate values of timestamp columns.
+    """
+    type = DateTime()
+    name = 'utcnow'
+
+
+@compiles(utcnow)
+def compile_utcnow(element, compiler, **kw):
+    return 'CURRENT_TIMESTAMP'
+
+
+@compiles(utcnow, 'postgresql')
+def compile_utcnow_postgresql(element, compiler, **kw):
+    # The time of the statement, in microseconds, rather than of the start of its transaction
+    return "TIMEZONE('utc', STATEMENT_TIMESTAMP())"
+
+
+@compiles(utcnow, 'sqlite')
+def compile_utcnow_sqlite(element, compiler, **kw):
+    # Milliseconds are SQLite's best; padded to the microseconds SQLAlchemy writes and parses.
+    # Parenthesised, since SQLite only takes an expression as a column default within brackets.
+    return "(STRFTIME('%Y-%m-%d %H:%M:%f000', 'now'))"
+
+
+SQLITE_CHANGE_DDL = [
+    # Each write takes the next number of its owner's change counter; the row's own numbers are
+    # set by a second UPDATE, since SQLite triggers can not change the row being inserted
+    "CREATE TRIGGER IF NOT EXISTS {table}_change_insert AFTER INSERT ON {table} BEGIN "
+    "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {owner}; "
+    "UPDATE {table} SET change_seq = (SELECT change_count FROM \"user\" WHERE id = {owner}), "
+    "created_seq = (SELECT change_count FROM \"user\" WHERE id = {owner}){sqlite_set_owner} "
+    "WHERE id = new.id; END",
+
+    # Only fires for the columns clients see, so that setting change_seq does not fire it again
+    "CREATE TRIGGER IF NOT EXISTS {table}_change_update AFTER UPDATE OF {columns} ON {table} BEGIN "
+    "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {owner}; "
+    "UPDATE {table} SET change_seq = (SELECT change_count FROM \"user\" WHERE id = {owner}){sqlite_set_owner} "
+    "WHERE id = new.id; END",
+
+    # A deleted row leaves a tombstone behind, numbered like any other change
+    "CREATE TRIGGER IF NOT EXISTS {table}_change_delete AFTER DELETE ON {table} BEGIN "
+    "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {old_owner}; "
+    "INSERT INTO tombstone (user_id, table_name, row_id, change_seq) "
+    "SELECT id, '{table}', old.id, change_count FROM \"user\" WHERE id = {old_owner}; END"
+]
+
+POSTGRES_CHANGE_DDL = [
+    # Updating the owner's counter locks their row until the transaction ends; so the numbers
+    # of a user's changes become visible in the order they were taken, without gaps being filled later
+    "CREATE OR REPLACE FUNCTION {table}_track_change() RETURNS trigger AS $$ "
+    "DECLARE owner_id integer; number integer; BEGIN "
+    "IF TG_OP = 'DELETE' THEN "
+    "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {old_owner} "
+    "RETURNING id, change_count INTO owner_id, number; "
+    "IF FOUND THEN INSERT INTO tombstone (user_id, table_name, row_id, change_seq) "
+    "VALUES (owner_id, '{table}', old.id, number); END IF; "
+    "RETURN OLD; END IF; "
+    "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {owner} "
+    "RETURNING change_count INTO new.change_seq; {postgres_set_owner}"
+    "IF TG_OP = 'INSERT' THEN new.created_seq := new.change_seq; END IF; "
+    "RETURN new; END $$ LANGUAGE plpgsql",
+
+    "CREATE TRIGGER {table}_track_change BEFORE INSERT OR UPDATE OF {columns} ON {table} "
+    "FOR EACH ROW EXECUTE PROCEDURE {table}_track_change()",
+
+    "CREATE TRIGGER {table}_track_deletion AFTER DELETE ON {table} "
+    "FOR EACH ROW EXECUTE PROCEDURE {table}_track_change()"
+]
+
+
+def change_tracking_ddl(table, owner, columns, owner_column=None):
+    """
+    Statements creating the triggers that number every insert, update and delete of a table's rows
+    from its owner's change counter, and leave tombstones of deleted rows; for each dialect. owner is
+    the SQL expression of the owning user's id, written in terms of {row}; columns are those whose
+    updates count as changes. The owner's id is also written to owner_column, if given, on each change.
+    """
+    new_owner = owner.format(row='new')
+    names = {'table': table, 'columns': ', '.join(columns), 'owner': new_owner, 'old_owner': owner.format(row='old'),
+             'sqlite_set_owner': ', {} = {}'.format(owner_column, new_owner) if owner_column else '',
+             'postgres_set_owner': 'new.{} := {}; '.format(owner_column, new_owner) if owner_column else ''}
+
+    return {'sqlite': [statement.format(**names) for statement in SQLITE_CHANGE_DDL],
+            'postgresql': [statement.format(**names) for statement in POSTGRES_CHANGE_DDL]}
+
+
+def add_change_tracking(model, owner, columns, owner_column=None):
+    """
+    Registers DDL that creates the change tracking triggers of the model's table along with it.
+    Triggers rather than ORM events, so that bulk and Core writes such as imports are counted too.
+    """
+    model_table = model.__table__
+
+    for dialect, statements in change_tracking_ddl(model_table.name, owner, columns, owner_column).items():
+        for statement in statements:
+            event.listen(model_table, 'after_create', DDL(statement).execute_if(dialect=dialect))
+
+    event.listen(model_table, 'after_drop',
+                 DDL('DROP FUNCTION IF EXISTS {}_track_change()'.format(model_table.name))
+                 .execute_if(dialect='postgresql'))
+
+
+# Numbers a deletion the triggers can not see, such as a soft delete, and leaves its tombstone
+RECORD_DELETION = [
+    text('UPDATE "user" SET change_count = change_count + 1 WHERE id = :user_id'),
+    text('INSERT INTO tombstone (user_id, table_name, row_id, change_seq) '
+         'SELECT id, :table_name, :row_id, change_count FROM "user" WHERE id = :user_id')
+]
+
+
+def record_deletion(connection, user_id, table_name, row_id):
+    """ Leaves the tombstone of a row the user no longer sees, numbered like any other of their changes """
+    for statement in RECORD_DELETION:
+        connection.execute(statement, {'user_id': user_id, 'table_name': table_name, 'row_id': row_id})
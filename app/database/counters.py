@@ -0,0 +1,65 @@
+from sqlalchemy import DDL, event
+
+# 1 for a completed item and 0 otherwise, including one whose completion was never set
+COMPLETED = 'CASE WHEN {row}.completed THEN 1 ELSE 0 END'
+
+SQLITE_COUNTER_DDL = [
+    "CREATE TRIGGER IF NOT EXISTS item_count_insert AFTER INSERT ON item BEGIN "
+    "UPDATE bucketlist SET item_count = item_count + 1, completed_count = completed_count + {new_completed} "
+    "WHERE id = new.bucketlist_id; END",
+
+    # Takes the item off its old bucketlist's counts and adds it to its new one's, which is the same
+    # bucketlist unless the item was moved; so only changes of completion need to fire it
+    "CREATE TRIGGER IF NOT EXISTS item_count_update AFTER UPDATE OF completed, bucketlist_id ON item BEGIN "
+    "UPDATE bucketlist SET item_count = item_count - 1, completed_count = completed_count - {old_completed} "
+    "WHERE id = old.bucketlist_id; "
+    "UPDATE bucketlist SET item_count = item_count + 1, completed_count = completed_count + {new_completed} "
+    "WHERE id = new.bucketlist_id; END",
+
+    "CREATE TRIGGER IF NOT EXISTS item_count_delete AFTER DELETE ON item BEGIN "
+    "UPDATE bucketlist SET item_count = item_count - 1, completed_count = completed_count - {old_completed} "
+    "WHERE id = old.bucketlist_id; END"
+]
+
+POSTGRES_COUNTER_DDL = [
+    "CREATE OR REPLACE FUNCTION item_count_change() RETURNS trigger AS $$ BEGIN "
+    "IF TG_OP IN ('UPDATE', 'DELETE') THEN "
+    "UPDATE bucketlist SET item_count = item_count - 1, completed_count = completed_count - {old_completed} "
+    "WHERE id = old.bucketlist_id; END IF; "
+    "IF TG_OP IN ('INSERT', 'UPDATE') THEN "
+    "UPDATE bucketlist SET item_count = item_count + 1, completed_count = completed_count + {new_completed} "
+    "WHERE id = new.bucketlist_id; END IF; "
+    "RETURN NULL; END $$ LANGUAGE plpgsql",
+
+    "CREATE TRIGGER item_count_change AFTER INSERT OR UPDATE OF completed, bucketlist_id OR DELETE ON item "
+    "FOR EACH ROW EXECUTE PROCEDURE item_count_change()"
+]
+
+# Sets every bucketlist's counts from its items, for the columns' first values and for repairs
+RECOUNT_ITEMS = ("UPDATE bucketlist SET "
+                 "item_count = (SELECT COUNT(*) FROM item WHERE item.bucketlist_id = bucketlist.id), "
+                 "completed_count = (SELECT COALESCE(SUM({}), 0) FROM item WHERE item.bucketlist_id = bucketlist.id)"
+                 .format(COMPLETED.format(row='item')))
+
+
+def item_counter_ddl():
+    """ Statements creating the triggers that keep each bucketlist's item counts exact, for each dialect """
+    names = {'new_completed': COMPLETED.format(row='new'), 'old_completed': COMPLETED.format(row='old')}
+
+    return {'sqlite': [statement.format(**names) for statement in SQLITE_COUNTER_DDL],
+            'postgresql': [statement.format(**names) for statement in POSTGRES_COUNTER_DDL]}
+
+
+def add_item_counters(model):
+    """
+    Registers DDL that creates the item counting triggers along with the item model's table.
+    Triggers rather than ORM events, like change tracking, so that bulk and Core writes are counted too.
+    """
+    model_table = model.__table__
+
+    for dialect, statements in item_counter_ddl().items():
+        for statement in statements:
+            event.listen(model_table, 'after_create', DDL(statement).execute_if(dialect=dialect))
+
+    event.listen(model_table, 'after_drop',
+                 DDL('DROP FUNCTION IF EXISTS item_count_change()').execute_if(dialect='postgresql'))
@@ -1,34 +1,57 @@
-from datetime import datetime
 from app import db
+from .changes import add_change_tracking, utcnow
+from .counters import add_item_counters
+from .search import add_search_index
 
 
 class Bucketlist(db.Model):
     __tablename__ = 'bucketlist'
+    # Bucketlists are always looked up within their creator's, so names only have to be unique there.
+    __table_args__ = (db.UniqueConstraint('creator_id', 'name', name='uq_bucketlist_creator_id_name'),
+                      db.Index('ix_bucketlist_creator_id_id', 'creator_id', 'id'),
+                      db.Index('ix_bucketlist_creator_id_change_seq', 'creator_id', 'change_seq'))
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(120), unique=True, nullable=False)
-    creation_date = db.Column(db.Date,
-                              default=datetime.now().date(),
+    name = db.Column(db.String(120), nullable=False)
+    creation_date = db.Column(db.DateTime,
+                              server_default=utcnow(),
                               nullable=False)
-    modification_date = db.Column(db.Date,
-                                  default=datetime.now().date(),
-                                  onupdate=datetime.now().date(),
+    modification_date = db.Column(db.DateTime,
+                                  server_default=utcnow(),
+                                  onupdate=utcnow(),
                                   nullable=False)
+    # Numbers of the creator's changes that created and last wrote the row; set by the change tracking triggers
+    change_seq = db.Column(db.Integer)
+    created_seq = db.Column(db.Integer)
+    # Numbers of the bucketlist's items, and of those done; kept exact by the item counting triggers
+    item_count = db.Column(db.Integer, nullable=False, server_default='0')
+    completed_count = db.Column(db.Integer, nullable=False, server_default='0')
     creator_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    items = db.relationship('Item', backref='bucketlist')
+    # Items are deleted along with their bucketlist by the database, without being loaded first
+    items = db.relationship('Item', backref='bucketlist', cascade='all, delete-orphan', passive_deletes=True)
 
 
 class Item(db.Model):
     __tablename__ = 'item'
+    # Items are always looked up within their bucketlist, so names only have to be unique there.
+    __table_args__ = (db.UniqueConstraint('bucketlist_id', 'name', name='uq_item_bucketlist_id_name'),
+                      db.Index('ix_item_bucketlist_id_id', 'bucketlist_id', 'id'),
+                      db.Index('ix_item_owner_id_change_seq', 'owner_id', 'change_seq'))
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120),
-                     unique=True,
                      nullable=False)
-    creation_date = db.Column(db.Date, default=datetime.now().date())
-    modification_date = db.Column(db.Date,
-                                  default=datetime.now().date(),
-                                  onupdate=datetime.now().date())
+    creation_date = db.Column(db.DateTime, server_default=utcnow())
+    modification_date = db.Column(db.DateTime,
+                                  server_default=utcnow(),
+                                  onupdate=utcnow())
+    # Numbers of the bucketlist creator's changes that created and last wrote the row;
+    # set by the change tracking triggers
+    change_seq = db.Column(db.Integer)
+    created_seq = db.Column(db.Integer)
+    # Id of the bucketlist creator when the row was last written, set by the same triggers; so that a
+    # user's changed items are one range of an index, rather than gathered from each of their bucketlists
+    owner_id = db.Column(db.Integer)
     completed = db.Column(db.Boolean, default=False)
-    bucketlist_id = db.Column(db.Integer, db.ForeignKey('bucketlist.id'))
+    bucketlist_id = db.Column(db.Integer, db.ForeignKey('bucketlist.id', ondelete='CASCADE'))
 
 
 class User(db.Model):
@@ -36,4 +59,39 @@ class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(30), unique=True, nullable=False)
     password = db.Column(db.String(300), nullable=False)
+    # Counts every write to the user's bucketlists and items, so that "what changed since" is one range query
+    change_count = db.Column(db.Integer, nullable=False, server_default='0')
     bucketlists = db.relationship('Bucketlist', backref='created_by')
+
+
+class RevokedToken(db.Model):
+    """ A token revoked before its expiry; the row can be deleted once that has passed """
+    __tablename__ = 'revoked_token'
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(32), unique=True, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class Tombstone(db.Model):
+    """
+    A deleted bucketlist or item, left behind by the change tracking triggers for clients
+    syncing their changes; the row can be deleted once no sync token is old enough to need it.
+    """
+    __tablename__ = 'tombstone'
+    __table_args__ = (db.Index('ix_tombstone_user_id_change_seq', 'user_id', 'change_seq'),)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    table_name = db.Column(db.String(30), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    change_seq = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, server_default=utcnow(), nullable=False, index=True)
+
+
+add_search_index(Bucketlist)
+add_search_index(Item)
+
+add_change_tracking(Bucketlist, owner='{row}.creator_id', columns=['name', 'creator_id'])
+add_change_tracking(Item, owner='(SELECT creator_id FROM bucketlist WHERE id = {row}.bucketlist_id)',
+                    columns=['name', 'completed', 'bucketlist_id'], owner_column='owner_id')
+
+add_item_counters(Item)
@@ -0,0 +1,65 @@
+import os
+from sqlalchemy import event, exc, select
+
+
+def ping_connection(connection, branch):
+    """
+    Engine `engine_connect` listener that checks a pooled connection is still alive
+    before it is used, so connections dropped by the database server are replaced
+    instead of failing the request that happens to check them out.
+    """
+    # Branches share the connection of their parent, which has been pinged already.
+    if branch:
+        return
+
+    save_should_close_with_result = connection.should_close_with_result
+    connection.should_close_with_result = False
+
+    try:
+        connection.scalar(select([1]))
+
+    except exc.DBAPIError as err:
+        # A disconnect invalidates the whole pool; retrying reconnects with a fresh connection.
+        if err.connection_invalidated:
+            connection.scalar(select([1]))
+        else:
+            raise
+
+    finally:
+        connection.should_close_with_result = save_should_close_with_result
+
+
+def protect_from_fork(engine):
+    """
+    Keeps a process from using the pooled connections of the process it was forked from, such as a
+    prefork server's master that used the database before forking its workers. Both processes would
+    talk over the same socket, garbling each other's conversations with the database; so a connection
+    checked out in another process than the one that opened it is dropped, without being closed, and
+    replaced by a new one.
+    """
+    @event.listens_for(engine, 'connect')
+    def record_pid(dbapi_connection, connection_record):
+        connection_record.info['pid'] = os.getpid()
+
+    @event.listens_for(engine, 'checkout')
+    def check_pid(dbapi_connection, connection_record, connection_proxy):
+        pid = os.getpid()
+        if connection_record.info['pid'] != pid:
+            connection_record.connection = connection_proxy.connection = None
+            raise exc.DisconnectionError('Connection opened by process {} checked out by process {}'
+                                         .format(connection_record.info['pid'], pid))
+
+
+def enforce_foreign_keys(engine):
+    """
+    Turns on SQLite's enforcement of foreign keys, ON DELETE CASCADE included,
+    which it leaves off unless each connection asks for it.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def enable_foreign_keys(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys = ON')
+        cursor.close()
@@ -0,0 +1,35 @@
+from sqlalchemy import text
+
+# A bucketlist without a creator was soft deleted: no user's queries see it any more,
+# and it waits, along with its items, for purge_detached to delete it
+PURGE_ITEMS = text("DELETE FROM item WHERE id IN (SELECT item.id FROM item "
+                   "JOIN bucketlist ON bucketlist.id = item.bucketlist_id "
+                   "WHERE bucketlist.creator_id IS NULL LIMIT :batch_size)")
+
+# Only once their items are gone, so that no one transaction deletes more than a batch of rows
+PURGE_BUCKETLISTS = text("DELETE FROM bucketlist WHERE id IN (SELECT id FROM bucketlist "
+                         "WHERE creator_id IS NULL AND NOT EXISTS "
+                         "(SELECT 1 FROM item WHERE item.bucketlist_id = bucketlist.id) LIMIT :batch_size)")
+
+
+def purge_batches(engine, statement, batch_size):
+    """ Runs a purging statement, a transaction each, until it deletes less than a batch; returns the rows deleted """
+    deleted = 0
+    while True:
+        with engine.begin() as connection:
+            rowcount = connection.execute(statement, batch_size=batch_size).rowcount
+        deleted += rowcount
+
+        if rowcount < batch_size:
+            return deleted
+
+
+def purge_detached(engine, batch_size=1000):
+    """
+    Deletes the soft deleted bucketlists and their items in transactions of at most batch_size rows,
+    so that locks are held briefly however many items there are; returns the numbers of items and
+    bucketlists deleted. The tombstones were left when they were soft deleted.
+    """
+    items = purge_batches(engine, PURGE_ITEMS, batch_size)
+    bucketlists = purge_batches(engine, PURGE_BUCKETLISTS, batch_size)
+    return items, bucketlists
@@ -0,0 +1,162 @@
+import itertools
+import time
+import weakref
+from threading import Lock, RLock
+from flask import g, has_request_context
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import event, orm
+
+# Requests that only read, and so may be answered from a replica
+SAFE_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+# Cookie carrying the time of the client's last write, which keeps its reads on the primary
+WRITTEN_AT_COOKIE = 'written_at'
+
+
+class RoutingSession(SignallingSession):
+    """
+    Session that sends the statements of a request to the replica chosen for it, if any, on flask.g;
+    and everything else, flushes included, to the primary.
+    """
+    def get_bind(self, mapper=None, clause=None):
+        if not self._flushing and has_request_context():
+            replica = g.get('read_replica')
+            if replica is not None:
+                return replica
+
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """
+    Flask-SQLAlchemy whose scoped session can route a request's reads to a replica; and which sets up
+    each engine it creates, with the functions given to setup_engines, on the engine's first use.
+    """
+    def __init__(self, *args, **kwargs):
+        self._setup_lock = RLock()
+        super().__init__(*args, **kwargs)
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def init_app(self, app):
+        super().init_app(app)
+        app.extensions['engine_setup'] = []
+        app.extensions['set_up_engines'] = weakref.WeakSet()
+
+    def setup_engines(self, app, setup):
+        """ Has setup called with each of app's engines, primary and replicas, before it is first used """
+        app.extensions['engine_setup'].append(setup)
+
+    def get_engine(self, app=None, bind=None):
+        app = self.get_app(app)
+        engine = super().get_engine(app, bind)
+        set_up = app.extensions['set_up_engines']
+
+        if engine not in set_up:
+            with self._setup_lock:
+                if engine not in set_up:
+                    for setup in app.extensions['engine_setup']:
+                        setup(engine)
+                    set_up.add(engine)
+
+        return engine
+
+    def replica_router(self, app=None):
+        """ The router over app's replicas, built along with their engines on first use """
+        app = self.get_app(app)
+        router = app.extensions.get('replica_router')
+
+        if router is None:
+            with self._setup_lock:
+                router = app.extensions.get('replica_router')
+                if router is None:
+                    router = app.extensions['replica_router'] = create_replica_router(app, self)
+
+        return router
+
+
+class ReplicaRouter:
+    """
+    Chooses the replica each safe request of a user reads from: in turn ('round-robin'), or the one
+    with the fewest connections checked out ('least-connections'). A client's requests read from the
+    primary for sticky_seconds after each write it makes, so it sees its own changes however far the
+    replicas lag behind; the time of its last write is carried by the client itself, in a cookie, so
+    that it holds whichever process or server handles its next request.
+    """
+    def __init__(self, engines, strategy='round-robin', sticky_seconds=10):
+        if strategy not in ('round-robin', 'least-connections'):
+            raise ValueError('Unknown replica strategy: {}'.format(strategy))
+
+        self.engines = list(engines)
+        self.strategy = strategy
+        self.sticky_seconds = sticky_seconds
+        self._turns = itertools.count()
+        self._checked_out = dict.fromkeys(self.engines, 0)
+        self._lock = Lock()
+
+        for engine in self.engines:
+            event.listen(engine, 'checkout', self._counter(engine, 1))
+            event.listen(engine, 'checkin', self._counter(engine, -1))
+
+    def _counter(self, engine, step):
+        def count(*args):
+            with self._lock:
+                self._checked_out[engine] += step
+        return count
+
+    def replica_for(self, method, written_at=None):
+        """
+        The engine a request should read from; or None for the primary. written_at is the time, since
+        the epoch, of the client's last write; times further off than sticky_seconds, either way, are
+        ignored, so that a forged cookie cannot keep a client on the primary for good.
+        """
+        if not self.engines or method not in SAFE_METHODS:
+            return None
+
+        if written_at is not None and abs(time.time() - written_at) < self.sticky_seconds:
+            return None
+
+        if self.strategy == 'least-connections':
+            return min(self.engines, key=self._checked_out.get)
+
+        # next() of a count is atomic, so concurrent requests still take turns
+        return self.engines[next(self._turns) % len(self.engines)]
+
+    def record_write(self, response):
+        """ Has the client of response read from the primary for the next sticky_seconds """
+        if self.engines:
+            response.set_cookie(WRITTEN_AT_COOKIE, '{:.3f}'.format(time.time()), max_age=self.sticky_seconds,
+                                httponly=True)
+        return response
+
+    @staticmethod
+    def written_at(cookies):
+        """ The time of the client's last write, from its request's cookies; None if it has not sent one """
+        try:
+            return float(cookies[WRITTEN_AT_COOKIE])
+        except (KeyError, ValueError):
+            return None
+
+
+def replica_binds(config):
+    """ Names of the binds of the replicas in SQLALCHEMY_REPLICA_URIS: replica-0, replica-1 and so on """
+    return ['replica-{}'.format(number) for number in range(len(config.get('SQLALCHEMY_REPLICA_URIS') or ()))]
+
+
+def configure_replicas(config):
+    """
+    Adds the read replicas in SQLALCHEMY_REPLICA_URIS to the app's database binds, so that
+    Flask-SQLAlchemy creates their engines with the primary's pool settings.
+    No models are bound to them, leaving create_all and drop_all to the primary.
+    """
+    binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+    binds.update(zip(replica_binds(config), config.get('SQLALCHEMY_REPLICA_URIS') or ()))
+    config['SQLALCHEMY_BINDS'] = binds
+
+
+def create_replica_router(app, db):
+    """ Builds the router over the engines of the replica binds added by configure_replicas """
+    return ReplicaRouter([db.get_engine(app, bind=replica) for replica in replica_binds(app.config)],
+                         strategy=app.config.get('SQLALCHEMY_REPLICA_STRATEGY', 'round-robin'),
+                         sticky_seconds=app.config.get('SQLALCHEMY_REPLICA_STICKY_SECONDS', 10))
@@ -0,0 +1,99 @@
+import sqlite3
+from functools import lru_cache
+from sqlalchemy import DDL, event, func, literal_column, select, table, column
+
+# Search indexes only help queries long enough to be made up of trigrams;
+# shorter search phrases fall back to a plain 'contains' filter.
+MIN_SEARCH_LENGTH = 3
+
+SQLITE_SEARCH_DDL = [
+    # External content FTS5 table holding only the trigram index of the names
+    "CREATE VIRTUAL TABLE IF NOT EXISTS {table}_search "
+    "USING fts5(name, content='{table}', content_rowid='id', tokenize='trigram')",
+
+    # Triggers that keep the index in sync with the table it searches
+    "CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} BEGIN "
+    "INSERT INTO {table}_search (rowid, name) VALUES (new.id, new.name); END",
+
+    "CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN "
+    "INSERT INTO {table}_search ({table}_search, rowid, name) VALUES ('delete', old.id, old.name); END",
+
+    "CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE OF name ON {table} BEGIN "
+    "INSERT INTO {table}_search ({table}_search, rowid, name) VALUES ('delete', old.id, old.name); "
+    "INSERT INTO {table}_search (rowid, name) VALUES (new.id, new.name); END",
+
+    # Index the rows that existed before the search table did
+    "INSERT INTO {table}_search ({table}_search) VALUES ('rebuild')"
+]
+
+POSTGRES_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_{table}_name_trgm ON {table} USING gin (name gin_trgm_ops)"
+]
+
+
+@lru_cache()
+def trigram_search_supported(bind):
+    """ Whether the SQLite library in use has FTS5 with its trigram tokenizer (SQLite 3.34 and later) """
+    if sqlite3.sqlite_version_info < (3, 34, 0):
+        return False
+
+    compile_options = [option for (option,) in bind.execute('PRAGMA compile_options')]
+    return 'ENABLE_FTS5' in compile_options
+
+
+def add_search_index(model):
+    """
+    Registers DDL that creates the search index of the model's name column along with its table;
+    an FTS5 table kept in sync by triggers on SQLite, and a trigram index on Postgres.
+    """
+    model_table = model.__table__
+
+    for statement in SQLITE_SEARCH_DDL:
+        event.listen(model_table, 'after_create',
+                     DDL(statement.format(table=model_table.name)).execute_if(
+                         dialect='sqlite',
+                         callable_=lambda ddl, target, bind, **kw: trigram_search_supported(bind.engine)))
+
+    event.listen(model_table, 'before_drop',
+                 DDL('DROP TABLE IF EXISTS {}_search'.format(model_table.name)).execute_if(dialect='sqlite'))
+
+    for statement in POSTGRES_SEARCH_DDL:
+        event.listen(model_table, 'after_create',
+                     DDL(statement.format(table=model_table.name)).execute_if(dialect='postgresql'))
+
+
+def search(query, name_column, phrase):
+    """
+    Filters a query down to rows whose name contains the search phrase, best matches first.
+    Uses the FTS5 table on SQLite, ranked by bm25; and the trigram index on Postgres,
+    ranked by similarity. Any other database gets an unranked 'contains' filter.
+    """
+    bind = query.session.get_bind()
+    dialect = bind.dialect.name
+
+    if dialect == 'postgresql':
+        return query.filter(name_column.ilike(contains_pattern(phrase), escape='\\'))\
+            .order_by(func.similarity(name_column, phrase).desc())
+
+    if dialect == 'sqlite' and len(phrase) >= MIN_SEARCH_LENGTH and trigram_search_supported(bind):
+        search_table = table(name_column.table.name + '_search', column('rowid'), column('rank'))
+
+        # The phrase is quoted so that FTS5 matches it as a string rather than parse it as a query
+        match = literal_column(search_table.name).match('"' + phrase.replace('"', '""') + '"')
+        matches = select([search_table.c.rowid, search_table.c.rank]).where(match).alias()
+
+        # The IN filter lets SQLite drive the query from the match list; on its own the join is
+        # planned as one full-text lookup per candidate row, which makes page counts crawl
+        return query.join(matches, matches.c.rowid == name_column.table.c.id)\
+            .filter(name_column.table.c.id.in_(select([search_table.c.rowid]).where(match)))\
+            .order_by(matches.c.rank)
+
+    return query.filter(name_column.like(contains_pattern(phrase), escape='\\'))
+
+
+def contains_pattern(phrase):
+    """
+    LIKE pattern matching names that contain the phrase, its wildcards and escape character escaped.
+    """
+    return '%' + phrase.replace('\\', r'\\').replace('%', r'\%').replace('_', r'\_') + '%'
@@ -0,0 +1,5 @@
+from app import app
+from app.asgi import ASGIAdapter
+
+# Served with an ASGI server, e.g.: uvicorn asgi:application
+application = ASGIAdapter(app, workers=app.config.get('ASGI_WORKERS'))
@@ -0,0 +1,378 @@
+"""
+Load test and benchmark suite for the REST API.
+
+Seeds configurable data volumes, then drives every route registered by api_endpoints
+through the Flask test client and through a real, threaded WSGI server; reporting p50/p99
+latency, queries per request and throughput for each, and saving the results as JSON
+so that regressions show up when runs of different commits are compared.
+
+Run against SQLite with:
+        APP_SETTINGS=config.Benchmark python -m benchmarks.api --bucketlists 10000 --items 100000
+
+and against a local Postgres by pointing the Benchmark settings at it:
+        BENCHMARK_DATABASE_URI=postgresql://localhost/bucketlist_benchmark APP_SETTINGS=config.Benchmark \\
+        python -m benchmarks.api
+"""
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+from urllib.parse import urlencode
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from werkzeug.serving import WSGIRequestHandler, make_server
+from app import app, db
+from app.controller.utils import RequestMixin
+from app.database.models import Bucketlist, Item
+from . import seed
+
+RESULTS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# A request made against a route: `build` receives the seeded ids and the request's sequence number,
+# and returns the path, form data and body to send, as JSON or as bytes of NDJSON; optionally followed
+# by headers to send in place of the shared access token. It may set up rows first, outside of the timing.
+Scenario = namedtuple('Scenario', ['name', 'method', 'rule', 'build'])
+
+
+def disposable_bucketlist(ids, number):
+    """ Inserts a bucketlist for a scenario to change or delete, leaving the seeded data as it is """
+    return db.engine.execute(Bucketlist.__table__.insert(),
+                             name='Disposable {}'.format(number),
+                             creator_id=ids.get('user_id')).inserted_primary_key[0]
+
+
+def disposable_item(ids, number):
+    """ Inserts an item into the large bucketlist for a scenario to change or delete """
+    return db.engine.execute(Item.__table__.insert(),
+                             name='Disposable {}'.format(number),
+                             bucketlist_id=ids.get('bucketlist_id')).inserted_primary_key[0]
+
+
+def last_offset_page(ids, per_page):
+    """ Number of the last page of the large bucketlist's items, where offset pagination is slowest """
+    total = db.session.query(Item).filter_by(bucketlist_id=ids.get('bucketlist_id')).count()
+    db.session.remove()
+    return max(1, (total + per_page - 1) // per_page)
+
+
+def import_file(number, bucketlists, items):
+    """ NDJSON of bucketlists with items, named apart from those of other requests """
+    return ''.join(json.dumps({'name': 'Imported {} {}'.format(number, bucketlist),
+                               'items': [{'name': 'Item {}'.format(item)} for item in range(items)]}) + '\n'
+                   for bucketlist in range(bucketlists)).encode()
+
+
+def fresh_tokens(ids, number):
+    """ Access and refresh tokens of the benchmark user, for a scenario that uses them up """
+    return RequestMixin().generate_tokens(seed.USERNAME, ids.get('user_id'))
+
+
+SCENARIOS = [
+    Scenario('register', 'POST', '/api/V1/auth/register',
+             lambda ids, n: ('/api/V1/auth/register', {'username': 'user{}'.format(n), 'password': 'password'}, None)),
+    Scenario('login', 'POST', '/api/V1/auth/login',
+             lambda ids, n: ('/api/V1/auth/login', {'username': seed.USERNAME, 'password': seed.PASSWORD}, None)),
+    Scenario('refresh', 'POST', '/api/V1/auth/refresh',
+             lambda ids, n: ('/api/V1/auth/refresh', {'refresh_token': fresh_tokens(ids, n).get('refresh_token')},
+                             None)),
+    Scenario('logout', 'POST', '/api/V1/auth/logout',
+             lambda ids, n: (lambda tokens: ('/api/V1/auth/logout', {'refresh_token': tokens.get('refresh_token')},
+                                             None, {'token': tokens.get('auth_token')}))(fresh_tokens(ids, n))),
+
+    Scenario('list bucketlists', 'GET', '/api/V1/bucketlists',
+             lambda ids, n: ('/api/V1/bucketlists', None, None)),
+    Scenario('list bucketlists, names only', 'GET', '/api/V1/bucketlists',
+             lambda ids, n: ('/api/V1/bucketlists?fields=id,name', None, None)),
+    Scenario('search bucketlists', 'GET', '/api/V1/bucketlists',
+             lambda ids, n: ('/api/V1/bucketlists?q=list 12', None, None)),
+    Scenario('create bucketlist', 'POST', '/api/V1/bucketlists',
+             lambda ids, n: ('/api/V1/bucketlists', {'name': 'Created {}'.format(n)}, None)),
+
+    Scenario('export', 'GET', '/api/V1/bucketlists/export',
+             lambda ids, n: ('/api/V1/bucketlists/export', None, None)),
+
+    Scenario('import 10 bucketlists of 100 items', 'POST', '/api/V1/bucketlists/import',
+             lambda ids, n: ('/api/V1/bucketlists/import', None, import_file(n, bucketlists=10, items=100))),
+
+    Scenario('sync', 'GET', '/api/V1/sync',
+             lambda ids, n: ('/api/V1/sync', None, None)),
+
+    Scenario('get bucketlist', 'GET', '/api/V1/bucketlists/<int:bucketlist_id>',
+             lambda ids, n: ('/api/V1/bucketlists/{}'.format(ids.get('bucketlist_id')), None, None)),
+    Scenario('get bucketlist, items not expanded', 'GET', '/api/V1/bucketlists/<int:bucketlist_id>',
+             lambda ids, n: ('/api/V1/bucketlists/{}?expand='.format(ids.get('bucketlist_id')), None, None)),
+    Scenario('rename bucketlist', 'PUT', '/api/V1/bucketlists/<int:bucketlist_id>',
+             lambda ids, n: ('/api/V1/bucketlists/{}'.format(disposable_bucketlist(ids, n)),
+                             {'name': 'Renamed {}'.format(n)}, None)),
+    Scenario('delete bucketlist', 'DELETE', '/api/V1/bucketlists/<int:bucketlist_id>',
+             lambda ids, n: ('/api/V1/bucketlists/{}'.format(disposable_bucketlist(ids, n)), None, None)),
+
+    Scenario('list items', 'GET', '/api/V1/bucketlists/<int:bucketlist_id>/items',
+             lambda ids, n: ('/api/V1/bucketlists/{}/items'.format(ids.get('bucketlist_id')), None, None)),
+    Scenario('list items, names only', 'GET', '/api/V1/bucketlists/<int:bucketlist_id>/items',
+             lambda ids, n: ('/api/V1/bucketlists/{}/items?fields=id,name'.format(ids.get('bucketlist_id')),
+                             None, None)),
+    Scenario('list items, last offset page', 'GET', '/api/V1/bucketlists/<int:bucketlist_id>/items',
+             lambda ids, n: ('/api/V1/bucketlists/{}/items?offset={}'.format(ids.get('bucketlist_id'),
+                                                                             ids.get('last_page')), None, None)),
+    Scenario('search items', 'GET', '/api/V1/bucketlists/<int:bucketlist_id>/items',
+             lambda ids, n: ('/api/V1/bucketlists/{}/items?q=tem 99'.format(ids.get('bucketlist_id')), None, None)),
+    Scenario('create item', 'POST', '/api/V1/bucketlists/<int:bucketlist_id>/items',
+             lambda ids, n: ('/api/V1/bucketlists/{}/items'.format(ids.get('bucketlist_id')),
+                             {'name': 'Created {}'.format(n)}, None)),
+
+    Scenario('batch of 50 items', 'POST', '/api/V1/bucketlists/<int:bucketlist_id>/items/batch',
+             lambda ids, n: ('/api/V1/bucketlists/{}/items/batch'.format(ids.get('bucketlist_id')), None,
+                             [{'op': 'create', 'name': 'Batch {} {}'.format(n, i)} for i in range(50)])),
+
+    Scenario('get item', 'GET', '/api/V1/bucketlists/<int:bucketlist_id>/items/<int:item_id>',
+             lambda ids, n: ('/api/V1/bucketlists/{}/items/{}'.format(ids.get('bucketlist_id'), ids.get('item_id')),
+                             None, None)),
+    Scenario('update item', 'PUT', '/api/V1/bucketlists/<int:bucketlist_id>/items/<int:item_id>',
+             lambda ids, n: ('/api/V1/bucketlists/{}/items/{}'.format(ids.get('bucketlist_id'),
+                                                                      disposable_item(ids, n)),
+                             {'done': 'true'}, None)),
+    Scenario('delete item', 'DELETE', '/api/V1/bucketlists/<int:bucketlist_id>/items/<int:item_id>',
+             lambda ids, n: ('/api/V1/bucketlists/{}/items/{}'.format(ids.get('bucketlist_id'),
+                                                                      disposable_item(ids, n)),
+                             None, None)),
+]
+
+
+def registered_routes():
+    """ Every (method, rule) pair registered on the app by api_endpoints """
+    return {(method, rule.rule) for rule in app.url_map.iter_rules() if rule.rule.startswith('/api/')
+            for method in rule.methods - {'HEAD', 'OPTIONS'}}
+
+
+def uncovered_routes():
+    """ Registered routes that no scenario exercises; new endpoints have to be added to SCENARIOS """
+    return registered_routes() - {(scenario.method, scenario.rule) for scenario in SCENARIOS}
+
+
+class QueryCounter:
+    """ Counts the SQL statements executed, by any thread, while it is active """
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        event.listen(Engine, 'before_cursor_execute', self.record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(Engine, 'before_cursor_execute', self.record)
+
+    def record(self, *args):
+        with self.lock:
+            self.count += 1
+
+
+class TestClientTransport:
+    """ Sends requests through the Flask test client, without any network or server in the way """
+    name = 'test-client'
+
+    def __init__(self):
+        self.client = app.test_client()
+
+    def send(self, method, path, form, body, headers):
+        data = body if isinstance(body, bytes) else json.dumps(body) if body is not None else form
+        content_type = 'application/x-ndjson' if isinstance(body, bytes) \
+            else 'application/json' if body is not None else None
+        return self.client.open(path, method=method, data=data,
+                                content_type=content_type, headers=headers).status_code
+
+    def close(self):
+        pass
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """ Request handler that does not log every request it serves """
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class WSGIServerTransport:
+    """ Sends requests over HTTP to the app served by a real, threaded WSGI server """
+    name = 'wsgi-server'
+
+    def __init__(self):
+        self.server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietRequestHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def send(self, method, path, form, body, headers):
+        headers = dict(headers)
+        payload = None
+
+        if isinstance(body, bytes):
+            payload = body
+            headers['Content-Type'] = 'application/x-ndjson'
+        elif body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        elif form is not None:
+            payload = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+
+        connection = HTTPConnection('127.0.0.1', self.server.server_port)
+        try:
+            connection.request(method, path.replace(' ', '%20'), body=payload, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        finally:
+            connection.close()
+
+    def close(self):
+        self.server.shutdown()
+
+
+def percentile(latencies, fraction):
+    """ Nearest rank percentile of a list of latencies """
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_scenario(transport, scenario, ids, token, requests, concurrency, sequence):
+    """ Measures one scenario; returning its latency percentiles, queries per request and throughput """
+    headers = {'token': token}
+
+    # Requests are built beforehand, so that setting up disposable rows is not measured
+    built_requests = [scenario.build(ids, next(sequence)) for _ in range(requests)]
+
+    def send(built_request):
+        path, form, body = built_request[:3]
+        request_headers = built_request[3] if len(built_request) > 3 else headers
+        start = time.perf_counter()
+        status = transport.send(scenario.method, path, form, body, request_headers)
+        return time.perf_counter() - start, status
+
+    # Warm up caches and connections
+    for _ in range(min(5, requests)):
+        send(scenario.build(ids, next(sequence)))
+
+    with QueryCounter() as queries:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(send, built_requests))
+        elapsed = time.perf_counter() - start
+
+    latencies = [latency * 1000 for latency, _ in outcomes]
+    return {'method': scenario.method,
+            'rule': scenario.rule,
+            'requests': requests,
+            'errors': len([status for _, status in outcomes if status >= 400]),
+            'p50_ms': round(percentile(latencies, 0.5), 3),
+            'p99_ms': round(percentile(latencies, 0.99), 3),
+            'mean_ms': round(sum(latencies) / len(latencies), 3),
+            'queries_per_request': round(queries.count / requests, 2),
+            'throughput_rps': round(requests / elapsed, 1)}
+
+
+def current_commit():
+    """ Short hash of the commit being measured, if running from a git checkout """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results, baseline):
+    """ Prints the change in p50 and p99 latency of each scenario against a previous run """
+    print('\nChange against {} ({})'.format(baseline.get('commit'), baseline.get('started')))
+    for mode, scenarios in results.get('modes').items():
+        for name, result in scenarios.items():
+            previous = baseline.get('modes', {}).get(mode, {}).get(name)
+            if not previous:
+                continue
+            print('  {:12} {:32} p50 {:+7.1%}  p99 {:+7.1%}'.format(
+                mode, name,
+                result.get('p50_ms') / previous.get('p50_ms') - 1,
+                result.get('p99_ms') / previous.get('p99_ms') - 1))
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--bucketlists', type=int, default=1000, help='bucketlists seeded for the user')
+    parser.add_argument('--items', type=int, default=10000, help='items seeded into the large bucketlist')
+    parser.add_argument('--requests', type=int, default=200, help='requests measured per scenario and mode')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads used against the WSGI server')
+    parser.add_argument('--modes', nargs='+', default=['test-client', 'wsgi-server'],
+                        choices=['test-client', 'wsgi-server'])
+    parser.add_argument('--scenarios', nargs='+', help='names of the scenarios to run; all of them by default')
+    parser.add_argument('--output', help='file the JSON results are written to')
+    parser.add_argument('--baseline', help='JSON results of a previous run to compare against')
+    return parser.parse_args()
+
+
+def main():
+    arguments = parse_arguments()
+
+    # Tokens and disposable rows are made outside of any request, with the settings of the app
+    app.app_context().push()
+
+    missing = uncovered_routes()
+    if missing:
+        raise SystemExit('Routes without a benchmark scenario: {}'.format(sorted(missing)))
+
+    started = datetime.datetime.utcnow()
+    print('Seeding {} bucketlists and {} items into {}'.format(
+        arguments.bucketlists, arguments.items, db.engine.url.__to_string__(hide_password=True)))
+    ids = seed.seed(db, arguments.bucketlists, arguments.items)
+    ids['last_page'] = last_offset_page(ids, per_page=20)
+    token = RequestMixin().generate_token(seed.USERNAME, ids.get('user_id'))
+
+    scenarios = [scenario for scenario in SCENARIOS
+                 if not arguments.scenarios or scenario.name in arguments.scenarios]
+    sequence = iter(range(10 ** 9))
+
+    results = {'commit': current_commit(),
+               'started': started.isoformat(),
+               'database': db.engine.dialect.name,
+               'volumes': {'bucketlists': arguments.bucketlists, 'items': arguments.items},
+               'concurrency': arguments.concurrency,
+               'modes': {}}
+
+    for mode in arguments.modes:
+        transport = TestClientTransport() if mode == 'test-client' else WSGIServerTransport()
+
+        # The test client is measured serially, to isolate the per request cost of the app
+        concurrency = 1 if mode == 'test-client' else arguments.concurrency
+
+        try:
+            print('\n{} ({} concurrent)'.format(mode, concurrency))
+            print('  {:32} {:>9} {:>9} {:>8} {:>9} {:>6}'.format('scenario', 'p50 ms', 'p99 ms', 'queries',
+                                                                 'req/s', 'errors'))
+            mode_results = results['modes'][mode] = {}
+
+            for scenario in scenarios:
+                result = run_scenario(transport, scenario, ids, token, arguments.requests, concurrency, sequence)
+                mode_results[scenario.name] = result
+                print('  {:32} {:9.2f} {:9.2f} {:8.2f} {:9.1f} {:6}'.format(
+                    scenario.name, result.get('p50_ms'), result.get('p99_ms'),
+                    result.get('queries_per_request'), result.get('throughput_rps'), result.get('errors')))
+        finally:
+            transport.close()
+
+    output = arguments.output or os.path.join(RESULTS_DIRECTORY, '{}-{}.json'.format(
+        started.strftime('%Y%m%dT%H%M%S'), results.get('commit')))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as results_file:
+        json.dump(results, results_file, indent=2, sort_keys=True)
+    print('\nResults saved to {}'.format(output))
+
+    if arguments.baseline:
+        with open(arguments.baseline) as baseline_file:
+            compare(results, json.load(baseline_file))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark of reading and serialising one page of a large bucketlist's items: as whole, identity
+mapped Item objects, the way the item list used to load them; and as rows of only the columns
+of the fields asked for, the way it does now. Reports the peak memory allocated and the time
+taken to load the page and to turn it into JSON.
+
+Run with:
+        APP_SETTINGS=config.Benchmark python -m benchmarks.fields --items 100000 --page 1000
+"""
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+from app import app, db
+from app.controller.utils import ITEM_FIELDS, Principal, field_columns, serialised
+from app.database.models import Item
+from . import seed
+
+
+def entity_page(bucketlist_id, page, fields, user):
+    """ Previous behaviour: whole Item objects, turned into dictionaries of the fields """
+    items = Item.query.filter(Item.bucketlist_id == bucketlist_id).order_by(Item.id).limit(page).all()
+    return [serialised(item, fields, ITEM_FIELDS, user) for item in items]
+
+
+def column_page(bucketlist_id, page, fields, user):
+    """ Current behaviour: rows of the columns the fields are read from """
+    items = db.session.query(*field_columns(Item, fields, ITEM_FIELDS))\
+        .filter(Item.bucketlist_id == bucketlist_id).order_by(Item.id).limit(page).all()
+    return [serialised(item, fields, ITEM_FIELDS, user) for item in items]
+
+
+def measure(load_page, bucketlist_id, page, fields, user):
+    """ Peak bytes allocated while loading and serialising a page, and the seconds each step took """
+    db.session.remove()
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = load_page(bucketlist_id, page, fields, user)
+    loaded = time.perf_counter()
+    json.dumps(rows)
+    serialised_at = time.perf_counter()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    db.session.remove()
+
+    return peak, loaded - start, serialised_at - loaded
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--items', type=int, default=10000, help='items seeded into the large bucketlist')
+    parser.add_argument('--page', type=int, default=1000, help='items on the page read')
+    parser.add_argument('--runs', type=int, default=20, help='pages read per way and set of fields')
+    return parser.parse_args()
+
+
+def main():
+    arguments = parse_arguments()
+
+    with app.app_context():
+        ids = seed.seed(db, 1, arguments.items)
+        user = Principal(ids.get('user_id'), seed.USERNAME)
+
+        print('{} items per page, medians of {} runs'.format(arguments.page, arguments.runs))
+        print('  {:10} {:44} {:>10} {:>9} {:>12}'.format('load', 'fields', 'peak KiB', 'query ms', 'serialise ms'))
+
+        for fields in [('id', 'name'), ('id', 'name', 'done'), tuple(sorted(ITEM_FIELDS))]:
+            for name, load_page in [('entities', entity_page), ('columns', column_page)]:
+                runs = [measure(load_page, ids.get('bucketlist_id'), arguments.page, fields, user)
+                        for _ in range(arguments.runs)]
+                print('  {:10} {:44} {:10.1f} {:9.2f} {:12.2f}'.format(
+                    name, ','.join(fields),
+                    statistics.median(run[0] for run in runs) / 1024,
+                    statistics.median(run[1] for run in runs) * 1000,
+                    statistics.median(run[2] for run in runs) * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark of login throughput at each password hashing cost setting.
+
+Stores the benchmark user's password hashed at each setting in turn, then sends concurrent
+logins to the app served by a threaded WSGI server; reporting the time a single hash takes,
+login latency and logins per second. The legacy unsalted sha256 is included for reference.
+
+Run with:
+        APP_SETTINGS=config.Benchmark python -m benchmarks.login --requests 200 --concurrency 16
+"""
+import argparse
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from app import app, db
+from app.controller import utils
+from app.controller.passwords import PasswordHasher, PBKDF2Hasher, ScryptHasher
+from app.database.models import User
+from .api import WSGIServerTransport, percentile
+from . import seed
+
+
+def cost_settings():
+    """ Hashers to measure, each paired with a label of its work factors """
+    settings = [('pbkdf2-sha256 {}'.format(iterations), PBKDF2Hasher(iterations=iterations))
+                for iterations in (10000, 100000, 260000, 600000)]
+
+    if hasattr(hashlib, 'scrypt'):
+        settings.extend(('scrypt n=2**{}'.format(log_n), ScryptHasher(n=2 ** log_n, r=8, p=1))
+                        for log_n in (14, 15, 16))
+
+    return settings
+
+
+def store_password(password_hasher, legacy):
+    """ Hashes the benchmark user's password with password_hasher, or with the legacy sha256 """
+    if legacy:
+        password = hashlib.sha256((seed.PASSWORD + app.config.get('SECRET_KEY')).encode()).hexdigest()
+    else:
+        password = password_hasher.hash_now(seed.PASSWORD)
+
+    db.engine.execute(User.__table__.update().where(User.username == seed.USERNAME).values(password=password))
+
+
+def measure_logins(transport, requests, concurrency):
+    """ Latency percentiles and throughput of concurrent logins """
+    form = {'username': seed.USERNAME, 'password': seed.PASSWORD}
+
+    def login(_):
+        start = time.perf_counter()
+        status = transport.send('POST', '/api/V1/auth/login', form, None, {})
+        return time.perf_counter() - start, status
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(login, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency * 1000 for latency, _ in outcomes]
+    return {'p50_ms': percentile(latencies, 0.5),
+            'p99_ms': percentile(latencies, 0.99),
+            'throughput_rps': requests / elapsed,
+            'errors': len([status for _, status in outcomes if status >= 400])}
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=200, help='logins measured per cost setting')
+    parser.add_argument('--concurrency', type=int, default=16, help='client threads logging in at once')
+    parser.add_argument('--workers', type=int, default=app.config.get('PASSWORD_HASH_WORKERS'),
+                        help='hashing worker threads')
+    return parser.parse_args()
+
+
+def main():
+    arguments = parse_arguments()
+    seed.seed(db, bucketlists=0, items=0)
+    transport = WSGIServerTransport()
+
+    print('{} hashing workers, {} concurrent logins'.format(arguments.workers, arguments.concurrency))
+    print('  {:24} {:>9} {:>9} {:>9} {:>9} {:>6}'.format('setting', 'hash ms', 'p50 ms', 'p99 ms',
+                                                         'logins/s', 'errors'))
+    try:
+        for label, hasher in [('legacy sha256', None)] + cost_settings():
+            password_hasher = PasswordHasher(hasher or PBKDF2Hasher(iterations=1),
+                                             secret_key=app.config.get('SECRET_KEY'),
+                                             workers=arguments.workers,
+                                             queue_size=arguments.concurrency)
+
+            store_password(password_hasher, legacy=hasher is None)
+
+            start = time.perf_counter()
+            password_hasher.verify(seed.PASSWORD, password_hasher.hash_now(seed.PASSWORD))
+            hash_time = (time.perf_counter() - start) * 1000 / 2
+
+            # The legacy hash would be upgraded by the first login, leaving the rest to measure the new one
+            with mock.patch.object(utils, 'password_hasher', password_hasher), \
+                    mock.patch.object(utils, 'rehash_password', lambda *args: None):
+                result = measure_logins(transport, arguments.requests, arguments.concurrency)
+
+            password_hasher.executor.shutdown()
+            print('  {:24} {:9.2f} {:9.2f} {:9.2f} {:9.1f} {:6}'.format(
+                label, hash_time, result.get('p50_ms'), result.get('p99_ms'),
+                result.get('throughput_rps'), result.get('errors')))
+    finally:
+        transport.close()
+
+
+if __name__ == '__main__':
+    main()
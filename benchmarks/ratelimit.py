@@ -0,0 +1,81 @@
+"""
+Microbenchmark of the overhead rate limiting adds to each request, against the cheapest
+database round trip a request can make.
+
+Times taking a token from the in-process buckets, by one thread and by several at once over
+keys of their own, and from Redis when RATE_LIMIT_REDIS_URL points at a reachable server.
+
+Run with:
+        APP_SETTINGS=config.Benchmark python -m benchmarks.ratelimit
+"""
+import threading
+import timeit
+from app import app, db
+from app.controller.ratelimit import LocalBuckets, RateLimiter, RedisBuckets
+
+REPEAT = 5
+NUMBER = 20000
+THREADS = 8
+
+# Generous enough that every take succeeds, as the vast majority of requests' do
+LIMITS = {'default': (10 ** 9, 1)}
+
+
+def measure(function, number=NUMBER):
+    """ Best time per call, in microseconds """
+    return min(timeit.repeat(function, repeat=REPEAT, number=number)) / number * 10 ** 6
+
+
+def measure_threaded(limiter):
+    """ Time per take with THREADS threads taking from buckets of their own at once, in microseconds """
+    barrier = threading.Barrier(THREADS + 1)
+
+    def take(identity):
+        barrier.wait()
+        for _ in range(NUMBER):
+            limiter.take('bucketlists', identity)
+        barrier.wait()
+
+    threads = [threading.Thread(target=take, args=('user:{}'.format(number),)) for number in range(THREADS)]
+    for thread in threads:
+        thread.start()
+
+    barrier.wait()
+    start = timeit.default_timer()
+    barrier.wait()
+    elapsed = timeit.default_timer() - start
+
+    for thread in threads:
+        thread.join()
+    return elapsed / (NUMBER * THREADS) * 10 ** 6
+
+
+def redis_limiter():
+    """ A limiter on the configured Redis server, or None if redis is not installed or reachable """
+    try:
+        import redis
+        client = redis.StrictRedis.from_url(app.config.get('RATE_LIMIT_REDIS_URL'))
+        client.ping()
+    except Exception:
+        return None
+    return RateLimiter(RedisBuckets(client), LIMITS)
+
+
+if __name__ == '__main__':
+    db.create_all()
+    with db.engine.connect() as connection:
+        round_trip = measure(lambda: connection.execute('SELECT 1').scalar(), number=NUMBER // 10)
+
+    local = RateLimiter(LocalBuckets(), LIMITS)
+    results = [('local, 1 thread', measure(lambda: local.take('bucketlists', 'user:1'))),
+               ('local, {} threads'.format(THREADS), measure_threaded(local))]
+
+    shared = redis_limiter()
+    if shared:
+        results.append(('redis, 1 thread', measure(lambda: shared.take('bucketlists', 'user:1'), NUMBER // 10)))
+
+    print('  {:20} {:>10} {:>16}'.format('backend', 'us/take', 'of SELECT 1'))
+    for label, time_per_take in results:
+        print('  {:20} {:10.2f} {:15.1f}%'.format(label, time_per_take, time_per_take / round_trip * 100))
+    print('  {:20} {:10.2f}'.format('SELECT 1', round_trip))
+    db.drop_all()
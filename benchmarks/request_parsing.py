@@ -0,0 +1,55 @@
+"""
+Microbenchmark of the cost of parsing a request's arguments, before and after parsers were
+built once per view method and the parsed arguments memoized on the request.
+
+Run with:
+        APP_SETTINGS=config.Testing python -m benchmarks.request_parsing
+"""
+import timeit
+from flask import request
+from flask_restful.reqparse import RequestParser
+from app import app
+from app.controller.utils import ARGUMENT_LOCATIONS
+from app.controller.views import Bucketlists
+
+REPEAT = 5
+NUMBER = 2000
+
+# The listing view calls parse_args this many times while handling one request.
+PARSE_ARGS_CALLS = 5
+
+
+def catch_all_parsing():
+    """ Previous behaviour: a parser with every argument built per request, and re-run on each call """
+    parser = RequestParser()
+    for name, location in ARGUMENT_LOCATIONS.items():
+        parser.add_argument(name, location=location)
+
+    for _ in range(PARSE_ARGS_CALLS):
+        parser.parse_args()
+
+
+def cached_parsing():
+    """ Current behaviour: the view method's cached parser, run once and memoized on the request """
+    request.parsed_args = None
+    view = Bucketlists()
+
+    for _ in range(PARSE_ARGS_CALLS):
+        view.parse_args()
+
+
+def measure(function):
+    """ Best time per request, in microseconds """
+    return min(timeit.repeat(function, repeat=REPEAT, number=NUMBER)) / NUMBER * 10 ** 6
+
+
+if __name__ == '__main__':
+    with app.test_request_context('/api/V1/bucketlists?q=od&limit=5&offset=2', method='GET',
+                                  headers={'token': 'token'}):
+        before = measure(catch_all_parsing)
+        after = measure(cached_parsing)
+
+    print('Argument parsing per GET /bucketlists request')
+    print('  catch-all parser, built per request: {:8.1f} us'.format(before))
+    print('  cached parser, memoized per request: {:8.1f} us'.format(after))
+    print('  speedup: {:.1f}x'.format(before / after))
@@ -0,0 +1,57 @@
+"""
+Seeding of benchmark data volumes, inserted in chunks through SQLAlchemy Core
+so that large volumes load in seconds rather than through the API.
+"""
+from app.controller.utils import RequestMixin
+from app.database.models import Bucketlist, Item, User
+
+USERNAME = 'benchmark'
+PASSWORD = 'benchmark'
+
+
+def insert_chunked(connection, table, rows, chunk_size):
+    """ Inserts the rows generated by rows with one executemany per chunk """
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            connection.execute(table.insert(), chunk)
+            chunk = []
+
+    if chunk:
+        connection.execute(table.insert(), chunk)
+
+
+def seed(db, bucketlists, items, chunk_size=5000):
+    """
+    Recreates the schema and seeds one user owning the given number of bucketlists.
+    All the items go into the first bucketlist, which makes it the large list
+    that item endpoints are measured against.
+    Returns the ids the benchmark scenarios need.
+    """
+    db.drop_all()
+    db.create_all()
+
+    with db.engine.begin() as connection:
+        user_id = connection.execute(User.__table__.insert(),
+                                     username=USERNAME,
+                                     password=RequestMixin().set_password(PASSWORD)).inserted_primary_key[0]
+
+        insert_chunked(connection, Bucketlist.__table__,
+                       ({'name': 'Bucketlist {}'.format(number), 'creator_id': user_id}
+                        for number in range(bucketlists)),
+                       chunk_size)
+
+        bucketlist_id = connection.execute(db.select([db.func.min(Bucketlist.id)])
+                                           .where(Bucketlist.creator_id == user_id)).scalar()
+
+        insert_chunked(connection, Item.__table__,
+                       ({'name': 'Item {}'.format(number), 'completed': number % 2 == 0,
+                         'bucketlist_id': bucketlist_id}
+                        for number in range(items)),
+                       chunk_size)
+
+        item_id = connection.execute(db.select([db.func.min(Item.id)])
+                                     .where(Item.bucketlist_id == bucketlist_id)).scalar()
+
+    return {'user_id': user_id, 'bucketlist_id': bucketlist_id, 'item_id': item_id}
@@ -0,0 +1,175 @@
+"""
+Benchmark of the threaded WSGI server against ASGI serving (asgi.py under uvicorn)
+with many slow clients connected at once.
+
+Each server is started in a process of its own. Slow clients open connections and
+trickle their request headers out over several seconds, like mobile clients on poor
+networks; meanwhile fast clients send requests as quickly as they are answered.
+Reports the fast clients' latency and throughput, failed requests, and the most
+threads the server process ran.
+
+Run against SQLite with:
+        APP_SETTINGS=config.Benchmark python -m benchmarks.serving --slow-clients 500
+
+and against a local Postgres by pointing the Benchmark settings at it:
+        BENCHMARK_DATABASE_URI=postgresql://localhost/bucketlist_benchmark APP_SETTINGS=config.Benchmark \\
+        python -m benchmarks.serving --slow-clients 2000
+
+ASGI serving needs uvicorn, which is not a requirement of the app itself: pip install uvicorn
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from app import app, db
+from app.controller.utils import RequestMixin
+from .api import percentile
+from . import seed
+
+WSGI_SERVER = ('from werkzeug.serving import make_server; from app import app; '
+               'from benchmarks.api import QuietRequestHandler; '
+               'make_server("127.0.0.1", {port}, app, threaded=True, request_handler=QuietRequestHandler)'
+               '.serve_forever()')
+
+SERVERS = {'wsgi-threaded': lambda port: [sys.executable, '-c', WSGI_SERVER.format(port=port)],
+           'asgi-uvicorn': lambda port: [sys.executable, '-m', 'uvicorn', 'asgi:application',
+                                         '--port', str(port), '--log-level', 'warning']}
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def wait_for(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit('Server on port {} did not start'.format(port))
+
+
+def thread_count(pid):
+    """ Threads a process is running, as Linux reports them """
+    try:
+        with open('/proc/{}/status'.format(pid)) as status:
+            return int(next(line for line in status if line.startswith('Threads:')).split()[1])
+    except (OSError, StopIteration):
+        return 0
+
+
+def request_lines(path, token):
+    return ['GET {} HTTP/1.1'.format(path), 'Host: 127.0.0.1', 'token: {}'.format(token),
+            'Connection: close', 'User-Agent: benchmark']
+
+
+async def send_request(port, lines, trickle=0):
+    """
+    Sends a GET request, spreading its header lines over trickle seconds;
+    returning the response status, or 0 if the request failed
+    """
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    except OSError:
+        return 0
+
+    try:
+        for line in lines:
+            writer.write((line + '\r\n').encode())
+            if trickle:
+                await asyncio.sleep(trickle / len(lines))
+        writer.write(b'\r\n')
+
+        status_line = await reader.readline()
+        await reader.read()
+        return int(status_line.split()[1]) if status_line else 0
+    except (OSError, IndexError, ValueError):
+        return 0
+    finally:
+        writer.close()
+
+
+async def fast_client(port, lines, until, latencies, statuses):
+    while time.monotonic() < until:
+        start = time.perf_counter()
+        status = await send_request(port, lines)
+        latencies.append((time.perf_counter() - start) * 1000)
+        statuses.append(status)
+
+
+async def sample_threads(pid, until, samples):
+    while time.monotonic() < until:
+        samples.append(thread_count(pid))
+        await asyncio.sleep(0.25)
+
+
+async def load(port, pid, token, arguments):
+    lines = request_lines('/api/V1/bucketlists', token)
+    until = time.monotonic() + arguments.duration
+    latencies, statuses, slow_statuses, threads = [], [], [], []
+
+    slow = [asyncio.get_event_loop().create_task(send_request(port, lines, trickle=arguments.trickle))
+            for _ in range(arguments.slow_clients)]
+
+    # Let the slow clients connect before the fast ones are measured
+    await asyncio.sleep(1)
+    start = time.perf_counter()
+    await asyncio.gather(*[fast_client(port, lines, until, latencies, statuses)
+                           for _ in range(arguments.fast_clients)], sample_threads(pid, until, threads))
+    elapsed = time.perf_counter() - start
+
+    slow_statuses.extend(await asyncio.gather(*slow))
+
+    return {'p50_ms': percentile(latencies, 0.5) if latencies else 0,
+            'p99_ms': percentile(latencies, 0.99) if latencies else 0,
+            'throughput_rps': len(latencies) / elapsed,
+            'failed': len([status for status in statuses + slow_statuses if status != 200]),
+            'max_threads': max(threads or [0])}
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--servers', nargs='+', default=sorted(SERVERS), choices=sorted(SERVERS))
+    parser.add_argument('--slow-clients', type=int, default=500, help='clients trickling their requests')
+    parser.add_argument('--trickle', type=float, default=5, help='seconds a slow client takes to send its request')
+    parser.add_argument('--fast-clients', type=int, default=32, help='clients sending requests back to back')
+    parser.add_argument('--duration', type=float, default=10, help='seconds the fast clients are measured for')
+    parser.add_argument('--bucketlists', type=int, default=50, help='bucketlists seeded for the user')
+    return parser.parse_args()
+
+
+def main():
+    arguments = parse_arguments()
+    with app.app_context():
+        ids = seed.seed(db, arguments.bucketlists, items=0)
+        token = RequestMixin().generate_token(seed.USERNAME, ids.get('user_id'))
+
+    print('{} slow clients taking {}s each, {} fast clients for {}s'.format(
+        arguments.slow_clients, arguments.trickle, arguments.fast_clients, arguments.duration))
+    print('  {:16} {:>9} {:>9} {:>9} {:>7} {:>8}'.format('server', 'p50 ms', 'p99 ms', 'req/s', 'failed', 'threads'))
+
+    loop = asyncio.get_event_loop()
+    for name in arguments.servers:
+        port = free_port()
+        server = subprocess.Popen(SERVERS[name](port), env=dict(os.environ))
+        try:
+            wait_for(port)
+            result = loop.run_until_complete(load(port, server.pid, token, arguments))
+        finally:
+            server.terminate()
+            server.wait()
+
+        print('  {:16} {:9.2f} {:9.2f} {:9.1f} {:7} {:8}'.format(
+            name, result.get('p50_ms'), result.get('p99_ms'), result.get('throughput_rps'),
+            result.get('failed'), result.get('max_threads')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark of the app's startup: the time importing it takes, the database connections opened by
+doing so (which a prefork server's workers would inherit), and the time to the first response
+that needs the database.
+
+Each run is a fresh interpreter, so that nothing is imported or connected beforehand.
+
+Run with:
+        APP_SETTINGS=config.Benchmark python -m benchmarks.startup --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Run in each fresh interpreter; prints its measurements as JSON
+MEASURE_STARTUP = '''
+import json, time
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+
+connections = []
+event.listen(Pool, 'connect', lambda *args: connections.append(args))
+
+start = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+connected_on_import = len(connections)
+
+response = app.test_client().post('/api/V1/auth/login', data={'username': 'nobody', 'password': 'password'})
+responded = time.perf_counter()
+
+print(json.dumps({'import_ms': (imported - start) * 1000, 'connections_on_import': connected_on_import,
+                  'first_response_ms': (responded - imported) * 1000, 'status': response.status_code}))
+'''
+
+
+def measure_startup():
+    """ The measurements of one fresh interpreter importing the app and answering a request """
+    output = subprocess.check_output([sys.executable, '-c', MEASURE_STARTUP], env=os.environ,
+                                     cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=10, help='fresh interpreters started')
+    return parser.parse_args()
+
+
+def main():
+    arguments = parse_arguments()
+
+    # The schema is created beforehand, as serving processes expect it to exist
+    from app import app, db
+    with app.app_context():
+        db.create_all()
+
+    runs = [measure_startup() for _ in range(arguments.runs)]
+
+    print('{} runs, medians'.format(arguments.runs))
+    print('  import:                 {:8.1f} ms'.format(statistics.median(run['import_ms'] for run in runs)))
+    print('  connections on import:  {:8}'.format(max(run['connections_on_import'] for run in runs)))
+    print('  first response:         {:8.1f} ms'.format(statistics.median(run['first_response_ms'] for run in runs)))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,18 @@
+import datetime
 import os
+import sys
+import time
 from flask_script import Manager
-from flask_migrate import Migrate, MigrateCommand
+from flask_migrate import Migrate, MigrateCommand, stamp
 
 from app import app, db
+from app.controller.bulk_import import CONFLICT_POLICIES, IMPORT_FORMATS, ImportFailed, import_progress
+from app.database.counters import RECOUNT_ITEMS
+from app.database.models import Tombstone, User
+from app.database.purge import purge_detached
 
 
-app.config.from_object(os.environ['APP_SETTINGS'])
+app.config.from_object(os.getenv('APP_SETTINGS') or 'config.Config')
 
 migrate = Migrate(app, db)
 manager = Manager(app)
@@ -13,5 +20,70 @@ manager = Manager(app)
 manager.add_command('db', MigrateCommand)
 
 
+@manager.command
+def create_db():
+    """ Creates the schema's tables, indexes and triggers in an empty database, marked as migrated to the head """
+    if db.engine.table_names():
+        sys.exit('The database already has tables; bring it up to date with `python manage.py db upgrade`')
+
+    db.create_all()
+    stamp()
+    print('Schema created')
+
+
+@manager.option('path', help='NDJSON or CSV file to import')
+@manager.option('-u', '--username', dest='username', required=True, help='user the bucketlists are imported for')
+@manager.option('-f', '--format', dest='import_format', choices=IMPORT_FORMATS,
+                help='format of the file; taken from its extension by default')
+@manager.option('-c', '--conflicts', dest='policy', choices=CONFLICT_POLICIES, default='fail',
+                help='what to do with names that are already taken')
+@manager.option('--chunk-size', dest='chunk_size', type=int, default=app.config.get('IMPORT_CHUNK_SIZE'),
+                help='rows inserted per batch')
+def import_bucketlists(path, username, import_format, policy, chunk_size):
+    """ Imports bucketlists with their items for a user, from an NDJSON or CSV file """
+    user = User.query.filter_by(username=username).first()
+    if not user:
+        sys.exit('User {} does not exist'.format(username))
+
+    import_format = import_format or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+    start = time.perf_counter()
+
+    try:
+        with open(path, 'rb') as stream, db.engine.begin() as connection:
+            for counts in import_progress(connection, user.id, stream, import_format, policy, chunk_size):
+                print('{rows} rows: {bucketlists} bucketlists and {items} items imported, '
+                      '{skipped} skipped, {renamed} renamed'.format(**counts), end='\r', flush=True)
+    except ImportFailed as error:
+        sys.exit('\nImport rolled back. {}'.format(error))
+
+    print('\nImport committed in {:.1f}s'.format(time.perf_counter() - start))
+
+
+@manager.command
+def purge_tombstones():
+    """ Deletes the tombstones of rows deleted longer ago than SYNC_TOMBSTONE_TTL, which no sync token needs """
+    tombstone = Tombstone.__table__
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=app.config.get('SYNC_TOMBSTONE_TTL'))
+
+    result = db.engine.execute(tombstone.delete().where(tombstone.c.deleted_at < cutoff))
+    print('{} tombstones purged'.format(result.rowcount))
+
+
+@manager.option('--batch-size', dest='batch_size', type=int, default=app.config.get('PURGE_BATCH_SIZE'),
+                help='rows deleted per transaction')
+def purge_deleted(batch_size):
+    """ Deletes the soft deleted bucketlists and their items, which the app's background purger has not yet """
+    items, bucketlists = purge_detached(db.engine, batch_size)
+    print('{} bucketlists and {} items purged'.format(bucketlists, items))
+
+
+@manager.command
+def recount_items():
+    """ Recomputes every bucketlist's item and completed item counts from the item table """
+    with db.engine.begin() as connection:
+        result = connection.execute(RECOUNT_ITEMS)
+    print('Item counts of {} bucketlists recomputed'.format(result.rowcount))
+
+
 if __name__ == '__main__':
     manager.run()
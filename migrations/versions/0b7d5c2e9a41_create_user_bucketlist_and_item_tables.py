@@ -0,0 +1,51 @@
+"""Create user, bucketlist and item tables
+
+Revision ID: 0b7d5c2e9a41
+Revises:
+Create Date: 2026-10-18 17:10:27.604318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b7d5c2e9a41'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The tables as the app created them before its schema was migrated
+    op.create_table('user',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('username', sa.String(length=30), nullable=False),
+                    sa.Column('password', sa.String(length=300), nullable=False),
+                    sa.PrimaryKeyConstraint('id'),
+                    sa.UniqueConstraint('username'))
+    op.create_table('bucketlist',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('name', sa.String(length=120), nullable=False),
+                    sa.Column('creation_date', sa.Date(), nullable=False),
+                    sa.Column('modification_date', sa.Date(), nullable=False),
+                    sa.Column('creator_id', sa.Integer(), nullable=True),
+                    sa.ForeignKeyConstraint(['creator_id'], ['user.id']),
+                    sa.PrimaryKeyConstraint('id'),
+                    sa.UniqueConstraint('name'))
+    op.create_table('item',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('name', sa.String(length=120), nullable=False),
+                    sa.Column('creation_date', sa.Date(), nullable=True),
+                    sa.Column('modification_date', sa.Date(), nullable=True),
+                    sa.Column('completed', sa.Boolean(), nullable=True),
+                    sa.Column('bucketlist_id', sa.Integer(), nullable=True),
+                    sa.ForeignKeyConstraint(['bucketlist_id'], ['bucketlist.id']),
+                    sa.PrimaryKeyConstraint('id'),
+                    sa.UniqueConstraint('name'))
+
+
+def downgrade():
+    op.drop_table('item')
+    op.drop_table('bucketlist')
+    op.drop_table('user')
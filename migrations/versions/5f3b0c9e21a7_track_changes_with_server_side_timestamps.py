@@ -0,0 +1,187 @@
+"""Track changes with server side timestamps and per user change counters
+
+Revision ID: 5f3b0c9e21a7
+Revises: 83644736d34f
+Create Date: 2026-10-18 18:02:41.517203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f3b0c9e21a7'
+down_revision = '83644736d34f'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_NOW = sa.text("(STRFTIME('%Y-%m-%d %H:%M:%f000', 'now'))")
+POSTGRES_NOW = sa.text("TIMEZONE('utc', STATEMENT_TIMESTAMP())")
+
+
+def tables(date_type, tracked):
+    """
+    The tables without change numbers, or with them when tracked; for SQLite to recreate them from,
+    since it can only change the default of a column along with its table. Their dates are given the
+    type they are to end up with, as a batch change of type would CAST the text SQLite stores them as.
+    """
+    metadata = sa.MetaData()
+
+    def change_seq(table, owner):
+        return [sa.Column('change_seq', sa.Integer),
+                sa.Index('ix_{}_{}_change_seq'.format(table, owner), owner, 'change_seq')] if tracked else []
+
+    bucketlist = sa.Table('bucketlist', metadata,
+                          sa.Column('id', sa.Integer, primary_key=True),
+                          sa.Column('name', sa.String(120), nullable=False),
+                          sa.Column('creation_date', date_type, nullable=False),
+                          sa.Column('modification_date', date_type, nullable=False),
+                          sa.Column('creator_id', sa.Integer, sa.ForeignKey('user.id')),
+                          sa.UniqueConstraint('creator_id', 'name', name='uq_bucketlist_creator_id_name'),
+                          sa.Index('ix_bucketlist_creator_id_id', 'creator_id', 'id'),
+                          *change_seq('bucketlist', 'creator_id'))
+
+    item = sa.Table('item', metadata,
+                    sa.Column('id', sa.Integer, primary_key=True),
+                    sa.Column('name', sa.String(120), nullable=False),
+                    sa.Column('creation_date', date_type),
+                    sa.Column('modification_date', date_type),
+                    sa.Column('completed', sa.Boolean),
+                    sa.Column('bucketlist_id', sa.Integer, sa.ForeignKey('bucketlist.id')),
+                    sa.UniqueConstraint('bucketlist_id', 'name', name='uq_item_bucketlist_id_name'),
+                    sa.Index('ix_item_bucketlist_id_id', 'bucketlist_id', 'id'),
+                    *change_seq('item', 'bucketlist_id'))
+
+    return [(bucketlist, 'creator_id'), (item, 'bucketlist_id')]
+
+
+CHANGE_TRACKING = {'bucketlist': ('{row}.creator_id', ['name', 'creator_id']),
+                   'item': ('(SELECT creator_id FROM bucketlist WHERE id = {row}.bucketlist_id)',
+                            ['name', 'completed', 'bucketlist_id'])}
+
+SQLITE_CHANGE_DDL = [
+    "CREATE TRIGGER IF NOT EXISTS {table}_change_insert AFTER INSERT ON {table} BEGIN "
+    "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {owner}; "
+    "UPDATE {table} SET change_seq = (SELECT change_count FROM \"user\" WHERE id = {owner}) "
+    "WHERE id = new.id; END",
+
+    "CREATE TRIGGER IF NOT EXISTS {table}_change_update AFTER UPDATE OF {columns} ON {table} BEGIN "
+    "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {owner}; "
+    "UPDATE {table} SET change_seq = (SELECT change_count FROM \"user\" WHERE id = {owner}) "
+    "WHERE id = new.id; END",
+
+    "CREATE TRIGGER IF NOT EXISTS {table}_change_delete AFTER DELETE ON {table} BEGIN "
+    "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {old_owner}; END"
+]
+
+POSTGRES_CHANGE_DDL = [
+    "CREATE OR REPLACE FUNCTION {table}_track_change() RETURNS trigger AS $$ BEGIN "
+    "IF TG_OP = 'DELETE' THEN "
+    "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {old_owner}; RETURN OLD; END IF; "
+    "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {owner} "
+    "RETURNING change_count INTO new.change_seq; "
+    "RETURN new; END $$ LANGUAGE plpgsql",
+
+    "CREATE TRIGGER {table}_track_change BEFORE INSERT OR UPDATE OF {columns} ON {table} "
+    "FOR EACH ROW EXECUTE PROCEDURE {table}_track_change()",
+
+    "CREATE TRIGGER {table}_track_deletion AFTER DELETE ON {table} "
+    "FOR EACH ROW EXECUTE PROCEDURE {table}_track_change()"
+]
+
+
+def change_tracking_ddl(dialect):
+    """ The statements creating the change tracking triggers of both tables, as they stand at this revision """
+    statements = {'sqlite': SQLITE_CHANGE_DDL, 'postgresql': POSTGRES_CHANGE_DDL}.get(dialect, [])
+
+    for table, (owner, columns) in sorted(CHANGE_TRACKING.items()):
+        for statement in statements:
+            yield statement.format(table=table, columns=', '.join(columns),
+                                   owner=owner.format(row='new'), old_owner=owner.format(row='old'))
+
+
+def restore_search_triggers(table):
+    """ Recreating a SQLite table drops its triggers, including those keeping its search index in sync """
+    if not op.get_bind().execute("SELECT name FROM sqlite_master WHERE name = '{}_search'".format(table)).first():
+        return
+
+    op.execute("CREATE TRIGGER IF NOT EXISTS {0}_search_insert AFTER INSERT ON {0} BEGIN "
+               "INSERT INTO {0}_search (rowid, name) VALUES (new.id, new.name); END".format(table))
+    op.execute("CREATE TRIGGER IF NOT EXISTS {0}_search_delete AFTER DELETE ON {0} BEGIN "
+               "INSERT INTO {0}_search ({0}_search, rowid, name) VALUES ('delete', old.id, old.name); "
+               "END".format(table))
+    op.execute("CREATE TRIGGER IF NOT EXISTS {0}_search_update AFTER UPDATE OF name ON {0} BEGIN "
+               "INSERT INTO {0}_search ({0}_search, rowid, name) VALUES ('delete', old.id, old.name); "
+               "INSERT INTO {0}_search (rowid, name) VALUES (new.id, new.name); END".format(table))
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    sqlite = dialect == 'sqlite'
+    now = SQLITE_NOW if sqlite else POSTGRES_NOW
+
+    op.add_column('user', sa.Column('change_count', sa.Integer(), nullable=False, server_default='0'))
+
+    for table, owner in tables(sa.DateTime, tracked=False):
+        with op.batch_alter_table(table.name, copy_from=table if sqlite else None,
+                                  recreate='always' if sqlite else 'auto') as batch_op:
+            batch_op.add_column(sa.Column('change_seq', sa.Integer()))
+            for column in ['creation_date', 'modification_date']:
+                if sqlite:
+                    batch_op.alter_column(column, server_default=now)
+                else:
+                    batch_op.alter_column(column, type_=sa.DateTime(), server_default=now,
+                                          postgresql_using='{}::timestamp'.format(column))
+            batch_op.create_index('ix_{}_{}_change_seq'.format(table.name, owner), [owner, 'change_seq'])
+
+        if sqlite:
+            restore_search_triggers(table.name)
+            # Dates were stored as text, which SQLite keeps through the change of column type
+            for column in ['creation_date', 'modification_date']:
+                op.execute("UPDATE {0} SET {1} = {1} || ' 00:00:00.000000' WHERE length({1}) = 10"
+                           .format(table.name, column))
+
+        # Every row written so far counts as its owner's first change
+        op.execute('UPDATE {} SET change_seq = 1'.format(table.name))
+
+    op.execute('UPDATE "user" SET change_count = 1')
+
+    for statement in change_tracking_ddl(dialect):
+        op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    sqlite = dialect == 'sqlite'
+
+    # Triggers go first, as SQLite checks every trigger in the schema when a table is renamed
+    for table in CHANGE_TRACKING:
+        if sqlite:
+            for trigger in ['insert', 'update', 'delete']:
+                op.execute('DROP TRIGGER IF EXISTS {}_change_{}'.format(table, trigger))
+        elif dialect == 'postgresql':
+            op.execute('DROP TRIGGER IF EXISTS {0}_track_change ON {0}'.format(table))
+            op.execute('DROP TRIGGER IF EXISTS {0}_track_deletion ON {0}'.format(table))
+            op.execute('DROP FUNCTION IF EXISTS {}_track_change()'.format(table))
+
+    for table, owner in tables(sa.Date, tracked=True):
+        if sqlite:
+            for column in ['creation_date', 'modification_date']:
+                op.execute('UPDATE {0} SET {1} = substr({1}, 1, 10)'.format(table.name, column))
+
+        with op.batch_alter_table(table.name, copy_from=table if sqlite else None,
+                                  recreate='always' if sqlite else 'auto') as batch_op:
+            batch_op.drop_index('ix_{}_{}_change_seq'.format(table.name, owner))
+            for column in ['creation_date', 'modification_date']:
+                if sqlite:
+                    batch_op.alter_column(column, server_default=None)
+                else:
+                    batch_op.alter_column(column, type_=sa.Date(), server_default=None)
+            batch_op.drop_column('change_seq')
+
+        if sqlite:
+            restore_search_triggers(table.name)
+
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('change_count')
@@ -0,0 +1,31 @@
+"""Add revoked_token table
+
+Revision ID: 83644736d34f
+Revises: dc514a8ff3da
+Create Date: 2026-10-18 17:36:09.966770
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '83644736d34f'
+down_revision = 'dc514a8ff3da'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('revoked_token',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('jti', sa.String(length=32), nullable=False),
+                    sa.Column('expires_at', sa.DateTime(), nullable=False),
+                    sa.PrimaryKeyConstraint('id'),
+                    sa.UniqueConstraint('jti'))
+    op.create_index(op.f('ix_revoked_token_expires_at'), 'revoked_token', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_revoked_token_expires_at'), table_name='revoked_token')
+    op.drop_table('revoked_token')
@@ -0,0 +1,153 @@
+"""Record tombstones of deleted rows and the change that created each row
+
+Revision ID: a83d4e6c1f02
+Revises: 5f3b0c9e21a7
+Create Date: 2026-10-18 18:41:07.302611
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a83d4e6c1f02'
+down_revision = '5f3b0c9e21a7'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_NOW = sa.text("(STRFTIME('%Y-%m-%d %H:%M:%f000', 'now'))")
+POSTGRES_NOW = sa.text("TIMEZONE('utc', STATEMENT_TIMESTAMP())")
+
+OWNERS = {'bucketlist': '{row}.creator_id',
+          'item': '(SELECT creator_id FROM bucketlist WHERE id = {row}.bucketlist_id)'}
+
+# The insert and delete triggers this revision replaces, and those it replaces them with;
+# the update triggers stay as they are.
+SQLITE_TRIGGERS = {
+    'insert': ("CREATE TRIGGER {table}_change_insert AFTER INSERT ON {table} BEGIN "
+               "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {owner}; "
+               "UPDATE {table} SET change_seq = (SELECT change_count FROM \"user\" WHERE id = {owner}) "
+               "WHERE id = new.id; END",
+
+               "CREATE TRIGGER {table}_change_insert AFTER INSERT ON {table} BEGIN "
+               "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {owner}; "
+               "UPDATE {table} SET change_seq = (SELECT change_count FROM \"user\" WHERE id = {owner}), "
+               "created_seq = (SELECT change_count FROM \"user\" WHERE id = {owner}) "
+               "WHERE id = new.id; END"),
+
+    'delete': ("CREATE TRIGGER {table}_change_delete AFTER DELETE ON {table} BEGIN "
+               "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {old_owner}; END",
+
+               "CREATE TRIGGER {table}_change_delete AFTER DELETE ON {table} BEGIN "
+               "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {old_owner}; "
+               "INSERT INTO tombstone (user_id, table_name, row_id, change_seq) "
+               "SELECT id, '{table}', old.id, change_count FROM \"user\" WHERE id = {old_owner}; END")
+}
+
+POSTGRES_FUNCTION = (
+    "CREATE OR REPLACE FUNCTION {table}_track_change() RETURNS trigger AS $$ BEGIN "
+    "IF TG_OP = 'DELETE' THEN "
+    "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {old_owner}; RETURN OLD; END IF; "
+    "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {owner} "
+    "RETURNING change_count INTO new.change_seq; "
+    "RETURN new; END $$ LANGUAGE plpgsql",
+
+    "CREATE OR REPLACE FUNCTION {table}_track_change() RETURNS trigger AS $$ "
+    "DECLARE owner_id integer; number integer; BEGIN "
+    "IF TG_OP = 'DELETE' THEN "
+    "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {old_owner} "
+    "RETURNING id, change_count INTO owner_id, number; "
+    "IF FOUND THEN INSERT INTO tombstone (user_id, table_name, row_id, change_seq) "
+    "VALUES (owner_id, '{table}', old.id, number); END IF; "
+    "RETURN OLD; END IF; "
+    "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {owner} "
+    "RETURNING change_count INTO new.change_seq; "
+    "IF TG_OP = 'INSERT' THEN new.created_seq := new.change_seq; END IF; "
+    "RETURN new; END $$ LANGUAGE plpgsql"
+)
+
+
+def replace_triggers(version):
+    """ Replaces both tables' change tracking triggers with their version before (0) or after (1) this revision """
+    dialect = op.get_bind().dialect.name
+
+    for table, owner in sorted(OWNERS.items()):
+        names = {'table': table, 'owner': owner.format(row='new'), 'old_owner': owner.format(row='old')}
+
+        if dialect == 'sqlite':
+            for trigger, statements in sorted(SQLITE_TRIGGERS.items()):
+                op.execute('DROP TRIGGER IF EXISTS {}_change_{}'.format(table, trigger))
+                op.execute(statements[version].format(**names))
+
+        elif dialect == 'postgresql':
+            op.execute(POSTGRES_FUNCTION[version].format(**names))
+
+
+def restore_search_triggers(table):
+    """ Recreating a SQLite table drops its triggers, including those keeping its search index in sync """
+    if not op.get_bind().execute("SELECT name FROM sqlite_master WHERE name = '{}_search'".format(table)).first():
+        return
+
+    op.execute("CREATE TRIGGER IF NOT EXISTS {0}_search_insert AFTER INSERT ON {0} BEGIN "
+               "INSERT INTO {0}_search (rowid, name) VALUES (new.id, new.name); END".format(table))
+    op.execute("CREATE TRIGGER IF NOT EXISTS {0}_search_delete AFTER DELETE ON {0} BEGIN "
+               "INSERT INTO {0}_search ({0}_search, rowid, name) VALUES ('delete', old.id, old.name); "
+               "END".format(table))
+    op.execute("CREATE TRIGGER IF NOT EXISTS {0}_search_update AFTER UPDATE OF name ON {0} BEGIN "
+               "INSERT INTO {0}_search ({0}_search, rowid, name) VALUES ('delete', old.id, old.name); "
+               "INSERT INTO {0}_search (rowid, name) VALUES (new.id, new.name); END".format(table))
+
+
+def upgrade():
+    now = SQLITE_NOW if op.get_bind().dialect.name == 'sqlite' else POSTGRES_NOW
+
+    op.create_table('tombstone',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('user_id', sa.Integer(), nullable=False),
+                    sa.Column('table_name', sa.String(length=30), nullable=False),
+                    sa.Column('row_id', sa.Integer(), nullable=False),
+                    sa.Column('change_seq', sa.Integer(), nullable=False),
+                    sa.Column('deleted_at', sa.DateTime(), server_default=now, nullable=False),
+                    sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+                    sa.PrimaryKeyConstraint('id'))
+    op.create_index('ix_tombstone_user_id_change_seq', 'tombstone', ['user_id', 'change_seq'], unique=False)
+    op.create_index(op.f('ix_tombstone_deleted_at'), 'tombstone', ['deleted_at'], unique=False)
+
+    for table in sorted(OWNERS):
+        op.add_column(table, sa.Column('created_seq', sa.Integer()))
+        # Rows written so far were last changed by the change that created them, for all that is known
+        op.execute('UPDATE {} SET created_seq = change_seq'.format(table))
+
+    replace_triggers(1)
+
+
+def downgrade():
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+
+    if sqlite:
+        # Every change tracking trigger goes, as SQLite checks each trigger in the schema when a table is renamed
+        for table in sorted(OWNERS):
+            for trigger in ['insert', 'update', 'delete']:
+                op.execute('DROP TRIGGER IF EXISTS {}_change_{}'.format(table, trigger))
+
+    for table in sorted(OWNERS):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('created_seq')
+
+        if sqlite:
+            restore_search_triggers(table)
+
+    op.drop_index(op.f('ix_tombstone_deleted_at'), table_name='tombstone')
+    op.drop_index('ix_tombstone_user_id_change_seq', table_name='tombstone')
+    op.drop_table('tombstone')
+
+    if sqlite:
+        for table, owner in sorted(OWNERS.items()):
+            columns = 'name, creator_id' if table == 'bucketlist' else 'name, completed, bucketlist_id'
+            op.execute("CREATE TRIGGER {0}_change_update AFTER UPDATE OF {1} ON {0} BEGIN "
+                       "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {2}; "
+                       "UPDATE {0} SET change_seq = (SELECT change_count FROM \"user\" WHERE id = {2}) "
+                       "WHERE id = new.id; END".format(table, columns, owner.format(row='new')))
+
+    replace_triggers(0)
@@ -0,0 +1,157 @@
+"""Keep each item's owner on the item, and index its changes by owner
+
+Revision ID: b3e8f27c9d14
+Revises: f7b18a3c5d62
+Create Date: 2026-10-18 23:41:08.207315
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e8f27c9d14'
+down_revision = 'f7b18a3c5d62'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_NOW = sa.text("(STRFTIME('%Y-%m-%d %H:%M:%f000', 'now'))")
+
+ITEM_OWNER = '(SELECT creator_id FROM bucketlist WHERE id = {row}.bucketlist_id)'
+COMPLETED = 'CASE WHEN {row}.completed THEN 1 ELSE 0 END'
+
+# The item table's change tracking triggers, which write the owner's id to the row from this revision on
+SQLITE_CHANGE_TRIGGERS = {
+    'item_change_insert':
+        "CREATE TRIGGER IF NOT EXISTS item_change_insert AFTER INSERT ON item BEGIN "
+        "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {owner}; "
+        "UPDATE item SET change_seq = (SELECT change_count FROM \"user\" WHERE id = {owner}), "
+        "created_seq = (SELECT change_count FROM \"user\" WHERE id = {owner}){set_owner} "
+        "WHERE id = new.id; END",
+
+    'item_change_update':
+        "CREATE TRIGGER IF NOT EXISTS item_change_update AFTER UPDATE OF name, completed, bucketlist_id ON item BEGIN "
+        "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {owner}; "
+        "UPDATE item SET change_seq = (SELECT change_count FROM \"user\" WHERE id = {owner}){set_owner} "
+        "WHERE id = new.id; END"
+}
+
+# The item table's other triggers, which SQLite drops along with the table when it is recreated
+SQLITE_OTHER_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS item_change_delete AFTER DELETE ON item BEGIN "
+    "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {old_owner}; "
+    "INSERT INTO tombstone (user_id, table_name, row_id, change_seq) "
+    "SELECT id, 'item', old.id, change_count FROM \"user\" WHERE id = {old_owner}; END",
+
+    "CREATE TRIGGER IF NOT EXISTS item_count_insert AFTER INSERT ON item BEGIN "
+    "UPDATE bucketlist SET item_count = item_count + 1, completed_count = completed_count + {new_completed} "
+    "WHERE id = new.bucketlist_id; END",
+
+    "CREATE TRIGGER IF NOT EXISTS item_count_update AFTER UPDATE OF completed, bucketlist_id ON item BEGIN "
+    "UPDATE bucketlist SET item_count = item_count - 1, completed_count = completed_count - {old_completed} "
+    "WHERE id = old.bucketlist_id; "
+    "UPDATE bucketlist SET item_count = item_count + 1, completed_count = completed_count + {new_completed} "
+    "WHERE id = new.bucketlist_id; END",
+
+    "CREATE TRIGGER IF NOT EXISTS item_count_delete AFTER DELETE ON item BEGIN "
+    "UPDATE bucketlist SET item_count = item_count - 1, completed_count = completed_count - {old_completed} "
+    "WHERE id = old.bucketlist_id; END"
+]
+
+POSTGRES_CHANGE_FUNCTION = (
+    "CREATE OR REPLACE FUNCTION item_track_change() RETURNS trigger AS $$ "
+    "DECLARE owner_id integer; number integer; BEGIN "
+    "IF TG_OP = 'DELETE' THEN "
+    "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {old_owner} "
+    "RETURNING id, change_count INTO owner_id, number; "
+    "IF FOUND THEN INSERT INTO tombstone (user_id, table_name, row_id, change_seq) "
+    "VALUES (owner_id, 'item', old.id, number); END IF; "
+    "RETURN OLD; END IF; "
+    "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {owner} "
+    "RETURNING change_count INTO new.change_seq; {set_owner}"
+    "IF TG_OP = 'INSERT' THEN new.created_seq := new.change_seq; END IF; "
+    "RETURN new; END $$ LANGUAGE plpgsql")
+
+NAMES = {'owner': ITEM_OWNER.format(row='new'), 'old_owner': ITEM_OWNER.format(row='old'),
+         'new_completed': COMPLETED.format(row='new'), 'old_completed': COMPLETED.format(row='old')}
+
+
+def item_table():
+    """ The item table with its owner, and the indexes it had before this revision; for SQLite to recreate it from """
+    metadata = sa.MetaData()
+    sa.Table('bucketlist', metadata, sa.Column('id', sa.Integer, primary_key=True))
+
+    return sa.Table('item', metadata,
+                    sa.Column('id', sa.Integer, primary_key=True),
+                    sa.Column('name', sa.String(120), nullable=False),
+                    sa.Column('creation_date', sa.DateTime, server_default=SQLITE_NOW),
+                    sa.Column('modification_date', sa.DateTime, server_default=SQLITE_NOW),
+                    sa.Column('completed', sa.Boolean),
+                    sa.Column('bucketlist_id', sa.Integer, sa.ForeignKey('bucketlist.id', ondelete='CASCADE')),
+                    sa.Column('change_seq', sa.Integer),
+                    sa.Column('created_seq', sa.Integer),
+                    sa.Column('owner_id', sa.Integer),
+                    sa.UniqueConstraint('bucketlist_id', 'name', name='uq_item_bucketlist_id_name'),
+                    sa.Index('ix_item_bucketlist_id_id', 'bucketlist_id', 'id'),
+                    sa.Index('ix_item_bucketlist_id_change_seq', 'bucketlist_id', 'change_seq'))
+
+
+def restore_search_triggers(table):
+    """ Recreating a SQLite table drops its triggers, including those keeping its search index in sync """
+    if not op.get_bind().execute("SELECT name FROM sqlite_master WHERE name = '{}_search'".format(table)).first():
+        return
+
+    op.execute("CREATE TRIGGER IF NOT EXISTS {0}_search_insert AFTER INSERT ON {0} BEGIN "
+               "INSERT INTO {0}_search (rowid, name) VALUES (new.id, new.name); END".format(table))
+    op.execute("CREATE TRIGGER IF NOT EXISTS {0}_search_delete AFTER DELETE ON {0} BEGIN "
+               "INSERT INTO {0}_search ({0}_search, rowid, name) VALUES ('delete', old.id, old.name); "
+               "END".format(table))
+    op.execute("CREATE TRIGGER IF NOT EXISTS {0}_search_update AFTER UPDATE OF name ON {0} BEGIN "
+               "INSERT INTO {0}_search ({0}_search, rowid, name) VALUES ('delete', old.id, old.name); "
+               "INSERT INTO {0}_search (rowid, name) VALUES (new.id, new.name); END".format(table))
+
+
+def replace_change_tracking(sqlite, with_owner):
+    """ Recreates the item table's change tracking triggers, writing the owner's id to the row or not """
+    if sqlite:
+        set_owner = ', owner_id = {}'.format(NAMES['owner']) if with_owner else ''
+        for name, statement in sorted(SQLITE_CHANGE_TRIGGERS.items()):
+            op.execute('DROP TRIGGER IF EXISTS {}'.format(name))
+            op.execute(statement.format(set_owner=set_owner, **NAMES))
+    else:
+        set_owner = 'new.owner_id := {}; '.format(NAMES['owner']) if with_owner else ''
+        op.execute(POSTGRES_CHANGE_FUNCTION.format(set_owner=set_owner, **NAMES))
+
+
+def upgrade():
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+
+    op.add_column('item', sa.Column('owner_id', sa.Integer(), nullable=True))
+    # Items of soft deleted bucketlists get no owner, like their bucketlist
+    op.execute('UPDATE item SET owner_id = {}'.format(ITEM_OWNER.format(row='item')))
+
+    op.drop_index('ix_item_bucketlist_id_change_seq', table_name='item')
+    op.create_index('ix_item_owner_id_change_seq', 'item', ['owner_id', 'change_seq'], unique=False)
+
+    replace_change_tracking(sqlite, with_owner=True)
+
+
+def downgrade():
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+
+    if not sqlite:
+        op.create_index('ix_item_bucketlist_id_change_seq', 'item', ['bucketlist_id', 'change_seq'], unique=False)
+        op.drop_index('ix_item_owner_id_change_seq', table_name='item')
+        replace_change_tracking(sqlite, with_owner=False)
+        op.drop_column('item', 'owner_id')
+        return
+
+    # Recreating the table drops its triggers and the index on the owner, and restores the previous index
+    with op.batch_alter_table('item', copy_from=item_table(), recreate='always') as batch_op:
+        batch_op.drop_column('owner_id')
+
+    restore_search_triggers('item')
+    replace_change_tracking(sqlite, with_owner=False)
+    for statement in SQLITE_OTHER_TRIGGERS:
+        op.execute(statement.format(**NAMES))
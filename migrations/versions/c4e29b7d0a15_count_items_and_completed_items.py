@@ -0,0 +1,137 @@
+"""Count each bucketlist's items and completed items
+
+Revision ID: c4e29b7d0a15
+Revises: a83d4e6c1f02
+Create Date: 2026-10-18 19:26:53.840117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e29b7d0a15'
+down_revision = 'a83d4e6c1f02'
+branch_labels = None
+depends_on = None
+
+
+COMPLETED = 'CASE WHEN {row}.completed THEN 1 ELSE 0 END'
+
+SQLITE_COUNTER_DDL = [
+    "CREATE TRIGGER IF NOT EXISTS item_count_insert AFTER INSERT ON item BEGIN "
+    "UPDATE bucketlist SET item_count = item_count + 1, completed_count = completed_count + {new_completed} "
+    "WHERE id = new.bucketlist_id; END",
+
+    "CREATE TRIGGER IF NOT EXISTS item_count_update AFTER UPDATE OF completed, bucketlist_id ON item BEGIN "
+    "UPDATE bucketlist SET item_count = item_count - 1, completed_count = completed_count - {old_completed} "
+    "WHERE id = old.bucketlist_id; "
+    "UPDATE bucketlist SET item_count = item_count + 1, completed_count = completed_count + {new_completed} "
+    "WHERE id = new.bucketlist_id; END",
+
+    "CREATE TRIGGER IF NOT EXISTS item_count_delete AFTER DELETE ON item BEGIN "
+    "UPDATE bucketlist SET item_count = item_count - 1, completed_count = completed_count - {old_completed} "
+    "WHERE id = old.bucketlist_id; END"
+]
+
+POSTGRES_COUNTER_DDL = [
+    "CREATE OR REPLACE FUNCTION item_count_change() RETURNS trigger AS $$ BEGIN "
+    "IF TG_OP IN ('UPDATE', 'DELETE') THEN "
+    "UPDATE bucketlist SET item_count = item_count - 1, completed_count = completed_count - {old_completed} "
+    "WHERE id = old.bucketlist_id; END IF; "
+    "IF TG_OP IN ('INSERT', 'UPDATE') THEN "
+    "UPDATE bucketlist SET item_count = item_count + 1, completed_count = completed_count + {new_completed} "
+    "WHERE id = new.bucketlist_id; END IF; "
+    "RETURN NULL; END $$ LANGUAGE plpgsql",
+
+    "CREATE TRIGGER item_count_change AFTER INSERT OR UPDATE OF completed, bucketlist_id OR DELETE ON item "
+    "FOR EACH ROW EXECUTE PROCEDURE item_count_change()"
+]
+
+# The change tracking triggers as they stand at this revision, which SQLite has to drop and
+# recreate around the recreation of the bucketlist table
+CHANGE_TRACKING = {'bucketlist': ('{row}.creator_id', ['name', 'creator_id']),
+                   'item': ('(SELECT creator_id FROM bucketlist WHERE id = {row}.bucketlist_id)',
+                            ['name', 'completed', 'bucketlist_id'])}
+
+SQLITE_CHANGE_DDL = [
+    "CREATE TRIGGER IF NOT EXISTS {table}_change_insert AFTER INSERT ON {table} BEGIN "
+    "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {owner}; "
+    "UPDATE {table} SET change_seq = (SELECT change_count FROM \"user\" WHERE id = {owner}), "
+    "created_seq = (SELECT change_count FROM \"user\" WHERE id = {owner}) "
+    "WHERE id = new.id; END",
+
+    "CREATE TRIGGER IF NOT EXISTS {table}_change_update AFTER UPDATE OF {columns} ON {table} BEGIN "
+    "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {owner}; "
+    "UPDATE {table} SET change_seq = (SELECT change_count FROM \"user\" WHERE id = {owner}) "
+    "WHERE id = new.id; END",
+
+    "CREATE TRIGGER IF NOT EXISTS {table}_change_delete AFTER DELETE ON {table} BEGIN "
+    "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {old_owner}; "
+    "INSERT INTO tombstone (user_id, table_name, row_id, change_seq) "
+    "SELECT id, '{table}', old.id, change_count FROM \"user\" WHERE id = {old_owner}; END"
+]
+
+
+def counter_ddl(dialect):
+    """ The statements creating the item counting triggers """
+    statements = {'sqlite': SQLITE_COUNTER_DDL, 'postgresql': POSTGRES_COUNTER_DDL}.get(dialect, [])
+    return [statement.format(new_completed=COMPLETED.format(row='new'), old_completed=COMPLETED.format(row='old'))
+            for statement in statements]
+
+
+def restore_search_triggers(table):
+    """ Recreating a SQLite table drops its triggers, including those keeping its search index in sync """
+    if not op.get_bind().execute("SELECT name FROM sqlite_master WHERE name = '{}_search'".format(table)).first():
+        return
+
+    op.execute("CREATE TRIGGER IF NOT EXISTS {0}_search_insert AFTER INSERT ON {0} BEGIN "
+               "INSERT INTO {0}_search (rowid, name) VALUES (new.id, new.name); END".format(table))
+    op.execute("CREATE TRIGGER IF NOT EXISTS {0}_search_delete AFTER DELETE ON {0} BEGIN "
+               "INSERT INTO {0}_search ({0}_search, rowid, name) VALUES ('delete', old.id, old.name); "
+               "END".format(table))
+    op.execute("CREATE TRIGGER IF NOT EXISTS {0}_search_update AFTER UPDATE OF name ON {0} BEGIN "
+               "INSERT INTO {0}_search ({0}_search, rowid, name) VALUES ('delete', old.id, old.name); "
+               "INSERT INTO {0}_search (rowid, name) VALUES (new.id, new.name); END".format(table))
+
+
+def upgrade():
+    op.add_column('bucketlist', sa.Column('item_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('bucketlist', sa.Column('completed_count', sa.Integer(), nullable=False, server_default='0'))
+
+    completed = COMPLETED.format(row='item')
+    op.execute("UPDATE bucketlist SET "
+               "item_count = (SELECT COUNT(*) FROM item WHERE item.bucketlist_id = bucketlist.id), "
+               "completed_count = (SELECT COALESCE(SUM({}), 0) FROM item "
+               "WHERE item.bucketlist_id = bucketlist.id)".format(completed))
+
+    for statement in counter_ddl(op.get_bind().dialect.name):
+        op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    sqlite = dialect == 'sqlite'
+
+    if sqlite:
+        # Every trigger on item refers to bucketlist, which SQLite checks when the table is renamed
+        for trigger in ['insert', 'update', 'delete']:
+            op.execute('DROP TRIGGER IF EXISTS item_count_{}'.format(trigger))
+            for table in sorted(CHANGE_TRACKING):
+                op.execute('DROP TRIGGER IF EXISTS {}_change_{}'.format(table, trigger))
+
+    elif dialect == 'postgresql':
+        op.execute('DROP TRIGGER IF EXISTS item_count_change ON item')
+        op.execute('DROP FUNCTION IF EXISTS item_count_change()')
+
+    with op.batch_alter_table('bucketlist') as batch_op:
+        batch_op.drop_column('completed_count')
+        batch_op.drop_column('item_count')
+
+    if sqlite:
+        restore_search_triggers('bucketlist')
+
+        for table, (owner, columns) in sorted(CHANGE_TRACKING.items()):
+            for statement in SQLITE_CHANGE_DDL:
+                op.execute(statement.format(table=table, columns=', '.join(columns),
+                                            owner=owner.format(row='new'), old_owner=owner.format(row='old')))
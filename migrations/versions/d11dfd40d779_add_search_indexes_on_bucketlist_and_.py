@@ -0,0 +1,61 @@
+"""Add search indexes on bucketlist and item names
+
+Revision ID: d11dfd40d779
+Revises: 0b7d5c2e9a41
+Create Date: 2026-10-18 17:14:04.946717
+
+"""
+import sqlite3
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd11dfd40d779'
+down_revision = '0b7d5c2e9a41'
+branch_labels = None
+depends_on = None
+
+
+SEARCHED_TABLES = ['bucketlist', 'item']
+
+
+def sqlite_trigram_supported(bind):
+    if sqlite3.sqlite_version_info < (3, 34, 0):
+        return False
+    return 'ENABLE_FTS5' in [option for (option,) in bind.execute('PRAGMA compile_options')]
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    if bind.dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table in SEARCHED_TABLES:
+            op.execute('CREATE INDEX IF NOT EXISTS ix_{0}_name_trgm ON {0} USING gin (name gin_trgm_ops)'.format(table))
+
+    elif bind.dialect.name == 'sqlite' and sqlite_trigram_supported(bind):
+        for table in SEARCHED_TABLES:
+            op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS {0}_search "
+                       "USING fts5(name, content='{0}', content_rowid='id', tokenize='trigram')".format(table))
+            op.execute("CREATE TRIGGER IF NOT EXISTS {0}_search_insert AFTER INSERT ON {0} BEGIN "
+                       "INSERT INTO {0}_search (rowid, name) VALUES (new.id, new.name); END".format(table))
+            op.execute("CREATE TRIGGER IF NOT EXISTS {0}_search_delete AFTER DELETE ON {0} BEGIN "
+                       "INSERT INTO {0}_search ({0}_search, rowid, name) VALUES ('delete', old.id, old.name); "
+                       "END".format(table))
+            op.execute("CREATE TRIGGER IF NOT EXISTS {0}_search_update AFTER UPDATE OF name ON {0} BEGIN "
+                       "INSERT INTO {0}_search ({0}_search, rowid, name) VALUES ('delete', old.id, old.name); "
+                       "INSERT INTO {0}_search (rowid, name) VALUES (new.id, new.name); END".format(table))
+            op.execute("INSERT INTO {0}_search ({0}_search) VALUES ('rebuild')".format(table))
+
+
+def downgrade():
+    bind = op.get_bind()
+
+    for table in SEARCHED_TABLES:
+        if bind.dialect.name == 'postgresql':
+            op.execute('DROP INDEX IF EXISTS ix_{}_name_trgm'.format(table))
+
+        elif bind.dialect.name == 'sqlite':
+            for trigger in ['insert', 'delete', 'update']:
+                op.execute('DROP TRIGGER IF EXISTS {}_search_{}'.format(table, trigger))
+            op.execute('DROP TABLE IF EXISTS {}_search'.format(table))
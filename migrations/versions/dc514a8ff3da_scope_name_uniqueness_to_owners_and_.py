@@ -0,0 +1,81 @@
+"""Scope name uniqueness to owners and index ownership lookups
+
+Revision ID: dc514a8ff3da
+Revises: d11dfd40d779
+Create Date: 2026-10-18 17:15:21.302526
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'dc514a8ff3da'
+down_revision = 'd11dfd40d779'
+branch_labels = None
+depends_on = None
+
+
+metadata = sa.MetaData()
+
+# The tables as they stand at this revision; SQLite can only drop the unnamed
+# unique constraints on name by recreating the tables from these definitions.
+bucketlist = sa.Table('bucketlist', metadata,
+                      sa.Column('id', sa.Integer, primary_key=True),
+                      sa.Column('name', sa.String(120), nullable=False),
+                      sa.Column('creation_date', sa.Date, nullable=False),
+                      sa.Column('modification_date', sa.Date, nullable=False),
+                      sa.Column('creator_id', sa.Integer, sa.ForeignKey('user.id')))
+
+item = sa.Table('item', metadata,
+                sa.Column('id', sa.Integer, primary_key=True),
+                sa.Column('name', sa.String(120), nullable=False),
+                sa.Column('creation_date', sa.Date),
+                sa.Column('modification_date', sa.Date),
+                sa.Column('completed', sa.Boolean),
+                sa.Column('bucketlist_id', sa.Integer, sa.ForeignKey('bucketlist.id')))
+
+OWNERS = [(bucketlist, 'creator_id'), (item, 'bucketlist_id')]
+
+
+def restore_search_triggers(table):
+    """ Recreating a SQLite table drops its triggers, including those keeping its search index in sync """
+    if not op.get_bind().execute("SELECT name FROM sqlite_master WHERE name = '{}_search'".format(table)).first():
+        return
+
+    op.execute("CREATE TRIGGER IF NOT EXISTS {0}_search_insert AFTER INSERT ON {0} BEGIN "
+               "INSERT INTO {0}_search (rowid, name) VALUES (new.id, new.name); END".format(table))
+    op.execute("CREATE TRIGGER IF NOT EXISTS {0}_search_delete AFTER DELETE ON {0} BEGIN "
+               "INSERT INTO {0}_search ({0}_search, rowid, name) VALUES ('delete', old.id, old.name); "
+               "END".format(table))
+    op.execute("CREATE TRIGGER IF NOT EXISTS {0}_search_update AFTER UPDATE OF name ON {0} BEGIN "
+               "INSERT INTO {0}_search ({0}_search, rowid, name) VALUES ('delete', old.id, old.name); "
+               "INSERT INTO {0}_search (rowid, name) VALUES (new.id, new.name); END".format(table))
+
+
+def upgrade():
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+
+    for table, owner in OWNERS:
+        with op.batch_alter_table(table.name, copy_from=table if sqlite else None) as batch_op:
+            if not sqlite:
+                batch_op.drop_constraint('{}_name_key'.format(table.name), type_='unique')
+            batch_op.create_unique_constraint('uq_{}_{}_name'.format(table.name, owner), [owner, 'name'])
+            batch_op.create_index('ix_{}_{}_id'.format(table.name, owner), [owner, 'id'])
+
+        if sqlite:
+            restore_search_triggers(table.name)
+
+
+def downgrade():
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+
+    for table, owner in OWNERS:
+        with op.batch_alter_table(table.name, copy_from=table if sqlite else None) as batch_op:
+            if not sqlite:
+                batch_op.drop_index('ix_{}_{}_id'.format(table.name, owner))
+                batch_op.drop_constraint('uq_{}_{}_name'.format(table.name, owner), type_='unique')
+            batch_op.create_unique_constraint('{}_name_key'.format(table.name), ['name'])
+
+        if sqlite:
+            restore_search_triggers(table.name)
@@ -0,0 +1,120 @@
+"""Cascade item deletes with their bucketlists, and drop orphaned items
+
+Revision ID: f7b18a3c5d62
+Revises: c4e29b7d0a15
+Create Date: 2026-10-18 20:12:36.518734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7b18a3c5d62'
+down_revision = 'c4e29b7d0a15'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_NOW = sa.text("(STRFTIME('%Y-%m-%d %H:%M:%f000', 'now'))")
+
+POSTGRES_FOREIGN_KEY = 'item_bucketlist_id_fkey'
+
+# The item table's triggers as they stand at this revision, which SQLite drops along with the table
+ITEM_OWNER = '(SELECT creator_id FROM bucketlist WHERE id = {row}.bucketlist_id)'
+COMPLETED = 'CASE WHEN {row}.completed THEN 1 ELSE 0 END'
+
+SQLITE_ITEM_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS item_change_insert AFTER INSERT ON item BEGIN "
+    "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {owner}; "
+    "UPDATE item SET change_seq = (SELECT change_count FROM \"user\" WHERE id = {owner}), "
+    "created_seq = (SELECT change_count FROM \"user\" WHERE id = {owner}) "
+    "WHERE id = new.id; END",
+
+    "CREATE TRIGGER IF NOT EXISTS item_change_update AFTER UPDATE OF name, completed, bucketlist_id ON item BEGIN "
+    "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {owner}; "
+    "UPDATE item SET change_seq = (SELECT change_count FROM \"user\" WHERE id = {owner}) "
+    "WHERE id = new.id; END",
+
+    "CREATE TRIGGER IF NOT EXISTS item_change_delete AFTER DELETE ON item BEGIN "
+    "UPDATE \"user\" SET change_count = change_count + 1 WHERE id = {old_owner}; "
+    "INSERT INTO tombstone (user_id, table_name, row_id, change_seq) "
+    "SELECT id, 'item', old.id, change_count FROM \"user\" WHERE id = {old_owner}; END",
+
+    "CREATE TRIGGER IF NOT EXISTS item_count_insert AFTER INSERT ON item BEGIN "
+    "UPDATE bucketlist SET item_count = item_count + 1, completed_count = completed_count + {new_completed} "
+    "WHERE id = new.bucketlist_id; END",
+
+    "CREATE TRIGGER IF NOT EXISTS item_count_update AFTER UPDATE OF completed, bucketlist_id ON item BEGIN "
+    "UPDATE bucketlist SET item_count = item_count - 1, completed_count = completed_count - {old_completed} "
+    "WHERE id = old.bucketlist_id; "
+    "UPDATE bucketlist SET item_count = item_count + 1, completed_count = completed_count + {new_completed} "
+    "WHERE id = new.bucketlist_id; END",
+
+    "CREATE TRIGGER IF NOT EXISTS item_count_delete AFTER DELETE ON item BEGIN "
+    "UPDATE bucketlist SET item_count = item_count - 1, completed_count = completed_count - {old_completed} "
+    "WHERE id = old.bucketlist_id; END"
+]
+
+
+def item_table(ondelete):
+    """ The item table with its foreign key to bucketlist deleting on cascade or not; for SQLite to recreate it from """
+    metadata = sa.MetaData()
+    sa.Table('bucketlist', metadata, sa.Column('id', sa.Integer, primary_key=True))
+
+    return sa.Table('item', metadata,
+                    sa.Column('id', sa.Integer, primary_key=True),
+                    sa.Column('name', sa.String(120), nullable=False),
+                    sa.Column('creation_date', sa.DateTime, server_default=SQLITE_NOW),
+                    sa.Column('modification_date', sa.DateTime, server_default=SQLITE_NOW),
+                    sa.Column('completed', sa.Boolean),
+                    sa.Column('bucketlist_id', sa.Integer, sa.ForeignKey('bucketlist.id', ondelete=ondelete)),
+                    sa.Column('change_seq', sa.Integer),
+                    sa.Column('created_seq', sa.Integer),
+                    sa.UniqueConstraint('bucketlist_id', 'name', name='uq_item_bucketlist_id_name'),
+                    sa.Index('ix_item_bucketlist_id_id', 'bucketlist_id', 'id'),
+                    sa.Index('ix_item_bucketlist_id_change_seq', 'bucketlist_id', 'change_seq'))
+
+
+def restore_search_triggers(table):
+    """ Recreating a SQLite table drops its triggers, including those keeping its search index in sync """
+    if not op.get_bind().execute("SELECT name FROM sqlite_master WHERE name = '{}_search'".format(table)).first():
+        return
+
+    op.execute("CREATE TRIGGER IF NOT EXISTS {0}_search_insert AFTER INSERT ON {0} BEGIN "
+               "INSERT INTO {0}_search (rowid, name) VALUES (new.id, new.name); END".format(table))
+    op.execute("CREATE TRIGGER IF NOT EXISTS {0}_search_delete AFTER DELETE ON {0} BEGIN "
+               "INSERT INTO {0}_search ({0}_search, rowid, name) VALUES ('delete', old.id, old.name); "
+               "END".format(table))
+    op.execute("CREATE TRIGGER IF NOT EXISTS {0}_search_update AFTER UPDATE OF name ON {0} BEGIN "
+               "INSERT INTO {0}_search ({0}_search, rowid, name) VALUES ('delete', old.id, old.name); "
+               "INSERT INTO {0}_search (rowid, name) VALUES (new.id, new.name); END".format(table))
+
+
+def replace_foreign_key(ondelete):
+    """ Recreates the foreign key of items to their bucketlist, deleting on cascade or not """
+    if op.get_bind().dialect.name != 'sqlite':
+        op.drop_constraint(POSTGRES_FOREIGN_KEY, 'item', type_='foreignkey')
+        op.create_foreign_key(POSTGRES_FOREIGN_KEY, 'item', 'bucketlist', ['bucketlist_id'], ['id'], ondelete=ondelete)
+        return
+
+    with op.batch_alter_table('item', copy_from=item_table(ondelete), recreate='always'):
+        pass
+
+    restore_search_triggers('item')
+    for statement in SQLITE_ITEM_TRIGGERS:
+        op.execute(statement.format(owner=ITEM_OWNER.format(row='new'), old_owner=ITEM_OWNER.format(row='old'),
+                                    new_completed=COMPLETED.format(row='new'),
+                                    old_completed=COMPLETED.format(row='old')))
+
+
+def upgrade():
+    # Items whose bucketlist was deleted before; deleting one used to set its bucketlist_id to NULL
+    op.execute('DELETE FROM item WHERE bucketlist_id IS NULL '
+               'OR bucketlist_id NOT IN (SELECT id FROM bucketlist)')
+
+    replace_foreign_key('CASCADE')
+
+
+def downgrade():
+    replace_foreign_key(None)
@@ -1,5 +1,8 @@
-from app import app
+from app import app, db
 
 
 if __name__ == "__main__":
+    # The development server creates whatever the schema lacks, which the app itself leaves to manage.py
+    with app.app_context():
+        db.create_all()
     app.run()
@@ -0,0 +1,5 @@
+import sys
+
+# The ASGI adapter and its tests are written with async def, which Python 3.4 (as run by CI) cannot
+# even compile; so their module is left out of collection there, rather than failing it.
+collect_ignore = ['test_asgi.py'] if sys.version_info < (3, 5) else []
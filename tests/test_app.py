@@ -0,0 +1,78 @@
+import os
+import unittest
+from unittest import mock
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import Pool, QueuePool
+import config
+from app import app as default_app, create_app, db
+from app.controller import utils
+from app.database.pool import protect_from_fork
+
+
+class MetricsElsewhere(config.Testing):
+    METRICS_PATH = '/internal/metrics'
+
+
+class RateLimited(config.Testing):
+    RATE_LIMIT_BACKEND = 'local'
+    PRINCIPAL_CACHE_SIZE = 7
+
+
+class TestAppFactory(unittest.TestCase):
+
+    def test_nothing_connected_until_first_use(self):
+        connections = []
+
+        def record_connection(*args):
+            connections.append(args)
+
+        event.listen(Pool, 'connect', record_connection)
+        try:
+            app = create_app(MetricsElsewhere)
+            self.assertEqual(connections, [], msg='Database connected to while building the app')
+            self.assertEqual(len(app.extensions['set_up_engines']), 0, msg='Engine set up before its first use')
+
+            with app.app_context():
+                db.engine.execute('SELECT 1')
+            self.assertEqual(len(connections), 1)
+            self.assertEqual(len(app.extensions['set_up_engines']), 1)
+        finally:
+            event.remove(Pool, 'connect', record_connection)
+
+    def test_apps_built_with_their_own_settings(self):
+        client = create_app(MetricsElsewhere).test_client()
+
+        self.assertEqual(client.get('/internal/metrics').status_code, 200)
+        self.assertEqual(client.get('/metrics').status_code, 404)
+        self.assertEqual(client.get('/api/V1/bucketlists').status_code, 401)
+
+    def test_helpers_built_with_each_apps_settings(self):
+        app = create_app(RateLimited)
+
+        with app.app_context():
+            self.assertEqual(utils.principal_cache.maxsize, 7)
+            self.assertIsNotNone(utils.rate_limiter._get_current_object())
+
+        with default_app.app_context():
+            self.assertNotEqual(utils.principal_cache.maxsize, 7)
+            self.assertIsNone(utils.rate_limiter._get_current_object(), msg="Another app's rate limiter used")
+
+
+class TestForkProtection(unittest.TestCase):
+
+    def test_inherited_connections_replaced(self):
+        engine = create_engine('sqlite://', poolclass=QueuePool)
+        protect_from_fork(engine)
+
+        with engine.connect() as connection:
+            parent_connection = connection.connection.connection
+
+        with engine.connect() as connection:
+            self.assertIs(connection.connection.connection, parent_connection,
+                          msg='Pooled connection not reused within its own process')
+
+        with mock.patch('os.getpid', return_value=os.getpid() + 1):
+            with engine.connect() as connection:
+                self.assertIsNot(connection.connection.connection, parent_connection,
+                                 msg="Connection of the parent process used after a fork")
+                self.assertEqual(connection.scalar('SELECT 1'), 1)
@@ -0,0 +1,97 @@
+# Needs Python 3.5 or later, for its async def helpers and app.asgi's; conftest.py leaves it out on older ones
+import asyncio
+import json
+from unittest import mock
+from .test_base import BaseTest
+from app import app
+from app.asgi import ASGIAdapter, build_environ
+
+
+class TestASGIAdapter(BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.adapter = ASGIAdapter(app, workers=2)
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.adapter.executor.shutdown(wait=True)
+        self.loop.close()
+        super().tearDown()
+
+    def call(self, scope, messages):
+        """ Calls the adapter with a scope, receiving the given messages; returning those it sent """
+        received, sent = list(messages), []
+
+        async def receive():
+            return received.pop(0) if received else {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        self.loop.run_until_complete(self.adapter(scope, receive, send))
+        return sent
+
+    def request(self, method, path, body_chunks=(b'',), headers=None, query_string=b''):
+        headers = [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+        headers.append((b'token', self.auth_token))
+        scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query_string,
+                 'headers': headers, 'http_version': '1.1', 'scheme': 'http',
+                 'server': ('testserver', 80), 'client': ('127.0.0.1', 50000)}
+        messages = [{'type': 'http.request', 'body': chunk, 'more_body': number < len(body_chunks) - 1}
+                    for number, chunk in enumerate(body_chunks)]
+
+        sent = self.call(scope, messages)
+        start = sent[0]
+        body = b''.join(message.get('body', b'') for message in sent[1:])
+        return start, body, sent
+
+    def test_get(self):
+        start, body, _ = self.request('GET', '/api/V1/bucketlists')
+
+        self.assertEqual(start.get('status'), 200)
+        self.assertIn((b'content-type', b'application/json'), start.get('headers'))
+        self.assertEqual(len(json.loads(body.decode()).get('Bucketlists')), 5)
+
+    def test_body_in_chunks(self):
+        start, _, _ = self.request('POST', '/api/V1/bucketlists', body_chunks=(b'name=Hi', b'kes', b''),
+                                   headers={'Content-Type': 'application/x-www-form-urlencoded',
+                                            'Content-Length': '10'})
+        self.assertEqual(start.get('status'), 200)
+
+        _, body, _ = self.request('GET', '/api/V1/bucketlists', query_string=b'q=Hikes')
+        self.assertEqual([bucketlist.get('name') for bucketlist in json.loads(body.decode()).get('Bucketlists')],
+                         ['Hikes'])
+
+    def test_large_response_streamed(self):
+        with mock.patch('app.asgi.RESPONSE_BUFFER_SIZE', 100):
+            start, body, sent = self.request('GET', '/api/V1/bucketlists/export')
+
+        self.assertEqual(start.get('status'), 200)
+        self.assertTrue(len(sent) > 2, msg='Response larger than the buffer not streamed')
+        self.assertTrue(all(message.get('more_body') for message in sent[1:-1]))
+        self.assertFalse(sent[-1].get('more_body'))
+        self.assertEqual(len(body.decode().splitlines()), 5)
+
+    def test_small_response_buffered(self):
+        _, _, sent = self.request('GET', '/api/V1/bucketlists/export')
+        self.assertEqual(len(sent), 2)
+
+    def test_disconnect_before_body(self):
+        scope = {'type': 'http', 'method': 'POST', 'path': '/api/V1/bucketlists', 'headers': []}
+        sent = self.call(scope, [{'type': 'http.request', 'body': b'name=', 'more_body': True}])
+        self.assertEqual(sent, [], msg='Request of a disconnected client passed to the app')
+
+    def test_lifespan(self):
+        sent = self.call({'type': 'lifespan'}, [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+        self.assertEqual([message.get('type') for message in sent],
+                         ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
+
+    def test_environ(self):
+        environ = build_environ({'method': 'GET', 'path': '/café', 'query_string': b'a=1',
+                                 'headers': [(b'content-type', b'text/csv'), (b'x-tag', b'a'), (b'x-tag', b'b')]},
+                                None)
+
+        self.assertEqual(environ.get('PATH_INFO'), '/café'.encode().decode('latin-1'))
+        self.assertEqual(environ.get('CONTENT_TYPE'), 'text/csv')
+        self.assertEqual(environ.get('HTTP_X_TAG'), 'a,b')
+        self.assertEqual(environ.get('SERVER_NAME'), 'localhost')
@@ -1,8 +1,12 @@
+from contextlib import contextmanager
 from hashlib import sha256
 import unittest
 import jwt
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from app import app, db, session
 from app.database.models import Bucketlist, Item, User
+from app.controller.utils import principal_cache, revocation_list
 from app import SECRET_KEY
 
 
@@ -10,6 +14,8 @@ class BaseTest(unittest.TestCase):
     def setUp(self):
         self.app = app.test_client()
         db.create_all()
+        principal_cache.clear()
+        revocation_list.clear()
 
         test_user = User(username='admin',
                          password=sha256(('admin' + SECRET_KEY).encode()).hexdigest())
@@ -28,3 +34,24 @@ class BaseTest(unittest.TestCase):
 
     def tearDown(self):
         db.drop_all()
+
+    def query_plan(self, statement, parameters):
+        """ Details of each step SQLite takes to execute a statement """
+        return [row[-1] for row in db.engine.execute('EXPLAIN QUERY PLAN ' + statement, parameters)]
+
+    @contextmanager
+    def count_queries(self, with_parameters=False):
+        """
+        Context manager that collects every SQL statement executed within it;
+        as (statement, parameters) pairs with_parameters.
+        """
+        statements = []
+
+        def record_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters) if with_parameters else statement)
+
+        event.listen(Engine, 'before_cursor_execute', record_statement)
+        try:
+            yield statements
+        finally:
+            event.remove(Engine, 'before_cursor_execute', record_statement)
@@ -1,5 +1,8 @@
 from itertools import cycle
 from .test_base import BaseTest
+from app import db, session
+from app.database.search import trigram_search_supported
+from app.database.models import Bucketlist, Item, User
 import json
 
 
@@ -72,6 +75,38 @@ class BucketlistsTest(BaseTest):
             self.assertEqual(bucketlist.get('name'), next(expected_names),
                              msg='Correct names of bucketlists not returned')
 
+    def test_item_counts(self):
+        response = self.app.get('api/V1/bucketlists',
+                                headers={'token': self.auth_token})
+
+        response_content = json.loads(response.data.decode())
+        self.assertEqual([bucketlist.get('items') for bucketlist in response_content.get('Bucketlists')],
+                         [5, 'None', 'None', 'None', 'None'],
+                         msg='Bucketlists view returns wrong item counts')
+
+    def test_constant_queries_per_page(self):
+        with self.count_queries() as statements:
+            self.app.get('api/V1/bucketlists', headers={'token': self.auth_token})
+        queries_before = len(statements)
+
+        # More bucketlists, each with items, must not lead to more queries for the page
+        admin = session.query(User).filter_by(username='admin').first()
+        for number in range(10):
+            bucketlist = Bucketlist(name='Bucketlist {}'.format(number), created_by=admin)
+            session.add(bucketlist)
+            for item_number in range(3):
+                session.add(Item(name='Item {} {}'.format(number, item_number), bucketlist=bucketlist))
+        session.commit()
+
+        with self.count_queries() as statements:
+            response = self.app.get('api/V1/bucketlists', headers={'token': self.auth_token})
+
+        self.assertEqual(len(json.loads(response.data.decode()).get('Bucketlists')), 15)
+        self.assertEqual(len(statements), queries_before,
+                         msg='Number of queries grows with the number of bucketlists listed')
+        self.assertFalse([statement for statement in statements if 'item.name' in statement],
+                         msg='Item rows are loaded to count the items of bucketlists')
+
     def test_pagination(self):
         response = self.app.get('api/V1/bucketlists?limit=3&offset=1',
                                 headers={'token': self.auth_token})
@@ -87,6 +122,56 @@ class BucketlistsTest(BaseTest):
         self.assertEqual(len(response_content.get('Bucketlists')), 2,
                          msg='Bucketlists view returns wrong number of bucketlists per page')
 
+    def test_pagination_out_of_bounds(self):
+        response = self.app.get('api/V1/bucketlists?limit=2&offset=10',
+                                headers={'token': self.auth_token})
+
+        response_content = json.loads(response.data.decode())
+        self.assertEqual(response_content.get('Page'), '3 of 3',
+                         msg='Bucketlists view does not return the last page for an out of bounds offset')
+        self.assertEqual([bucketlist.get('name') for bucketlist in response_content.get('Bucketlists')],
+                         ['Concerts'])
+
+    def test_cursor_pagination(self):
+        names = []
+        cursor = ''
+
+        # Walk through every page, following the cursor returned with each one
+        while cursor is not None:
+            response = self.app.get('api/V1/bucketlists?limit=2&cursor=' + cursor,
+                                    headers={'token': self.auth_token})
+            self.assertEqual(response.status_code, 200)
+
+            response_content = json.loads(response.data.decode())
+            self.assertLessEqual(len(response_content.get('Bucketlists')), 2,
+                                 msg='Bucketlists view returns wrong number of bucketlists per page')
+            names.extend(bucketlist.get('name') for bucketlist in response_content.get('Bucketlists'))
+            cursor = response_content.get('next_cursor')
+
+        self.assertEqual(names, ['Food', 'Travel', 'People', 'Movies', 'Concerts'],
+                         msg='Cursor pagination skips or repeats bucketlists')
+
+    def test_cursor_pagination_by_date_created(self):
+        response = self.app.get('api/V1/bucketlists?limit=3&cursor=&sort=date_created',
+                                headers={'token': self.auth_token})
+        response_content = json.loads(response.data.decode())
+
+        response = self.app.get('api/V1/bucketlists?limit=3&cursor=' + response_content.get('next_cursor'),
+                                headers={'token': self.auth_token})
+        response_content = json.loads(response.data.decode())
+
+        self.assertEqual([bucketlist.get('name') for bucketlist in response_content.get('Bucketlists')],
+                         ['Movies', 'Concerts'])
+        self.assertIsNone(response_content.get('next_cursor'),
+                          msg='Cursor returned for the last page')
+
+    def test_invalid_pagination_arguments(self):
+        for query in ['cursor=garbage', 'cursor=&sort=name', 'limit=0', 'offset=first']:
+            response = self.app.get('api/V1/bucketlists?' + query,
+                                    headers={'token': self.auth_token})
+            self.assertEqual(response.status_code, 400,
+                             msg='Bucketlists view accepts invalid pagination arguments: ' + query)
+
     def test_search(self):
         response = self.app.get('api/V1/bucketlists?q=od',
                                 headers={'token': self.auth_token})
@@ -95,6 +180,28 @@ class BucketlistsTest(BaseTest):
         self.assertEqual(response_content.get('Bucketlists')[0].get('name'), 'Food',
                          msg='search query argument not filtering results')
 
+    def test_search_phrase_taken_literally(self):
+        # Phrases this short are searched with LIKE, whose wildcards and escape character must not apply
+        for phrase in ['o%25', 'o_', 'o\\', '\\o']:
+            response = self.app.get('api/V1/bucketlists?q=' + phrase,
+                                    headers={'token': self.auth_token})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.data.decode()).get('Bucketlists'), [],
+                             msg='search query argument not taken literally: ' + phrase)
+
+    def test_search_uses_index(self):
+        if not trigram_search_supported(db.engine):
+            self.skipTest('SQLite library lacks FTS5 trigram support')
+
+        with self.count_queries() as statements:
+            response = self.app.get('api/V1/bucketlists?q=ravel',
+                                    headers={'token': self.auth_token})
+
+        bucketlists = json.loads(response.data.decode()).get('Bucketlists')
+        self.assertEqual([bucketlist.get('name') for bucketlist in bucketlists], ['Travel'])
+        self.assertTrue([statement for statement in statements if 'bucketlist_search MATCH' in statement],
+                        msg='Search does not use the search index')
+
 
 class TestBucketlistDetail(BaseTest):
 
@@ -0,0 +1,83 @@
+import time
+import unittest
+import jwt
+from .test_base import BaseTest
+from app import app, session
+from app.controller.cache import LRUCache
+from app.controller.utils import principal_cache
+from app.database.models import User
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_least_recently_used_evicted(self):
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'),
+                          msg='Least recently used entry not evicted')
+        self.assertEqual(cache.stats().get('evictions'), 1)
+
+    def test_expiry(self):
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set('a', 1, ttl=0.01)
+        cache.set('b', 2, ttl=-5)
+        time.sleep(0.02)
+
+        self.assertIsNone(cache.get('a'), msg='Expired entry returned')
+        self.assertIsNone(cache.get('b'), msg='Entry cached with a ttl in the past')
+
+    def test_hit_and_miss_counters(self):
+        cache = LRUCache()
+        cache.get('a')
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('a')
+
+        stats = cache.stats()
+        self.assertEqual((stats.get('hits'), stats.get('misses'), stats.get('size')), (2, 1, 1))
+
+
+class TestPrincipalCache(BaseTest):
+
+    def test_user_lookup_cached(self):
+        self.app.get('api/V1/bucketlists', headers={'token': self.auth_token})
+        hits_before = principal_cache.stats().get('hits')
+
+        with self.count_queries() as statements:
+            response = self.app.get('api/V1/bucketlists', headers={'token': self.auth_token})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([statement for statement in statements if 'user.username' in statement],
+                         msg='User looked up in the database despite being cached')
+        self.assertEqual(principal_cache.stats().get('hits'), hits_before + 1)
+
+    def test_ttl_bounded_by_token_expiry(self):
+        token = jwt.encode({'username': 'admin', 'exp': int(time.time()) + 1}, app.config.get('SECRET_KEY'))
+        self.app.get('api/V1/bucketlists', headers={'token': token})
+
+        time.sleep(1.1)
+        self.assertIsNone(principal_cache.get('admin'),
+                          msg='Cached principal outlives the token it was loaded for')
+
+    def test_invalidated_on_user_changes(self):
+        self.app.get('api/V1/bucketlists', headers={'token': self.auth_token})
+        self.assertIsNotNone(principal_cache.get('admin'))
+
+        admin = session.query(User).filter_by(username='admin').first()
+        admin.password = 'changed'
+        session.commit()
+        self.assertIsNone(principal_cache.get('admin'),
+                          msg='Password change does not invalidate the cached principal')
+
+        self.app.get('api/V1/bucketlists', headers={'token': self.auth_token})
+        session.delete(admin)
+        session.commit()
+
+        response = self.app.get('api/V1/bucketlists', headers={'token': self.auth_token})
+        self.assertEqual(response.status_code, 401,
+                         msg='Deleted user still authenticated through the principal cache')
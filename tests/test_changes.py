@@ -0,0 +1,75 @@
+import datetime
+import time
+from .test_base import BaseTest
+from app import db, session
+from app.controller.bulk_import import Importer, parse_csv
+from app.database.models import Bucketlist, Item, User
+
+
+class TestChangeTracking(BaseTest):
+
+    def change_count(self, username='admin'):
+        session.expire_all()
+        return session.query(User.change_count).filter_by(username=username).scalar()
+
+    def changed_since(self, change_number):
+        """ Names of the admin's bucketlists and items written after the given change """
+        session.expire_all()
+        bucketlists = session.query(Bucketlist.name)\
+            .filter(Bucketlist.creator_id == 1, Bucketlist.change_seq > change_number)
+        items = session.query(Item.name).join(Bucketlist, Item.bucketlist_id == Bucketlist.id)\
+            .filter(Bucketlist.creator_id == 1, Item.change_seq > change_number)
+        return sorted(row.name for row in bucketlists.union_all(items))
+
+    def test_timestamps_set_by_database(self):
+        bucketlist = session.query(Bucketlist).filter_by(id=1).first()
+
+        self.assertIsInstance(bucketlist.creation_date, datetime.datetime)
+        self.assertTrue(abs(bucketlist.creation_date - datetime.datetime.utcnow()) < datetime.timedelta(minutes=1),
+                        msg='Creation time not the current UTC time')
+
+        created = bucketlist.modification_date
+        time.sleep(0.01)
+        self.app.put('api/V1/bucketlists/1', headers={'token': self.auth_token}, data={'name': 'Meals'})
+        session.expire_all()
+
+        self.assertGreater(session.query(Bucketlist).filter_by(id=1).first().modification_date, created,
+                           msg='Modification time not advanced, to within a second, by an update')
+
+    def test_every_write_counted(self):
+        self.assertEqual(self.change_count(), 10, msg='Five bucketlists and five items not counted')
+
+        self.app.post('api/V1/bucketlists/1/items', headers={'token': self.auth_token}, data={'name': 'Oslo'})
+        self.assertEqual(self.change_count(), 11)
+
+        self.app.put('api/V1/bucketlists/1/items/1', headers={'token': self.auth_token}, data={'done': 'true'})
+        self.assertEqual(self.change_count(), 12)
+
+        self.app.delete('api/V1/bucketlists/1/items/2', headers={'token': self.auth_token})
+        self.assertEqual(self.change_count(), 13)
+
+    def test_changed_since(self):
+        before = self.change_count()
+
+        self.app.post('api/V1/bucketlists', headers={'token': self.auth_token}, data={'name': 'Hikes'})
+        self.app.put('api/V1/bucketlists/1/items/3', headers={'token': self.auth_token}, data={'name': 'Oslo'})
+
+        self.assertEqual(self.changed_since(before), ['Hikes', 'Oslo'])
+        self.assertEqual(self.changed_since(self.change_count()), [])
+
+    def test_bulk_writes_counted(self):
+        before = self.change_count()
+
+        with db.engine.begin() as connection:
+            Importer(connection, user_id=1).run(parse_csv(['bucketlist,item\n', 'Hikes,Elgon\n', 'Hikes,Rwenzori\n']))
+
+        self.assertEqual(self.change_count(), before + 3)
+        self.assertEqual(self.changed_since(before), ['Elgon', 'Hikes', 'Rwenzori'])
+
+    def test_counters_per_user(self):
+        other_user = User(username='other', password='password')
+        session.add(Bucketlist(name='Secret', created_by=other_user))
+        session.commit()
+
+        self.assertEqual(self.change_count('other'), 1)
+        self.assertEqual(self.change_count(), 10, msg="Another user's write counted for admin")
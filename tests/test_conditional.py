@@ -0,0 +1,90 @@
+import json
+from unittest import mock
+from .test_base import BaseTest
+from app.controller.cache import LocalBackend, ResponseCache
+
+
+class TestConditionalGet(BaseTest):
+
+    def test_etag_on_every_get_resource(self):
+        for url in ['api/V1/bucketlists', 'api/V1/bucketlists/1',
+                    'api/V1/bucketlists/1/items', 'api/V1/bucketlists/1/items/1']:
+            response = self.app.get(url, headers={'token': self.auth_token})
+            etag = response.headers.get('ETag')
+            self.assertTrue(etag, msg='No ETag on GET ' + url)
+
+            response = self.app.get(url, headers={'token': self.auth_token, 'If-None-Match': etag})
+            self.assertEqual(response.status_code, 304,
+                             msg='Matching If-None-Match not answered with 304 on GET ' + url)
+            self.assertFalse(response.data)
+
+    def test_etag_changes_on_write(self):
+        response = self.app.get('api/V1/bucketlists/1', headers={'token': self.auth_token})
+        etag = response.headers.get('ETag')
+
+        self.app.put('api/V1/bucketlists/1/items/2', headers={'token': self.auth_token}, data={'name': 'Oslo'})
+
+        response = self.app.get('api/V1/bucketlists/1', headers={'token': self.auth_token, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200,
+                         msg='Stale ETag still matches after a write')
+        self.assertNotEqual(response.headers.get('ETag'), etag)
+
+    def test_not_modified_without_running_view(self):
+        response = self.app.get('api/V1/bucketlists/1/items', headers={'token': self.auth_token})
+        etag = response.headers.get('ETag')
+
+        with self.count_queries() as statements:
+            response = self.app.get('api/V1/bucketlists/1/items',
+                                    headers={'token': self.auth_token, 'If-None-Match': etag})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(statements), 1, msg='Items queried to answer with a 304')
+        self.assertIn('change_count', statements[0])
+
+    def test_etag_depends_on_query(self):
+        response = self.app.get('api/V1/bucketlists?limit=2', headers={'token': self.auth_token})
+        etag = response.headers.get('ETag')
+
+        response = self.app.get('api/V1/bucketlists?limit=3', headers={'token': self.auth_token, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200, msg='ETag of another page matches')
+
+    def test_no_etag_on_errors(self):
+        response = self.app.get('api/V1/bucketlists/8734', headers={'token': self.auth_token})
+        self.assertEqual(response.status_code, 404)
+        self.assertIsNone(response.headers.get('ETag'))
+
+
+class TestResponseCache(BaseTest):
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('app.controller.utils.response_cache', ResponseCache(LocalBackend()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_cached_response_served_without_queries(self):
+        first_response = self.app.get('api/V1/bucketlists/1/items', headers={'token': self.auth_token})
+
+        with self.count_queries() as statements:
+            response = self.app.get('api/V1/bucketlists/1/items', headers={'token': self.auth_token})
+
+        self.assertEqual(response.data, first_response.data)
+        self.assertEqual(response.headers.get('ETag'), first_response.headers.get('ETag'))
+        self.assertFalse(statements,
+                         msg='Cached response still queries the database')
+
+    def test_writes_invalidate_cached_responses(self):
+        self.app.get('api/V1/bucketlists/1/items', headers={'token': self.auth_token})
+        self.app.post('api/V1/bucketlists/1/items', headers={'token': self.auth_token}, data={'name': 'Oslo'})
+
+        response = self.app.get('api/V1/bucketlists/1/items', headers={'token': self.auth_token})
+        self.assertIn('Oslo', [item.get('name') for item in json.loads(response.data.decode()).get('Items')],
+                      msg='Stale response served after a write')
+
+    def test_failed_writes_keep_cached_responses(self):
+        self.app.get('api/V1/bucketlists/1/items', headers={'token': self.auth_token})
+        self.app.post('api/V1/bucketlists/1/items', headers={'token': self.auth_token}, data={'name': 'Tokyo'})
+
+        with self.count_queries() as statements:
+            self.app.get('api/V1/bucketlists/1/items', headers={'token': self.auth_token})
+        self.assertFalse(statements)
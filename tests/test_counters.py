@@ -0,0 +1,87 @@
+import io
+import json
+from .test_base import BaseTest
+from app import db, session
+from app.database.counters import RECOUNT_ITEMS
+from app.database.models import Bucketlist, Item
+
+
+class TestItemCounters(BaseTest):
+
+    def counts(self, name='Food'):
+        session.expire_all()
+        bucketlist = session.query(Bucketlist).filter_by(name=name, creator_id=1).first()
+        return bucketlist.item_count, bucketlist.completed_count
+
+    def recounted(self):
+        """ Counts of every bucketlist as computed from the item table """
+        return [(bucketlist.item_count, bucketlist.completed_count) for bucketlist in
+                db.engine.execute('SELECT bucketlist.id, COUNT(item.id) AS item_count, '
+                                  'COUNT(CASE WHEN item.completed THEN 1 END) AS completed_count '
+                                  'FROM bucketlist LEFT JOIN item ON item.bucketlist_id = bucketlist.id '
+                                  'GROUP BY bucketlist.id ORDER BY bucketlist.id')]
+
+    def stored(self):
+        return [(row.item_count, row.completed_count) for row in
+                db.engine.execute('SELECT item_count, completed_count FROM bucketlist ORDER BY id')]
+
+    def test_single_item_writes_counted(self):
+        self.assertEqual(self.counts(), (5, 0))
+
+        self.app.post('api/V1/bucketlists/1/items', headers={'token': self.auth_token}, data={'name': 'Oslo'})
+        self.assertEqual(self.counts(), (6, 0))
+
+        self.app.put('api/V1/bucketlists/1/items/1', headers={'token': self.auth_token}, data={'done': 'true'})
+        self.app.put('api/V1/bucketlists/1/items/2', headers={'token': self.auth_token}, data={'done': 'true'})
+        self.assertEqual(self.counts(), (6, 2))
+
+        self.app.put('api/V1/bucketlists/1/items/2', headers={'token': self.auth_token}, data={'name': 'Ohio'})
+        self.assertEqual(self.counts(), (6, 2), msg='Renaming an item changed the counts')
+
+        self.app.delete('api/V1/bucketlists/1/items/1', headers={'token': self.auth_token})
+        self.assertEqual(self.counts(), (5, 1))
+
+    def test_bulk_writes_counted(self):
+        self.app.post('api/V1/bucketlists/1/items/batch', headers={'token': self.auth_token},
+                      content_type='application/json',
+                      data=json.dumps([{'op': 'create', 'name': 'Oslo', 'done': True},
+                                       {'op': 'update', 'id': 3, 'done': True},
+                                       {'op': 'delete', 'id': 4}]))
+        self.assertEqual(self.counts(), (5, 2))
+
+        # The import runs as its progress is streamed
+        self.app.post('api/V1/bucketlists/import?format=csv', headers={'token': self.auth_token},
+                      data={'file': (io.BytesIO(b'bucketlist,item,done\nHikes,Elgon,true\nHikes,Rwenzori,\n'),
+                                     'import')},
+                      content_type='multipart/form-data').get_data()
+        self.assertEqual(self.counts('Hikes'), (2, 1))
+
+        self.assertEqual(self.stored(), self.recounted())
+
+    def test_moved_item_counted(self):
+        session.query(Item).filter_by(id=1).update({'bucketlist_id': 2, 'completed': True})
+        session.commit()
+
+        self.assertEqual(self.counts(), (4, 0))
+        self.assertEqual(self.counts('Travel'), (1, 1))
+
+    def test_recount_repairs(self):
+        db.engine.execute('UPDATE bucketlist SET item_count = 42, completed_count = 7')
+        db.engine.execute(RECOUNT_ITEMS)
+
+        self.assertEqual(self.stored(), self.recounted())
+
+    def test_progress_without_loading_items(self):
+        self.app.put('api/V1/bucketlists/1/items/1', headers={'token': self.auth_token}, data={'done': 'true'})
+
+        with self.count_queries() as statements:
+            response = self.app.get('api/V1/bucketlists', headers={'token': self.auth_token})
+
+        bucketlists = json.loads(response.data.decode()).get('Bucketlists')
+        self.assertEqual(bucketlists[0].get('progress'), {'done': 1, 'total': 5})
+        self.assertEqual(bucketlists[1].get('progress'), {'done': 0, 'total': 0})
+        self.assertFalse([statement for statement in statements if 'item' in statement.lower().split()],
+                         msg='Items queried to list bucketlists')
+
+        response = self.app.get('api/V1/bucketlists/1', headers={'token': self.auth_token})
+        self.assertEqual(json.loads(response.data.decode()).get('progress'), {'done': 1, 'total': 5})
@@ -0,0 +1,71 @@
+import unittest
+from threading import Event
+from unittest import mock
+from .test_base import BaseTest
+from app import app, db, session
+from app.controller import utils
+from app.controller.purge import Purger
+from app.database.models import Bucketlist, Item, Tombstone
+from app.database.purge import purge_detached
+
+
+class TestCascadingDelete(BaseTest):
+
+    def test_items_deleted_by_database(self):
+        with self.count_queries(with_parameters=True) as queries:
+            response = self.app.delete('api/V1/bucketlists/1', headers={'token': self.auth_token})
+        self.assertEqual(response.status_code, 200)
+
+        item_statements = [statement for statement, parameters in queries
+                           if 'item' in statement.lower() and 'bucketlist' not in statement.lower()]
+        self.assertEqual(item_statements, [], msg='Items loaded or deleted one by one')
+        self.assertEqual(session.query(Item).count(), 0, msg='Items outlived their bucketlist')
+
+        tombstones = session.query(Tombstone.table_name, Tombstone.row_id).all()
+        self.assertEqual(tombstones, [('bucketlist', 1)])
+
+
+@mock.patch.dict(app.config, {'BUCKETLIST_DELETE_MODE': 'soft'})
+class TestSoftDelete(BaseTest):
+
+    def test_bucketlist_gone_at_once(self):
+        with mock.patch.object(utils.purger, 'wake') as wake:
+            response = self.app.delete('api/V1/bucketlists/1', headers={'token': self.auth_token})
+        self.assertEqual(response.status_code, 200)
+        wake.assert_called_once_with(app)
+
+        response = self.app.get('api/V1/bucketlists/1', headers={'token': self.auth_token})
+        self.assertEqual(response.status_code, 404)
+        response = self.app.post('api/V1/bucketlists', headers={'token': self.auth_token}, data={'name': 'Food'})
+        self.assertEqual(response.status_code, 200, msg='Name of the deleted bucketlist still taken')
+
+        tombstones = session.query(Tombstone.table_name, Tombstone.row_id).all()
+        self.assertEqual(tombstones, [('bucketlist', 1)])
+        self.assertEqual(session.query(Item).count(), 5, msg='Items deleted within the request')
+
+    def test_purged_in_batches(self):
+        with mock.patch.object(utils.purger, 'wake'):
+            self.app.delete('api/V1/bucketlists/1', headers={'token': self.auth_token})
+            self.app.delete('api/V1/bucketlists/2', headers={'token': self.auth_token})
+
+        with self.count_queries(with_parameters=True) as queries:
+            self.assertEqual(purge_detached(db.engine, batch_size=2), (5, 2))
+        deletes = [statement for statement, parameters in queries if statement.startswith('DELETE')]
+        # Three batches of items, the last one short; then the two bucketlists, and a batch finding none left
+        self.assertEqual(len(deletes), 5)
+
+        session.expire_all()
+        self.assertEqual(session.query(Item).count(), 0)
+        self.assertEqual([bucketlist.id for bucketlist in session.query(Bucketlist).all()], [3, 4, 5])
+        self.assertEqual(session.query(Tombstone).count(), 2, msg='Purging left tombstones of its own')
+
+
+class TestPurger(unittest.TestCase):
+
+    def test_woken_purge_runs_in_background(self):
+        purged = Event()
+        purger = Purger(lambda woken_app: purged.set())
+
+        purger.wake(app)
+        self.assertTrue(purged.wait(5), msg='Purge not run after a wake')
+        self.assertTrue(purger._thread.daemon)
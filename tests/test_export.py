@@ -0,0 +1,70 @@
+import gzip
+import json
+from unittest import mock
+from .test_base import BaseTest
+from app import app, session
+from app.database.models import Bucketlist, User
+
+
+class TestBucketlistExport(BaseTest):
+
+    def export(self, query='', headers=None):
+        request_headers = {'token': self.auth_token}
+        request_headers.update(headers or {})
+        return self.app.get('/api/V1/bucketlists/export' + query, headers=request_headers)
+
+    def test_ndjson(self):
+        response = self.export()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content_type, 'application/x-ndjson')
+
+        bucketlists = [json.loads(line) for line in response.data.decode().splitlines()]
+        self.assertEqual([bucketlist.get('name') for bucketlist in bucketlists],
+                         ['Food', 'Travel', 'People', 'Movies', 'Concerts'])
+        self.assertEqual([item.get('name') for item in bucketlists[0].get('items')],
+                         ['Tokyo', 'Utah', 'Venice', 'Warsaw', 'York'])
+        self.assertEqual(bucketlists[1].get('items'), [],
+                         msg='Bucketlist without items not exported with an empty list')
+        self.assertEqual(set(bucketlists[0].get('items')[0]),
+                         {'id', 'name', 'done', 'date_created', 'date_modified'})
+        self.assertEqual(bucketlists[0].get('created_by'), 'admin')
+
+    def test_json(self):
+        response = self.export('?format=json')
+
+        self.assertEqual(response.content_type, 'application/json')
+        bucketlists = json.loads(response.data.decode()).get('Bucketlists')
+        self.assertEqual(len(bucketlists), 5)
+        self.assertEqual(len(bucketlists[0].get('items')), 5)
+
+    def test_gzip(self):
+        response = self.export(headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(response.headers.get('Content-Encoding'), 'gzip')
+        self.assertEqual(len(gzip.decompress(response.data).decode().splitlines()), 5)
+
+        self.assertIsNone(self.export().headers.get('Content-Encoding'),
+                          msg='Export gzipped for a client that does not accept it')
+
+    def test_batches_smaller_than_export(self):
+        with mock.patch.dict(app.config, {'EXPORT_BATCH_SIZE': 2}):
+            response = self.export()
+
+        bucketlists = [json.loads(line) for line in response.data.decode().splitlines()]
+        self.assertEqual(sum(len(bucketlist.get('items')) for bucketlist in bucketlists), 5)
+        self.assertEqual(len(bucketlists), 5)
+
+    def test_only_own_bucketlists(self):
+        other_user = User(username='other', password='password')
+        session.add(Bucketlist(name='Secret', created_by=other_user))
+        session.commit()
+
+        self.assertNotIn(b'Secret', self.export().data)
+
+    def test_invalid_format(self):
+        self.assertEqual(self.export('?format=xml').status_code, 400)
+
+    def test_unauthenticated(self):
+        response = self.app.get('/api/V1/bucketlists/export')
+        self.assertEqual(response.status_code, 401)
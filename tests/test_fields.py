@@ -0,0 +1,53 @@
+import json
+from .test_base import BaseTest
+
+
+class TestSparseFieldsets(BaseTest):
+
+    def get_json(self, path):
+        response = self.app.get(path, headers={'token': self.auth_token})
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.data.decode())
+
+    def test_bucketlists_narrowed_to_fields(self):
+        bucketlists = self.get_json('api/V1/bucketlists?fields=id,name').get('Bucketlists')
+        self.assertEqual(bucketlists[0], {'id': 1, 'name': 'Food'})
+
+        bucketlists = self.get_json('api/V1/bucketlists?fields=name,progress').get('Bucketlists')
+        self.assertEqual(bucketlists[0], {'name': 'Food', 'progress': {'done': 0, 'total': 5}})
+
+    def test_unknown_fields_rejected(self):
+        for path in ['api/V1/bucketlists?fields=id,owner', 'api/V1/bucketlists/1/items?fields=price',
+                     'api/V1/bucketlists/1?fields=done', 'api/V1/bucketlists/1?expand=creator']:
+            response = self.app.get(path, headers={'token': self.auth_token})
+            self.assertEqual(response.status_code, 400, msg='{} accepted'.format(path))
+
+    def test_only_columns_of_fields_read(self):
+        with self.count_queries(with_parameters=True) as queries:
+            items = self.get_json('api/V1/bucketlists/1/items?fields=name&limit=2').get('Items')
+        self.assertEqual(items, [{'name': 'Tokyo'}, {'name': 'Utah'}])
+
+        page_query = queries[-1][0]
+        self.assertIn('item.name', page_query)
+        self.assertNotIn('item.completed', page_query)
+        self.assertNotIn('item.modification_date', page_query)
+
+    def test_searched_and_seeked_with_fields(self):
+        items = self.get_json('api/V1/bucketlists/1/items?fields=name&q=Venice').get('Items')
+        self.assertEqual(items, [{'name': 'Venice'}])
+
+        # Pagination seeks on columns that are not among the fields
+        page = self.get_json('api/V1/bucketlists?fields=name&limit=2&cursor=&sort=date_created')
+        page = self.get_json('api/V1/bucketlists?fields=name&limit=2&cursor=' + page.get('next_cursor'))
+        self.assertEqual(page.get('Bucketlists'), [{'name': 'People'}, {'name': 'Movies'}])
+
+    def test_detail_items_expanded(self):
+        detail = self.get_json('api/V1/bucketlists/1')
+        self.assertEqual(len(detail.get('items')), 5, msg='Items no longer embedded by default')
+        self.assertEqual(detail.get('items')[0], {'id': 1, 'name': 'Tokyo', 'done': False})
+
+        detail = self.get_json('api/V1/bucketlists/1?fields=id,name&expand=')
+        self.assertEqual(detail, {'id': 1, 'name': 'Food'})
+
+        detail = self.get_json('api/V1/bucketlists/1?fields=id&expand=items')
+        self.assertEqual(sorted(detail), ['id', 'items'])
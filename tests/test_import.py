@@ -0,0 +1,123 @@
+import io
+import json
+from unittest import mock
+from .test_base import BaseTest
+from app import app, db, session
+from app.controller.bulk_import import ImportFailed, Importer, free_name, parse_csv
+from app.database.models import Bucketlist, Item
+
+
+class TestBucketlistImport(BaseTest):
+
+    def upload(self, content, query=''):
+        response = self.app.post('/api/V1/bucketlists/import' + query, headers={'token': self.auth_token},
+                                 data={'file': (io.BytesIO(content.encode()), 'import')},
+                                 content_type='multipart/form-data')
+        lines = [json.loads(line) for line in response.data.decode().splitlines()] if response.status_code == 200 \
+            else None
+        return response, lines
+
+    def item_names(self, bucketlist_name):
+        bucketlist = Bucketlist.query.filter_by(name=bucketlist_name, creator_id=1).first()
+        return sorted(item.name for item in bucketlist.items)
+
+    def test_ndjson(self):
+        response, lines = self.upload('{"name": "Hikes", "items": [{"name": "Rwenzori", "done": true}, '
+                                      '{"name": "Elgon"}]}\n'
+                                      '{"name": "Books"}\n')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content_type, 'application/x-ndjson')
+        self.assertTrue(lines[-1].get('committed'))
+        self.assertEqual(lines[-1].get('bucketlists'), 2)
+        self.assertEqual(lines[-1].get('items'), 2)
+
+        self.assertEqual(self.item_names('Hikes'), ['Elgon', 'Rwenzori'])
+        self.assertTrue(Item.query.filter_by(name='Rwenzori').first().completed)
+        self.assertEqual(self.item_names('Books'), [])
+
+    def test_csv(self):
+        response, lines = self.upload('bucketlist,item,done\n'
+                                      'Hikes,Rwenzori,true\n'
+                                      'Books,,\n'
+                                      'Hikes,"Elgon, again",false\n', '?format=csv')
+
+        self.assertTrue(lines[-1].get('committed'))
+        self.assertEqual(self.item_names('Hikes'), ['Elgon, again', 'Rwenzori'])
+        self.assertEqual(self.item_names('Books'), [])
+
+    def test_progress_per_chunk(self):
+        content = ''.join('{{"name": "List {}", "items": [{{"name": "Item"}}]}}\n'.format(number)
+                          for number in range(5))
+        with mock.patch.dict(app.config, {'IMPORT_CHUNK_SIZE': 4}):
+            _, lines = self.upload(content)
+
+        self.assertEqual([line.get('rows') for line in lines], [4, 8, 10, 10])
+        self.assertEqual(lines[-1].get('items'), 5)
+
+    def test_conflicts_fail_by_default(self):
+        _, lines = self.upload('{"name": "New", "items": [{"name": "Item"}]}\n'
+                               '{"name": "Food", "items": [{"name": "Sushi"}]}\n')
+
+        self.assertFalse(lines[-1].get('committed'))
+        self.assertIn('Food already exists', lines[-1].get('error'))
+        self.assertIsNone(Bucketlist.query.filter_by(name='New').first(),
+                          msg='Failed import not rolled back')
+
+    def test_conflicts_skipped(self):
+        _, lines = self.upload('{"name": "Food", "items": [{"name": "Sushi"}]}\n'
+                               '{"name": "New", "items": [{"name": "Item"}, {"name": "Item"}]}\n', '?conflicts=skip')
+
+        self.assertTrue(lines[-1].get('committed'))
+        self.assertEqual(lines[-1].get('skipped'), 3)
+        self.assertEqual(self.item_names('Food'), ['Tokyo', 'Utah', 'Venice', 'Warsaw', 'York'])
+        self.assertEqual(self.item_names('New'), ['Item'])
+
+    def test_conflicts_renamed(self):
+        _, lines = self.upload('{"name": "Food", "items": [{"name": "Sushi"}, {"name": "Sushi"}]}\n',
+                               '?conflicts=rename')
+
+        self.assertEqual(lines[-1].get('renamed'), 2)
+        self.assertEqual(self.item_names('Food (2)'), ['Sushi', 'Sushi (2)'])
+
+    def test_invalid_rows(self):
+        for content in ['not json\n', '{"name": ""}\n', '{"name": "List", "items": [{"name": "Item", "done": 3}]}\n']:
+            _, lines = self.upload(content, '?conflicts=skip')
+            self.assertFalse(lines[-1].get('committed'), msg='Invalid row imported: {}'.format(content))
+
+    def test_request_body(self):
+        response = self.app.post('/api/V1/bucketlists/import?format=csv', headers={'token': self.auth_token},
+                                 data='bucketlist,item\nHikes,Elgon\n', content_type='text/csv')
+
+        self.assertTrue(json.loads(response.data.decode().splitlines()[-1]).get('committed'))
+        self.assertEqual(self.item_names('Hikes'), ['Elgon'])
+
+    def test_invalid_arguments(self):
+        self.assertEqual(self.upload('', '?format=xml')[0].status_code, 400)
+        self.assertEqual(self.upload('', '?conflicts=merge')[0].status_code, 400)
+
+        response = self.app.post('/api/V1/bucketlists/import', headers={'token': self.auth_token})
+        self.assertEqual(response.status_code, 400, msg='Import without a file accepted')
+
+
+class TestImporter(BaseTest):
+
+    def test_statements_per_chunk(self):
+        rows = list(parse_csv(['bucketlist,item\n'] + ['List {},Item {}\n'.format(number % 3, number)
+                                                       for number in range(100)]))
+
+        with db.engine.begin() as connection, self.count_queries() as statements:
+            Importer(connection, user_id=1, chunk_size=50).run(rows)
+
+        # The user's bucketlists once; then per chunk, an insert of new bucketlists, a select of their ids
+        # and an insert of items; the second chunk has no new bucketlists
+        self.assertEqual(len(statements), 1 + 3 + 1)
+        self.assertEqual(session.query(Item).filter(Item.name.like('Item %')).count(), 100)
+
+    def test_csv_header_required(self):
+        with self.assertRaises(ImportFailed):
+            list(parse_csv(['name,done\n', 'Food,true\n']))
+
+    def test_free_name(self):
+        self.assertEqual(free_name('Food', {'Food', 'Food (2)'}), 'Food (3)')
+        self.assertEqual(len(free_name('x' * 120, {'x' * 120})), 120)
@@ -0,0 +1,46 @@
+from .test_base import BaseTest
+from app import session
+from app.database.models import Bucketlist, Item, User
+
+
+class TestOwnershipIndexes(BaseTest):
+
+    def assert_index_seeks(self, url):
+        """ Every table read while serving the url has to be an index seek, never a full scan """
+        with self.count_queries(with_parameters=True) as queries:
+            response = self.app.get(url, headers={'token': self.auth_token})
+        self.assertEqual(response.status_code, 200)
+
+        for statement, parameters in queries:
+            plan = self.query_plan(statement, parameters)
+            scans = [step for step in plan
+                     if step.startswith('SCAN') and step.split()[1] in ('user', 'bucketlist', 'item')]
+
+            self.assertFalse(scans, msg='{} scans a table: {}'.format(url, statement))
+            self.assertTrue([step for step in plan if step.startswith('SEARCH')],
+                            msg='{} does not seek an index: {}'.format(url, statement))
+
+    def test_bucketlist_lookups_seek_indexes(self):
+        self.assert_index_seeks('api/V1/bucketlists')
+        self.assert_index_seeks('api/V1/bucketlists/1')
+
+    def test_item_lookups_seek_indexes(self):
+        self.assert_index_seeks('api/V1/bucketlists/1/items')
+        self.assert_index_seeks('api/V1/bucketlists/1/items/3')
+
+    def test_bucketlist_names_unique_per_creator(self):
+        other_user = User(username='other', password='other')
+        session.add(other_user)
+        session.add(Bucketlist(name='Food', created_by=other_user))
+        session.commit()
+
+        self.assertEqual(session.query(Bucketlist).filter_by(name='Food').count(), 2,
+                         msg='Bucketlist names unique across creators')
+
+    def test_item_names_unique_per_bucketlist(self):
+        response = self.app.post('api/V1/bucketlists/2/items',
+                                 headers={'token': self.auth_token}, data={'name': 'Tokyo'})
+
+        self.assertEqual(response.status_code, 200,
+                         msg='Item names unique across bucketlists')
+        self.assertEqual(session.query(Item).filter_by(name='Tokyo').count(), 2)
@@ -1,5 +1,7 @@
 from .test_base import BaseTest
 from itertools import cycle
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 import json
 
 
@@ -74,6 +76,22 @@ class TestBucketlistItems(BaseTest):
             self.assertEqual(item.get('name'), next(expected_names),
                              msg='Correct names of items not returned')
 
+    def test_cursor_pagination(self):
+        response = self.app.get('api/V1/bucketlists/1/items?limit=3&cursor=',
+                                headers={'token': self.auth_token})
+        response_content = json.loads(response.data.decode())
+
+        self.assertEqual([item.get('name') for item in response_content.get('Items')],
+                         ['Tokyo', 'Utah', 'Venice'])
+
+        response = self.app.get('api/V1/bucketlists/1/items?limit=3&cursor=' + response_content.get('next_cursor'),
+                                headers={'token': self.auth_token})
+        response_content = json.loads(response.data.decode())
+
+        self.assertEqual([item.get('name') for item in response_content.get('Items')],
+                         ['Warsaw', 'York'])
+        self.assertIsNone(response_content.get('next_cursor'))
+
     def test_search(self):
         response = self.app.get('api/V1/bucketlists/1/items?q=ce',
                                 headers={'token': self.auth_token})
@@ -82,6 +100,32 @@ class TestBucketlistItems(BaseTest):
         self.assertEqual(response_content.get('Items')[0].get('name'), 'Venice',
                          msg='search query argument not filtering results')
 
+    def test_search_ranked(self):
+        for name in ['Venice Beach', 'Little Venice by Venice', 'Ven']:
+            self.app.post('api/V1/bucketlists/1/items',
+                          headers={'token': self.auth_token}, data={'name': name})
+
+        response = self.app.get('api/V1/bucketlists/1/items?q=ven',
+                                headers={'token': self.auth_token})
+
+        names = [item.get('name') for item in json.loads(response.data.decode()).get('Items')]
+        self.assertEqual(sorted(names), ['Little Venice by Venice', 'Ven', 'Venice', 'Venice Beach'],
+                         msg='search query argument not filtering results')
+        self.assertEqual(names[0], 'Ven',
+                         msg='Closest match not ranked first')
+
+    def test_search_follows_changes(self):
+        self.app.put('api/V1/bucketlists/1/items/3',
+                     headers={'token': self.auth_token}, data={'name': 'Verona'})
+        self.app.delete('api/V1/bucketlists/1/items/4', headers={'token': self.auth_token})
+
+        for phrase, expected_names in [('enic', []), ('eron', ['Verona']), ('arsa', [])]:
+            response = self.app.get('api/V1/bucketlists/1/items?q=' + phrase,
+                                    headers={'token': self.auth_token})
+            self.assertEqual([item.get('name') for item in json.loads(response.data.decode()).get('Items')],
+                             expected_names,
+                             msg='Search results out of sync with updated and deleted items')
+
 
 class TestBucketlistItemDetail(BaseTest):
 
@@ -191,3 +235,167 @@ class TestBucketlistItemDetail(BaseTest):
 
         self.assertEqual(delete_response.status_code, 404,
                          msg='BucketlistItemDetail view does not return 404 for trying to delete non existent item')
+
+
+class TestBucketlistItemsBatch(BaseTest):
+
+    def post_batch(self, operations, url='api/V1/bucketlists/1/items/batch'):
+        return self.app.post(url, data=json.dumps(operations),
+                             content_type='application/json',
+                             headers={'token': self.auth_token})
+
+    def item_names(self):
+        response = self.app.get('api/V1/bucketlists/1/items', headers={'token': self.auth_token})
+        return [item.get('name') for item in json.loads(response.data.decode()).get('Items')]
+
+    # Authentication requirement
+    def test_authentication_requirement(self):
+        response = self.app.post('api/V1/bucketlists/1/items/batch')
+        self.assertEqual(response.status_code, 401,
+                         msg='BucketlistItemsBatch view accepts unauthenticated POST requests')
+
+    def test_batch_in_non_existent_bucketlist(self):
+        response = self.post_batch([{'op': 'create', 'name': 'Oslo'}],
+                                   url='api/V1/bucketlists/54321/items/batch')
+        self.assertEqual(response.status_code, 404,
+                         msg='BucketlistItemsBatch view does not return 404 for non-existent bucketlist')
+
+    def test_invalid_batch(self):
+        for body in [{'op': 'create', 'name': 'Oslo'}, [], 'Oslo']:
+            response = self.post_batch(body)
+            self.assertEqual(response.status_code, 400,
+                             msg='BucketlistItemsBatch view accepts a body that is not an array of operations')
+
+    def test_mixed_batch(self):
+        commits = []
+
+        def record_commit(conn):
+            commits.append(conn)
+
+        event.listen(Engine, 'commit', record_commit)
+        try:
+            response = self.post_batch([{'op': 'create', 'name': 'Oslo'},
+                                        {'op': 'create', 'name': 'Tokyo'},
+                                        {'op': 'update', 'id': 2, 'name': 'Lisbon', 'done': True},
+                                        {'op': 'update', 'id': 3498},
+                                        {'op': 'delete', 'id': 4},
+                                        {'op': 'rename', 'id': 5}])
+        finally:
+            event.remove(Engine, 'commit', record_commit)
+
+        self.assertEqual(response.status_code, 200)
+        response_content = json.loads(response.data.decode())
+
+        self.assertEqual([result.get('status') for result in response_content.get('Results')],
+                         [200, 409, 200, 404, 200, 400],
+                         msg='Wrong result reported for batch operations')
+        self.assertTrue(response_content.get('Results')[0].get('id'),
+                        msg='Id of created item not returned')
+        self.assertEqual(len(commits), 1,
+                         msg='Batch not applied in a single transaction')
+        self.assertEqual(self.item_names(), ['Tokyo', 'Lisbon', 'Venice', 'York', 'Oslo'])
+
+    def test_names_checked_in_operation_order(self):
+        response = self.post_batch([{'op': 'update', 'id': 1, 'name': 'Kyoto'},
+                                    {'op': 'create', 'name': 'Tokyo'},
+                                    {'op': 'delete', 'id': 2},
+                                    {'op': 'update', 'id': 3, 'name': 'Utah'},
+                                    {'op': 'create', 'name': 'Kyoto'}])
+
+        response_content = json.loads(response.data.decode())
+        self.assertEqual([result.get('status') for result in response_content.get('Results')],
+                         [200, 200, 200, 200, 409])
+        self.assertEqual(self.item_names(), ['Kyoto', 'Utah', 'Warsaw', 'York', 'Tokyo'])
+
+    def test_atomic_batch_rolled_back(self):
+        response = self.app.post('api/V1/bucketlists/1/items/batch?atomic=true',
+                                 data=json.dumps([{'op': 'create', 'name': 'Rome'},
+                                                  {'op': 'delete', 'id': 2},
+                                                  {'op': 'create', 'name': 'Venice'}]),
+                                 content_type='application/json',
+                                 headers={'token': self.auth_token})
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(json.loads(response.data.decode()).get('Applied'))
+        self.assertEqual(self.item_names(), ['Tokyo', 'Utah', 'Venice', 'Warsaw', 'York'],
+                         msg='Atomic batch partly applied despite a failed operation')
+
+    def test_item_changed_once_per_batch(self):
+        response = self.post_batch([{'op': 'update', 'id': 1, 'name': 'Kyoto'},
+                                    {'op': 'delete', 'id': 1},
+                                    {'op': 'update', 'id': 2, 'done': True},
+                                    {'op': 'update', 'id': 2, 'name': 'Oslo'}])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result.get('status') for result in json.loads(response.data.decode()).get('Results')],
+                         [200, 400, 200, 400])
+        self.assertEqual(self.item_names(), ['Kyoto', 'Utah', 'Venice', 'Warsaw', 'York'])
+
+    def test_creations_inserted_together(self):
+        with self.count_queries() as statements:
+            response = self.post_batch([{'op': 'create', 'name': 'Created {}'.format(number)}
+                                        for number in range(50)])
+
+        created_ids = [result.get('id') for result in json.loads(response.data.decode()).get('Results')]
+        self.assertEqual(len(set(created_ids)), 50)
+        self.assertEqual(created_ids, sorted(created_ids), msg='Ids returned for the wrong operations')
+        self.assertEqual(len([statement for statement in statements if statement.startswith('INSERT')]), 1)
+
+
+class TestItemOwnershipResolution(BaseTest):
+
+    def statements_for(self, method, url, **kwargs):
+        # Authenticate once beforehand so that the user lookup is served from the principal cache
+        self.app.get('api/V1/bucketlists/1/items/1', headers={'token': self.auth_token})
+
+        with self.count_queries() as statements:
+            response = getattr(self.app, method)(url, headers={'token': self.auth_token}, **kwargs)
+        return response, statements
+
+    def test_single_statement_per_request(self):
+        for method, url, data in [('get', 'api/V1/bucketlists/1/items/2', None),
+                                  ('put', 'api/V1/bucketlists/1/items/2', {'name': 'Oslo'}),
+                                  ('delete', 'api/V1/bucketlists/1/items/2', None),
+                                  ('post', 'api/V1/bucketlists/1/items', {'name': 'Rome'})]:
+            response, statements = self.statements_for(method, url, data=data)
+            # Besides reading the user's change counter that a GET's ETag is derived from
+            statements = [statement for statement in statements if 'change_count' not in statement]
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(statements), 1,
+                             msg='{} {} takes more than one statement: {}'.format(method.upper(), url, statements))
+
+    def test_missing_piece_reported(self):
+        for method in ['get', 'put', 'delete']:
+            response, _ = self.statements_for(method, 'api/V1/bucketlists/7345/items/1', data={'name': 'Oslo'})
+            self.assertEqual(json.loads(response.data.decode()), 'Bucketlist does not exist')
+
+            response, _ = self.statements_for(method, 'api/V1/bucketlists/1/items/7345', data={'name': 'Oslo'})
+            self.assertEqual(json.loads(response.data.decode()), 'Item does not exist')
+
+    def test_bucketlist_of_another_user(self):
+        self.app.post('api/V1/auth/register', data={'username': 'other', 'password': 'other'})
+        response = self.app.post('api/V1/auth/login', data={'username': 'other', 'password': 'other'})
+        other_token = json.loads(response.data.decode()).get('auth_token')
+
+        response = self.app.post('api/V1/bucketlists/1/items',
+                                 headers={'token': other_token}, data={'name': 'Rome'})
+        self.assertEqual(response.status_code, 404,
+                         msg='Items can be added to the bucketlists of other users')
+
+        response = self.app.put('api/V1/bucketlists/1/items/1',
+                                headers={'token': other_token}, data={'name': 'Rome'})
+        self.assertEqual(response.status_code, 404,
+                         msg='Items of other users can be updated')
+
+    def test_done_parsed(self):
+        self.app.put('api/V1/bucketlists/1/items/1', headers={'token': self.auth_token}, data={'done': 'true'})
+        self.app.put('api/V1/bucketlists/1/items/1', headers={'token': self.auth_token}, data={'done': 'False'})
+
+        response = self.app.get('api/V1/bucketlists/1/items/1', headers={'token': self.auth_token})
+        self.assertIs(json.loads(response.data.decode()).get('done'), False,
+                      msg='done=False marks an item as done')
+
+        response = self.app.put('api/V1/bucketlists/1/items/1', headers={'token': self.auth_token},
+                                data={'done': 'maybe'})
+        self.assertEqual(response.status_code, 400)
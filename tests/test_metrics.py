@@ -0,0 +1,126 @@
+import json
+import unittest
+from unittest import mock
+from .test_base import BaseTest
+from app import app
+from app.controller.metrics import HISTOGRAMS, Histogram
+from app.controller.utils import principal_cache
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_cumulative_buckets(self):
+        histogram = Histogram('latency_seconds', 'Latency.', ['endpoint'], [0.1, 1])
+        for value in [0.05, 0.1, 0.5, 3]:
+            histogram.observe(('items',), value)
+
+        lines = histogram.expose()
+
+        self.assertIn('# TYPE latency_seconds histogram', lines)
+        self.assertIn('latency_seconds_bucket{endpoint="items",le="0.1"} 2', lines)
+        self.assertIn('latency_seconds_bucket{endpoint="items",le="1"} 3', lines)
+        self.assertIn('latency_seconds_bucket{endpoint="items",le="+Inf"} 4', lines)
+        self.assertIn('latency_seconds_sum{endpoint="items"} 3.65', lines)
+        self.assertIn('latency_seconds_count{endpoint="items"} 4', lines)
+
+    def test_label_values_escaped(self):
+        histogram = Histogram('latency_seconds', 'Latency.', ['endpoint'], [1])
+        histogram.observe(('say "hi"',), 0.5)
+
+        self.assertIn('latency_seconds_count{endpoint="say \\"hi\\""} 1', histogram.expose())
+
+
+class TestRequestMetrics(BaseTest):
+
+    def setUp(self):
+        super().setUp()
+        for histogram in HISTOGRAMS:
+            histogram.clear()
+
+    def test_server_timing_header(self):
+        with self.count_queries() as statements:
+            response = self.app.get('/api/V1/bucketlists/1', headers={'token': self.auth_token})
+
+        server_timing = response.headers.get('Server-Timing')
+        self.assertIsNotNone(server_timing, msg='Server-Timing header missing')
+        self.assertIn('db;dur=', server_timing)
+        self.assertIn('"{} statements"'.format(len(statements)), server_timing)
+        self.assertIn('total;dur=', server_timing)
+
+    def test_requests_exposed_as_histograms(self):
+        self.app.get('/api/V1/bucketlists', headers={'token': self.auth_token})
+        self.app.get('/api/V1/bucketlists/100', headers={'token': self.auth_token})
+        self.app.get('/api/V1/nowhere')
+
+        response = self.app.get('/metrics')
+        body = response.data.decode()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+        self.assertIn('bucketlist_request_duration_seconds_count'
+                      '{endpoint="bucketlists",method="GET",status="200"} 1', body)
+        self.assertIn('bucketlist_request_statements_count'
+                      '{endpoint="bucketlistdetail",method="GET",status="404"} 1', body)
+        self.assertIn('bucketlist_request_database_duration_seconds_count'
+                      '{endpoint="unmatched",method="GET",status="404"} 1', body)
+        self.assertIn('# TYPE bucketlist_request_rows_written histogram', body)
+
+    def test_statements_counted_per_request(self):
+        with self.count_queries() as statements:
+            self.app.get('/api/V1/bucketlists', headers={'token': self.auth_token})
+
+        body = self.app.get('/metrics').data.decode()
+
+        self.assertIn('bucketlist_request_statements_sum'
+                      '{{endpoint="bucketlists",method="GET",status="200"}} {}'.format(len(statements)), body)
+
+    def test_only_writes_count_rows(self):
+        self.app.get('/api/V1/bucketlists', headers={'token': self.auth_token})
+        self.app.post('/api/V1/bucketlists/1/items', headers={'token': self.auth_token}, data={'name': 'Oslo'})
+
+        body = self.app.get('/metrics').data.decode()
+
+        self.assertIn('bucketlist_request_rows_written_sum{endpoint="bucketlists",method="GET",status="200"} 0', body)
+        self.assertIn('bucketlist_request_rows_written_sum{endpoint="bucketlistitems",method="POST",status="200"} 1',
+                      body)
+
+    def test_rows_returned_by_page(self):
+        self.app.get('/api/V1/bucketlists', headers={'token': self.auth_token})
+        for histogram in HISTOGRAMS:
+            histogram.clear()
+
+        for limit in [2, 4]:
+            response = self.app.get('/api/V1/bucketlists?limit={}'.format(limit), headers={'token': self.auth_token})
+            self.assertEqual(len(json.loads(response.data.decode()).get('Bucketlists')), limit)
+
+        body = self.app.get('/metrics').data.decode()
+
+        # Each page's rows, besides one row each of the user's change counter and of the bucketlist count
+        self.assertIn('bucketlist_request_rows_returned_sum{endpoint="bucketlists",method="GET",status="200"} 10',
+                      body)
+        self.assertIn('bucketlist_request_rows_returned_count{endpoint="bucketlists",method="GET",status="200"} 2',
+                      body)
+
+    @mock.patch.dict(app.config, {'METRICS_TOKEN': 'scraper'})
+    def test_restricted_to_allowed_addresses_and_token(self):
+        self.assertEqual(self.app.get('/metrics').status_code, 200, msg='Loopback not allowed by default')
+
+        remote = {'REMOTE_ADDR': '203.0.113.9'}
+        self.assertEqual(self.app.get('/metrics', environ_base=remote).status_code, 403)
+        self.assertEqual(self.app.get('/metrics', environ_base=remote,
+                                      headers={'Authorization': 'Bearer guess'}).status_code, 403)
+        self.assertEqual(self.app.get('/metrics', environ_base=remote,
+                                      headers={'Authorization': 'Bearer scraper'}).status_code, 200)
+
+    def test_principal_cache_exposed(self):
+        self.app.get('/api/V1/bucketlists', headers={'token': self.auth_token})
+        self.app.get('/api/V1/bucketlists', headers={'token': self.auth_token})
+        stats = principal_cache.stats()
+
+        lines = self.app.get('/metrics').data.decode().splitlines()
+
+        self.assertIn('# TYPE bucketlist_principal_cache_hits_total counter', lines)
+        self.assertIn('bucketlist_principal_cache_hits_total {}'.format(stats.get('hits')), lines)
+        self.assertIn('bucketlist_principal_cache_misses_total {}'.format(stats.get('misses')), lines)
+        self.assertIn('bucketlist_principal_cache_evictions_total 0', lines)
+        self.assertIn('bucketlist_principal_cache_size 1', lines)
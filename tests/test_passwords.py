@@ -0,0 +1,126 @@
+import hashlib
+import threading
+import time
+import unittest
+from unittest import mock
+from .test_base import BaseTest
+from app import session
+from app.controller import utils
+from app.controller.passwords import HasherBusy, PasswordHasher, PBKDF2Hasher, ScryptHasher
+from app.database.models import User
+
+
+class TestPasswordHasher(unittest.TestCase):
+
+    def setUp(self):
+        self.hasher = PasswordHasher(PBKDF2Hasher(iterations=1000), secret_key='secret', workers=1, queue_size=0)
+
+    def test_versioned_format(self):
+        encoded = self.hasher.hash('password')
+
+        self.assertTrue(encoded.startswith('$pbkdf2-sha256$1000$'))
+        self.assertNotEqual(encoded, self.hasher.hash('password'),
+                            msg='Passwords hashed without a random salt')
+        self.assertEqual(self.hasher.verify('password', encoded), (True, False))
+        self.assertEqual(self.hasher.verify('wrong', encoded), (False, False))
+
+    def test_other_work_factors_outdated(self):
+        encoded = PasswordHasher(PBKDF2Hasher(iterations=500), secret_key='secret').hash('password')
+
+        self.assertEqual(self.hasher.verify('password', encoded), (True, True))
+
+    @unittest.skipUnless(hasattr(hashlib, 'scrypt'), 'hashlib.scrypt unavailable')
+    def test_scrypt(self):
+        scrypt = PasswordHasher(ScryptHasher(n=2 ** 8, r=8, p=1), secret_key='secret')
+        encoded = scrypt.hash('password')
+
+        self.assertTrue(encoded.startswith('$scrypt$n=256,r=8,p=1$'))
+        self.assertEqual(scrypt.verify('password', encoded), (True, False))
+        self.assertEqual(self.hasher.verify('password', encoded), (True, True),
+                         msg='Hash of another algorithm not verified')
+
+    def test_legacy_hash(self):
+        legacy = hashlib.sha256(('password' + 'secret').encode()).hexdigest()
+
+        self.assertEqual(self.hasher.verify('password', legacy), (True, True))
+        self.assertFalse(self.hasher.verify('wrong', legacy)[0])
+
+    def test_missing_user_verified_against_dummy_hash(self):
+        with mock.patch.object(self.hasher.hasher, 'derive', wraps=self.hasher.hasher.derive) as derive:
+            self.assertEqual(self.hasher.verify_missing('password'), (False, False))
+            self.assertEqual(self.hasher.verify_missing('password'), (False, False))
+
+        # One derivation for the dummy hash itself, then one per verification
+        self.assertEqual(derive.call_count, 3)
+        self.assertEqual([call[0][2] for call in derive.call_args_list], ['1000'] * 3)
+
+    def test_malformed_hash(self):
+        self.assertEqual(self.hasher.verify('password', '$unknown$1$c2FsdA$aGFzaA'), (False, False))
+        self.assertEqual(self.hasher.verify('password', '$pbkdf2-sha256$1000'), (False, False))
+
+    def test_bounded_queue(self):
+        self.hasher.timeout = 0.01
+        release = threading.Event()
+        self.hasher.submit(release.wait)
+
+        try:
+            with self.assertRaises(HasherBusy):
+                self.hasher.hash('password')
+        finally:
+            release.set()
+
+        self.assertTrue(self.hasher.hash('password'),
+                        msg='Worker slot not released once free')
+
+
+class TestPasswordUpgrade(BaseTest):
+
+    def stored_password(self):
+        session.expire_all()
+        return session.query(User.password).filter_by(username='admin').scalar()
+
+    def test_legacy_hash_upgraded_on_login(self):
+        legacy = self.stored_password()
+
+        response = self.app.post('/api/V1/auth/login', data={'username': 'admin', 'password': 'admin'})
+        self.assertEqual(response.status_code, 200)
+
+        # The upgrade happens on a hashing worker, after the login has returned
+        for _ in range(100):
+            if self.stored_password() != legacy:
+                break
+            time.sleep(0.02)
+
+        upgraded = self.stored_password()
+        self.assertTrue(upgraded.startswith('$pbkdf2-sha256$'),
+                        msg='Legacy password hash not upgraded on login')
+
+        response = self.app.post('/api/V1/auth/login', data={'username': 'admin', 'password': 'admin'})
+        self.assertEqual(response.status_code, 200, msg='Upgraded password hash rejected')
+
+    def test_failed_login_not_upgraded(self):
+        legacy = self.stored_password()
+
+        self.app.post('/api/V1/auth/login', data={'username': 'admin', 'password': 'wrong'})
+        time.sleep(0.05)
+
+        self.assertEqual(self.stored_password(), legacy)
+
+    def test_registered_with_configured_hasher(self):
+        self.app.post('/api/V1/auth/register', data={'username': 'user', 'password': 'password'})
+
+        password = session.query(User.password).filter_by(username='user').scalar()
+        self.assertTrue(password.startswith('$pbkdf2-sha256$1000$'))
+
+    def test_unknown_username_verified(self):
+        with mock.patch.object(utils.password_hasher, 'verify_missing', return_value=(False, False)) as verify:
+            response = self.app.post('/api/V1/auth/login', data={'username': 'nobody', 'password': 'admin'})
+
+        self.assertEqual(response.status_code, 401)
+        verify.assert_called_once_with('admin')
+
+    def test_busy_hasher(self):
+        with mock.patch.object(utils.password_hasher, 'verify', side_effect=HasherBusy):
+            response = self.app.post('/api/V1/auth/login', data={'username': 'admin', 'password': 'admin'})
+
+        self.assertEqual(response.status_code, 503)
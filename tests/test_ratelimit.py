@@ -0,0 +1,80 @@
+from unittest import mock
+import jwt
+from .test_base import BaseTest
+from app import app, session
+from app.controller.ratelimit import LocalBuckets, RateLimiter
+from app.database.models import User
+
+
+class TestRateLimit(BaseTest):
+
+    def setUp(self):
+        super().setUp()
+        self.clock = 1000.0
+        clock_patch = mock.patch('time.monotonic', lambda: self.clock)
+        clock_patch.start()
+        self.addCleanup(clock_patch.stop)
+
+        self.buckets = LocalBuckets(maxsize=10)
+        limiter = RateLimiter(self.buckets, {'default': (3, 60), 'login': (2, 60)})
+        limiter_patch = mock.patch('app.controller.utils.rate_limiter', limiter)
+        limiter_patch.start()
+        self.addCleanup(limiter_patch.stop)
+
+    def get_bucketlists(self, token=None):
+        return self.app.get('api/V1/bucketlists', headers={'token': token or self.auth_token})
+
+    def login(self, address='10.0.0.1'):
+        return self.app.post('api/V1/auth/login', data={'username': 'admin', 'password': 'admin'},
+                             environ_base={'REMOTE_ADDR': address})
+
+    def test_budget_spent(self):
+        for _ in range(3):
+            self.assertEqual(self.get_bucketlists().status_code, 200)
+
+        response = self.get_bucketlists()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers.get('Retry-After'), '20')
+
+    def test_budget_refills(self):
+        for _ in range(4):
+            self.get_bucketlists()
+
+        self.clock += 20
+        self.assertEqual(self.get_bucketlists().status_code, 200)
+        self.assertEqual(self.get_bucketlists().status_code, 429, msg='More than one request refilled in 20 seconds')
+
+    def test_budget_per_user_and_route(self):
+        for _ in range(4):
+            self.get_bucketlists()
+
+        session.add(User(username='other', password='password'))
+        session.commit()
+        other_token = jwt.encode({'username': 'other'}, app.config.get('SECRET_KEY'))
+
+        self.assertEqual(self.get_bucketlists(other_token).status_code, 200)
+        self.assertEqual(self.app.get('api/V1/bucketlists/1', headers={'token': self.auth_token}).status_code, 200)
+
+    def test_unauthenticated_routes_by_address(self):
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(self.login().status_code, 429)
+        self.assertEqual(self.login('10.0.0.2').status_code, 200)
+
+    def test_refilled_buckets_pruned(self):
+        for number in range(10):
+            self.buckets.take('user:{}'.format(number), 1, 5)
+
+        self.clock += 2
+        self.buckets.take('user:10', 1, 5)
+        self.assertEqual(list(self.buckets._full_at), ['user:10'])
+
+    def test_least_recently_used_buckets_evicted(self):
+        for number in range(10):
+            self.buckets.take('user:{}'.format(number), 1, 5)
+        self.buckets.take('user:0', 1, 5)
+
+        self.buckets.take('user:10', 1, 5)
+        self.assertEqual(list(self.buckets._full_at),
+                         ['user:{}'.format(number) for number in [2, 3, 4, 5, 6, 7, 8, 9, 0, 10]],
+                         msg='Buckets other than the least recently used forgotten')
@@ -0,0 +1,97 @@
+import json
+import os
+import time
+from unittest import mock
+from sqlalchemy import create_engine
+from .test_base import BaseTest
+from app import app, db
+from app.database.models import Bucketlist, User
+from app.database.replicas import WRITTEN_AT_COOKIE, ReplicaRouter
+
+REPLICA_PATHS = [os.path.join(os.path.dirname(__file__), 'replica{}.sqlite3'.format(number)) for number in range(2)]
+
+
+class TestReplicaRouting(BaseTest):
+
+    def setUp(self):
+        super().setUp()
+
+        # Stand-ins for replicas, each holding the admin and a bucketlist of its own only
+        self.replicas = []
+        for number, path in enumerate(REPLICA_PATHS):
+            engine = create_engine('sqlite:///' + path)
+            db.Model.metadata.create_all(engine)
+            engine.execute(User.__table__.insert().values(id=1, username='admin', password='password'))
+            engine.execute(Bucketlist.__table__.insert().values(name='Replica {}'.format(number), creator_id=1))
+            self.replicas.append(engine)
+
+        self.use_router(ReplicaRouter(self.replicas, sticky_seconds=10))
+
+    def tearDown(self):
+        for engine in self.replicas:
+            engine.dispose()
+        for path in REPLICA_PATHS:
+            os.remove(path)
+        super().tearDown()
+
+    def use_router(self, router):
+        router_patch = mock.patch.dict(app.extensions, {'replica_router': router})
+        router_patch.start()
+        self.addCleanup(router_patch.stop)
+
+    def bucketlist_names(self):
+        response = self.app.get('api/V1/bucketlists', headers={'token': self.auth_token})
+        return [bucketlist.get('name') for bucketlist in json.loads(response.data.decode()).get('Bucketlists')]
+
+    def test_reads_spread_over_replicas(self):
+        self.assertEqual(self.bucketlist_names(), ['Replica 0'])
+        self.assertEqual(self.bucketlist_names(), ['Replica 1'])
+        self.assertEqual(self.bucketlist_names(), ['Replica 0'])
+
+    def test_writes_go_to_primary(self):
+        response = self.app.post('api/V1/bucketlists', headers={'token': self.auth_token}, data={'name': 'Hikes'})
+        self.assertEqual(response.status_code, 200)
+
+        self.assertIsNotNone(Bucketlist.query.filter_by(name='Hikes').first())
+        for engine in self.replicas:
+            self.assertEqual(engine.execute("SELECT COUNT(*) FROM bucketlist WHERE name = 'Hikes'").scalar(), 0)
+
+    def test_reads_after_write_stick_to_primary(self):
+        self.app.post('api/V1/bucketlists', headers={'token': self.auth_token}, data={'name': 'Hikes'})
+
+        self.assertIn('Hikes', self.bucketlist_names(), msg="User's own write not read back")
+
+        self.app.set_cookie('localhost', WRITTEN_AT_COOKIE, str(time.time() - 10))
+        self.assertEqual(self.bucketlist_names(), ['Replica 0'], msg='Reads kept on the primary after the window')
+
+    def test_stickiness_carried_by_client(self):
+        self.app.post('api/V1/bucketlists', headers={'token': self.auth_token}, data={'name': 'Hikes'})
+
+        # Another process, with a router of its own, still sends the client's reads to the primary
+        self.use_router(ReplicaRouter(self.replicas, sticky_seconds=10))
+        self.assertIn('Hikes', self.bucketlist_names())
+
+        # While another client of the same user reads from the replicas
+        self.app.cookie_jar.clear()
+        self.assertEqual(self.bucketlist_names(), ['Replica 0'])
+
+    def test_written_at_bounded(self):
+        router = ReplicaRouter(self.replicas, sticky_seconds=10)
+        self.assertIsNone(router.replica_for('GET', time.time() - 1))
+        self.assertIsNotNone(router.replica_for('GET', time.time() + 3600), msg='Forged write time kept on primary')
+        self.assertIsNotNone(router.replica_for('GET', None))
+        self.assertIsNone(router.written_at({WRITTEN_AT_COOKIE: 'soon'}))
+
+    def test_least_connections(self):
+        self.use_router(ReplicaRouter(self.replicas, strategy='least-connections'))
+
+        with self.replicas[0].connect():
+            self.assertEqual(self.bucketlist_names(), ['Replica 1'])
+            self.assertEqual(self.bucketlist_names(), ['Replica 1'])
+
+        with self.replicas[1].connect(), self.replicas[1].connect():
+            self.assertEqual(self.bucketlist_names(), ['Replica 0'])
+
+    def test_no_replicas(self):
+        self.use_router(ReplicaRouter([]))
+        self.assertEqual(len(self.bucketlist_names()), 5)
@@ -0,0 +1,30 @@
+from unittest import mock
+from .test_base import BaseTest
+from app import app
+from app.controller.views import Bucketlists
+
+
+class TestRequestParsing(BaseTest):
+
+    def test_parser_built_once_per_view_method(self):
+        self.assertIs(Bucketlists.request_parser('get'), Bucketlists.request_parser('get'),
+                      msg='Request parser rebuilt for every request')
+        self.assertIsNot(Bucketlists.request_parser('get'), Bucketlists.request_parser('post'))
+
+    def test_arguments_limited_to_view_method(self):
+        with app.test_request_context('/api/V1/bucketlists?q=od', method='GET', data={'name': 'Cars'}):
+            parsed_args = Bucketlists().parse_args()
+
+        self.assertEqual(parsed_args.get('q'), 'od')
+        self.assertNotIn('name', parsed_args,
+                         msg='GET request parses form arguments it does not use')
+
+    def test_arguments_parsed_once_per_request(self):
+        parse_args = Bucketlists.request_parser('get').parse_args
+
+        with mock.patch.object(Bucketlists.request_parser('get'), 'parse_args',
+                               side_effect=parse_args) as parse_args_mock:
+            self.app.get('api/V1/bucketlists?q=od&limit=2', headers={'token': self.auth_token})
+
+        self.assertEqual(parse_args_mock.call_count, 1,
+                         msg='Request arguments parsed more than once per request')
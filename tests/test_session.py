@@ -0,0 +1,39 @@
+from threading import Thread
+from .test_base import BaseTest
+from app import app, db, session
+from app.database.models import Bucketlist
+
+
+class TestScopedSession(BaseTest):
+
+    def test_single_engine(self):
+        self.assertIs(session.get_bind(), db.engine,
+                      msg='Session is not bound to the application engine')
+
+    def test_session_per_thread(self):
+        sessions = []
+        thread = Thread(target=lambda: sessions.append(session()))
+        thread.start()
+        thread.join()
+
+        self.assertIsNot(sessions[0], session(),
+                         msg='Threads share a database session')
+
+    def test_session_removed_at_request_end(self):
+        # Uncommitted work left in the session must not leak into later requests
+        session.add(Bucketlist(name='Uncommitted', creator_id=1))
+        self.app.get('api/V1/bucketlists', headers={'token': self.auth_token})
+
+        self.assertFalse(session.new,
+                         msg='Session outlives the request it was used in')
+        self.assertIsNone(session.query(Bucketlist).filter_by(name='Uncommitted').first())
+
+    def test_failed_transaction_does_not_poison_later_requests(self):
+        with app.test_request_context():
+            session.add(Bucketlist(name='Food', creator_id=1))
+            with self.assertRaises(Exception):
+                session.commit()
+
+        response = self.app.get('api/V1/bucketlists', headers={'token': self.auth_token})
+        self.assertEqual(response.status_code, 200,
+                         msg='Failed transaction breaks the requests that follow it')
@@ -0,0 +1,136 @@
+import json
+import time
+from unittest import mock
+from .test_base import BaseTest
+from app import app, session
+from app.controller import utils
+from app.controller.utils import encode_sync_token
+from app.database.models import Bucketlist, Item, Tombstone, User
+
+
+class TestSync(BaseTest):
+
+    def sync(self, since=None, limit=None):
+        query = []
+        if since is not None:
+            query.append('since=' + since)
+        if limit is not None:
+            query.append('limit={}'.format(limit))
+
+        response = self.app.get('api/V1/sync?' + '&'.join(query), headers={'token': self.auth_token})
+        return response, json.loads(response.data.decode()) if response.status_code == 200 else None
+
+    def names(self, changes):
+        return sorted(change.get('name') for change in changes)
+
+    def test_full_sync(self):
+        response, content = self.sync()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.names(content['created']['bucketlists']),
+                         ['Concerts', 'Food', 'Movies', 'People', 'Travel'])
+        self.assertEqual(self.names(content['created']['items']), ['Tokyo', 'Utah', 'Venice', 'Warsaw', 'York'])
+        self.assertEqual(content['created']['items'][0].get('bucketlist_id'), 1)
+        self.assertFalse(content.get('has_more'))
+        self.assertFalse(content.get('reset'))
+
+    def test_changes_since_token(self):
+        _, content = self.sync()
+        token = content.get('sync_token')
+
+        self.app.post('api/V1/bucketlists', headers={'token': self.auth_token}, data={'name': 'Hikes'})
+        self.app.put('api/V1/bucketlists/1/items/1', headers={'token': self.auth_token}, data={'done': 'true'})
+        self.app.delete('api/V1/bucketlists/1/items/2', headers={'token': self.auth_token})
+        self.app.delete('api/V1/bucketlists/5', headers={'token': self.auth_token})
+
+        _, content = self.sync(token)
+
+        self.assertEqual(self.names(content['created']['bucketlists']), ['Hikes'])
+        self.assertEqual(content['created']['items'], [])
+        self.assertEqual([(item.get('id'), item.get('done')) for item in content['updated']['items']], [(1, True)])
+        self.assertEqual(content['deleted'], {'bucketlists': [5], 'items': [2]})
+
+        _, content = self.sync(content.get('sync_token'))
+        self.assertEqual(content['created'], {'bucketlists': [], 'items': []},
+                         msg='Changes returned again after the sync that returned them')
+        self.assertEqual(content['deleted'], {'bucketlists': [], 'items': []})
+
+    def test_pages(self):
+        seen, token, pages = [], None, 0
+
+        while True:
+            _, content = self.sync(token, limit=3)
+            seen += [change.get('name') for change in content['created']['bucketlists'] + content['created']['items']]
+            token, pages = content.get('sync_token'), pages + 1
+            if not content.get('has_more'):
+                break
+
+        self.assertEqual(pages, 4)
+        self.assertEqual(len(seen), 10)
+        self.assertEqual(len(set(seen)), 10, msg='Change returned on more than one page')
+
+    def test_only_own_changes(self):
+        other_user = User(username='other', password='password')
+        session.add(Bucketlist(name='Secret', created_by=other_user))
+        session.commit()
+        session.delete(session.query(Bucketlist).filter_by(name='Secret').first())
+        session.commit()
+
+        _, content = self.sync(encode_sync_token(0))
+        self.assertNotIn('Secret', self.names(content['created']['bucketlists']))
+        self.assertEqual(content['deleted']['bucketlists'], [])
+
+    def test_expired_token_resets(self):
+        _, content = self.sync()
+        self.app.delete('api/V1/bucketlists/5', headers={'token': self.auth_token})
+
+        with mock.patch('time.time', return_value=time.time() + app.config.get('SYNC_TOMBSTONE_TTL') + 1):
+            _, content = self.sync(content.get('sync_token'))
+
+        self.assertTrue(content.get('reset'))
+        self.assertEqual(len(content['created']['bucketlists']), 4)
+        self.assertEqual(content['deleted'], {'bucketlists': [], 'items': []})
+
+    def test_tombstones_recorded_on_remove(self):
+        bucketlist = session.query(Bucketlist).filter_by(id=2).first()
+        self.app.delete('api/V1/bucketlists/2', headers={'token': self.auth_token})
+
+        tombstone = session.query(Tombstone).filter_by(table_name='bucketlist', row_id=bucketlist.id).first()
+        self.assertIsNotNone(tombstone)
+        self.assertEqual(tombstone.user_id, 1)
+
+    def test_indexed_change_queries(self):
+        _, content = self.sync()
+
+        with self.count_queries(with_parameters=True) as queries:
+            self.sync(content.get('sync_token'))
+
+        plans = [self.query_plan(statement, parameters) for statement, parameters in queries
+                 if 'change_seq >' in statement]
+        self.assertEqual(len(plans), 3)
+        for plan in plans:
+            self.assertFalse([step for step in plan if step.startswith('SCAN') and 'INDEX' not in step],
+                             msg='Changes found with a table scan: {}'.format(plan))
+            self.assertFalse([step for step in plan if 'TEMP B-TREE' in step],
+                             msg='Changes sorted rather than read in order: {}'.format(plan))
+
+    def test_items_keep_owner(self):
+        self.app.post('api/V1/bucketlists/1/items', headers={'token': self.auth_token}, data={'name': 'Oslo'})
+        self.app.put('api/V1/bucketlists/2/items/6', headers={'token': self.auth_token}, data={'name': 'Lima'})
+        self.assertEqual({owner for (owner,) in session.query(Item.owner_id)}, {1})
+
+        _, content = self.sync()
+        self.assertIn('Oslo', self.names(content.get('created').get('items')))
+
+        # Items of a soft deleted bucketlist are not the user's any more, though they keep their owner until purged
+        with mock.patch.dict(app.config, {'BUCKETLIST_DELETE_MODE': 'soft'}), \
+                mock.patch.object(utils.purger, 'wake'):
+            self.app.delete('api/V1/bucketlists/1', headers={'token': self.auth_token})
+
+        _, content = self.sync()
+        self.assertNotIn('Oslo', self.names(content.get('created').get('items')))
+
+    def test_invalid_arguments(self):
+        self.assertEqual(self.sync('not a token')[0].status_code, 400)
+        self.assertEqual(self.sync(limit=0)[0].status_code, 400)
+        self.assertEqual(self.sync(limit='many')[0].status_code, 400)
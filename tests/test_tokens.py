@@ -0,0 +1,173 @@
+import json
+import time
+import unittest
+from unittest import mock
+import jwt
+from .test_base import BaseTest
+from app import SECRET_KEY, session
+from app.controller.revocation import BloomFilter, RevocationList
+from app.controller.utils import RequestMixin, revocation_list
+from app.database.models import RevokedToken, User
+
+
+class TestBloomFilter(unittest.TestCase):
+
+    def test_added_keys_present(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        keys = ['token{}'.format(number) for number in range(1000)]
+        for key in keys:
+            bloom.add(key)
+
+        self.assertTrue(all(key in bloom for key in keys))
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for number in range(1000):
+            bloom.add('token{}'.format(number))
+
+        false_positives = len([number for number in range(10000) if 'other{}'.format(number) in bloom])
+        self.assertLess(false_positives, 300, msg='Bloom filter far above its error rate')
+
+
+class TestRevocationList(unittest.TestCase):
+
+    def setUp(self):
+        self.stored = []
+        self.loads = []
+
+        def load(after):
+            self.loads.append(after)
+            return [revocation for revocation in self.stored if revocation[0] > after]
+
+        self.revocations = RevocationList(load, interval=60)
+
+    def test_synced_once_per_interval(self):
+        self.stored.append((1, 'a', time.time() + 60))
+
+        self.assertTrue(self.revocations.is_revoked('a'))
+        self.assertFalse(self.revocations.is_revoked('b'))
+
+        self.stored.append((2, 'b', time.time() + 60))
+        self.assertFalse(self.revocations.is_revoked('b'),
+                         msg='Revocations loaded before the sync interval elapsed')
+        self.assertEqual(self.loads, [0])
+
+        self.revocations.interval = 0
+        self.assertTrue(self.revocations.is_revoked('b'))
+        self.assertEqual(self.loads[-1], 1, msg='Revocations loaded a second time')
+
+    def test_local_revocations_apply_immediately(self):
+        self.revocations.is_revoked('a')
+        self.revocations.add('a', time.time() + 60)
+
+        self.assertTrue(self.revocations.is_revoked('a'))
+
+    def test_expired_revocations_forgotten(self):
+        self.revocations.add('a', time.time() - 1)
+        self.revocations.sync()
+
+        self.assertNotIn('a', self.revocations.revoked)
+        self.assertNotIn('a', self.revocations.filter)
+
+    def test_filter_grows_past_capacity(self):
+        revocations = RevocationList(lambda after: [], capacity=10)
+        for number in range(50):
+            revocations.add('token{}'.format(number), time.time() + 60)
+
+        self.assertGreaterEqual(revocations.filter.capacity, 50)
+        self.assertTrue(all(revocations.is_revoked('token{}'.format(number)) for number in range(50)))
+
+
+class TestTokens(BaseTest):
+
+    def login(self):
+        response = self.app.post('/api/V1/auth/login', data={'username': 'admin', 'password': 'admin'})
+        return json.loads(response.data.decode())
+
+    def test_claims(self):
+        tokens = self.login()
+        access = jwt.decode(tokens.get('auth_token'), key=SECRET_KEY)
+        refresh = jwt.decode(tokens.get('refresh_token'), key=SECRET_KEY)
+
+        self.assertEqual(access.get('type'), 'access')
+        self.assertEqual(refresh.get('type'), 'refresh')
+        self.assertEqual(access.get('user_id'), 1)
+        self.assertNotEqual(access.get('jti'), refresh.get('jti'))
+        self.assertLess(access.get('exp'), refresh.get('exp'))
+
+    def test_user_id_claim_looked_up_once(self):
+        token = self.login().get('auth_token')
+        self.app.get('/api/V1/bucketlists', headers={'token': token})
+
+        with self.count_queries() as statements:
+            response = self.app.get('/api/V1/bucketlists', headers={'token': token})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([statement for statement in statements if 'user.username' in statement],
+                         msg='User looked up again for a token carrying its id')
+
+    def test_deleted_users_tokens_rejected(self):
+        token = self.login().get('auth_token')
+        self.app.get('/api/V1/bucketlists', headers={'token': token})
+
+        session.delete(session.query(User).get(1))
+        session.commit()
+
+        response = self.app.post('/api/V1/bucketlists', headers={'token': token}, data={'name': 'Travel'})
+        self.assertEqual(response.status_code, 401, msg='Access token of a deleted user still accepted')
+
+    def test_refresh(self):
+        tokens = self.login()
+
+        response = self.app.post('/api/V1/auth/refresh', data={'refresh_token': tokens.get('refresh_token')})
+        self.assertEqual(response.status_code, 200)
+
+        refreshed = json.loads(response.data.decode())
+        response = self.app.get('/api/V1/bucketlists', headers={'token': refreshed.get('auth_token')})
+        self.assertEqual(response.status_code, 200, msg='Refreshed access token rejected')
+
+        response = self.app.post('/api/V1/auth/refresh', data={'refresh_token': tokens.get('refresh_token')})
+        self.assertEqual(response.status_code, 401, msg='Refresh token accepted a second time')
+
+    def test_token_types_not_interchangeable(self):
+        tokens = self.login()
+
+        response = self.app.post('/api/V1/auth/refresh', data={'refresh_token': tokens.get('auth_token')})
+        self.assertEqual(response.status_code, 401, msg='Access token accepted as a refresh token')
+
+        response = self.app.get('/api/V1/bucketlists', headers={'token': tokens.get('refresh_token')})
+        self.assertEqual(response.status_code, 401, msg='Refresh token accepted as an access token')
+
+    def test_invalid_refresh_token(self):
+        self.assertEqual(self.app.post('/api/V1/auth/refresh').status_code, 401)
+        self.assertEqual(self.app.post('/api/V1/auth/refresh', data={'refresh_token': 'token'}).status_code, 401)
+
+    def test_logout_revokes_tokens(self):
+        tokens = self.login()
+
+        response = self.app.post('/api/V1/auth/logout', headers={'token': tokens.get('auth_token')},
+                                 data={'refresh_token': tokens.get('refresh_token')})
+        self.assertEqual(response.status_code, 200)
+
+        response = self.app.get('/api/V1/bucketlists', headers={'token': tokens.get('auth_token')})
+        self.assertEqual(response.status_code, 401, msg='Revoked access token accepted')
+
+        response = self.app.post('/api/V1/auth/refresh', data={'refresh_token': tokens.get('refresh_token')})
+        self.assertEqual(response.status_code, 401, msg='Revoked refresh token accepted')
+
+    def test_revocations_from_other_processes_synced(self):
+        token = self.login().get('auth_token')
+        self.assertEqual(self.app.get('/api/V1/bucketlists', headers={'token': token}).status_code, 200)
+
+        # As stored by another process, which this one only learns of by syncing
+        with mock.patch.object(revocation_list, 'add'):
+            RequestMixin().revoke_token(jwt.decode(token, key=SECRET_KEY))
+        self.assertEqual(session.query(RevokedToken).count(), 1)
+
+        revocation_list.synced = time.monotonic() - revocation_list.interval - 1
+        with self.count_queries() as statements:
+            self.assertEqual(self.app.get('/api/V1/bucketlists', headers={'token': token}).status_code, 401)
+            self.app.get('/api/V1/bucketlists', headers={'token': token})
+
+        self.assertEqual(len([statement for statement in statements if 'FROM revoked_token' in statement]), 1,
+                         msg='Revocation list not synced exactly once')